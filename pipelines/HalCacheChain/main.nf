@@ -24,6 +24,7 @@ include {
     getCommonMapEntries;
     getDefaultHalCachePath;
     getNonemptyChains;
+    getTaskBinParams;
     loadMappingFromTsv;
 } from "./utilities.nf"
 
@@ -118,8 +119,9 @@ process PREP_TASK_SHEET {
     path "prepped_param_sets.tsv", emit: prepped_param_sets
 
     script:
+    def bin_length_arg = params.task_bin_length ? "--bin-length ${params.task_bin_length}" : ""
     """
-    ${params.prep_task_sheet_exe} $task_sheet ${hal_cache}/genome/chrom_sizes prepped_param_sets.tsv
+    ${params.prep_task_sheet_exe} $task_sheet ${hal_cache}/genome/chrom_sizes prepped_param_sets.tsv $bin_length_arg
     """
 }
 
@@ -141,88 +143,16 @@ process DUMP_HAL_GENOME_SEQS {
     """
 }
 
-process MAKE_SOURCE_BED {
-
-    input:
-    val task_params
-
-    output:
-    tuple val(task_params), path("liftover_source.bed"), emit: liftover_input
-
-    script:
-    """
-    #!/usr/bin/env python3
-    from pathlib import Path
-
-    from ensembl.compara.utils.hal import make_src_region_file
-    from ensembl.compara.utils.ucsc import load_chrom_sizes_file
-
-    chrom_sizes_dir = Path("${hal_cache}") / "genome" / "chrom_sizes"
-    chrom_sizes_file = chrom_sizes_dir / "${task_params.source_genome}.chrom.sizes"
-    source_chrom_sizes = load_chrom_sizes_file(chrom_sizes_file)
-
-    make_src_region_file(
-        "${task_params.source_sequence}",
-        ${task_params.source_start},
-        ${task_params.source_end},
-        ${task_params.source_strand},
-        source_chrom_sizes,
-        "liftover_source.bed",
-    )
-    """
-}
-
-process HAL_LIFTOVER {
+process LIFTOVER_CHAIN {
     label "rc_16Gb"
 
-    input:
-    tuple val(task_params), path(liftover_source_bed)
-
-    output:
-    tuple val(task_params), path("liftover.psl"), emit: liftover_psl
-
-    script:
-    """
-    ${params.hal_liftover_exe} --outPSL ${params.hal} ${task_params.source_genome} \
-        $liftover_source_bed ${task_params.dest_genome} liftover.psl
-    """
-}
-
-process PSL_POS_TARGET {
-
-    input:
-    tuple val(task_params), path(liftover_psl)
-
-    output:
-    tuple val(task_params), path("pos_target.psl"), emit: pos_target_psl
-
-    script:
-    """
-    ${params.psl_pos_target_exe} $liftover_psl pos_target.psl
-    """
-}
-
-process PSL_SWAP {
-
-    input:
-    tuple val(task_params), path(pos_target_psl)
-
-    output:
-    tuple val(task_params), path("swapped.psl"), emit: swapped_psl
-
-    script:
-    """
-    ${params.psl_swap_exe} $pos_target_psl swapped.psl
-    """
-}
-
-process CHAIN_ALN {
+    publishDir "${hal_cache}/${task_params.liftover_level}/chain", mode: "copy",  overwrite: true
 
     input:
-    tuple val(task_params), path(swapped_psl), val(genome_dump_summary)
+    tuple val(task_params), val(region_param_sets), val(genome_dump_summary)
 
     output:
-    tuple val(task_params), path("*.chain"), emit: chain
+    tuple val(task_params), path("*.chain.gz"), emit: compressed_chain
 
     script:
     def twobit_file_map = loadMappingFromTsv(genome_dump_summary)
@@ -232,25 +162,21 @@ process CHAIN_ALN {
     def query_2bit_file = twobit_file_map[task_params.dest_genome]
 
     def chain_file_name = composeChainFileName(task_params, task_params.liftover_level)
-    """
-    ${params.axt_chain_exe} -psl -linearGap=medium $swapped_psl \
-        $target_2bit_file $query_2bit_file $chain_file_name
-    """
-}
-
-process COMPRESS_CHAIN {
-
-    publishDir "${hal_cache}/${task_params.liftover_level}/chain", mode: "copy",  overwrite: true
 
-    input:
-    tuple val(task_params), path(chain_file)
-
-    output:
-    tuple val(task_params), path("*.chain.gz"), emit: compressed_chain
-
-    script:
+    def source_region_args = region_param_sets.collect {
+        region_params ->
+        "--source-sequence \"${region_params.source_sequence}\" --source-start ${region_params.source_start}" +
+            " --source-end ${region_params.source_end} --source-strand ${region_params.source_strand}"
+    }.join(" ")
     """
-    gzip -c "$chain_file" > "${chain_file}.gz"
+    ${params.make_liftover_chain_exe} ${params.hal} \
+        ${hal_cache}/genome/chrom_sizes/${task_params.source_genome}.chrom.sizes \
+        ${task_params.source_genome} ${task_params.dest_genome} \
+        $target_2bit_file $query_2bit_file "${chain_file_name}.gz" \
+        $source_region_args \
+        --hal-liftover-exe ${params.hal_liftover_exe} \
+        --axt-chain-exe ${params.axt_chain_exe} \
+        --threads ${task.cpus}
     """
 }
 
@@ -267,8 +193,9 @@ process MERGE_CHAINS {
     script:
     def merged_chain_file_path = composeChainFileName(task_params, task_params.group_level)
     """
-    find . -maxdepth 1 -name '*.chain.gz' -exec zcat {} '+' >> "$merged_chain_file_path"
-    gzip -c "$merged_chain_file_path" > "${merged_chain_file_path}.gz"
+    find . -maxdepth 1 -name '*.chain.gz' | sort > chain_files.txt
+    ${params.merge_chain_files_exe} --sort-by position --threads ${task.cpus} \
+        chain_files.txt "${merged_chain_file_path}.gz"
     """
 }
 
@@ -312,24 +239,28 @@ workflow {
         | set { genome_dump_summary }
 
 
-    MAKE_SOURCE_BED ( task_param_sets )
-
-    HAL_LIFTOVER ( MAKE_SOURCE_BED.out.liftover_input )
-
-    PSL_POS_TARGET ( HAL_LIFTOVER.out.liftover_psl )
-
-    PSL_SWAP ( PSL_POS_TARGET.out.pos_target_psl )
+    // Source regions binned into one task by the task sheet are lifted over together.
+    task_param_sets \
+        | filter { task_params -> task_params.containsKey("task_bin") } \
+        | map {
+              task_params ->
+              tuple( [task_params.source_genome, task_params.dest_genome, task_params.task_bin], task_params )
+          } \
+        | groupTuple \
+        | map { task_bin_key, region_param_sets -> tuple( getTaskBinParams(region_param_sets), region_param_sets ) } \
+        | set { binned_tasks }
 
-    PSL_SWAP.out.swapped_psl \
+    task_param_sets \
+        | filter { task_params -> !task_params.containsKey("task_bin") } \
+        | map { task_params -> tuple( task_params, [task_params] ) } \
+        | mix(binned_tasks) \
         | combine(genome_dump_summary) \
-        | set { alns_to_chain }
-
+        | set { liftover_tasks }
 
-    CHAIN_ALN ( alns_to_chain )
 
-    COMPRESS_CHAIN ( CHAIN_ALN.out.chain )
+    LIFTOVER_CHAIN ( liftover_tasks )
 
-    COMPRESS_CHAIN.out.compressed_chain \
+    LIFTOVER_CHAIN.out.compressed_chain \
         | filter { task_params, chain_file -> task_params.containsKey("group_key") } \
         | map {
               task_params, chain_file ->
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Make a liftover chain file for one HalCacheChain task.
+
+The source regions are lifted over to the destination genome by halLiftover, and
+its PSL output is made target-positive and swapped in memory, as by the Kent
+utilities pslPosTarget and pslSwap. The swapped PSL records are piped into
+axtChain, and its chain output is written to a BGZF-compressed chain file.
+"""
+
+from __future__ import annotations
+from argparse import ArgumentParser
+import io
+import os
+from pathlib import Path
+import shutil
+import subprocess
+from tempfile import TemporaryDirectory
+import threading
+from typing import IO, Mapping, Sequence, Union
+
+from ensembl.compara.utils.compression import open_output
+from ensembl.compara.utils.hal import make_flanked_src_region, SimpleRegion
+from ensembl.compara.utils.psl import PslRecords, read_psl
+from ensembl.compara.utils.ucsc import load_chrom_sizes_file
+
+
+def make_source_bed_file(
+    source_regions: Sequence[SimpleRegion],
+    chrom_sizes: Mapping[str, int],
+    bed_file: Union[os.PathLike, str],
+) -> None:
+    """Makes a source region BED file for halLiftover with one line per source region.
+
+    Args:
+        source_regions: Source regions.
+        chrom_sizes: Mapping of source genome sequence names to their lengths.
+        bed_file: Path of BED file to output.
+
+    Raises:
+        ValueError: If any region has an unknown genome sequence or invalid coordinates.
+    """
+    with open(bed_file, "w", encoding="utf-8") as out_file_obj:
+        for region in source_regions:
+            checked_region = make_flanked_src_region(region, chrom_sizes)
+            # halLiftover requires an integer score in BED input
+            fields = [
+                checked_region.chrom,
+                checked_region.start,
+                checked_region.end,
+                ".",
+                0,
+                checked_region.strand,
+            ]
+            print("\t".join(str(x) for x in fields), file=out_file_obj)
+
+
+def run_hal_liftover(
+    hal_liftover_exe: str,
+    hal_file: Union[os.PathLike, str],
+    source_genome: str,
+    source_bed_file: Union[os.PathLike, str],
+    dest_genome: str,
+) -> PslRecords:
+    """Runs halLiftover with PSL output, and reads its output PSL records.
+
+    Args:
+        hal_liftover_exe: Path of halLiftover executable.
+        hal_file: Input HAL file.
+        source_genome: Source genome name.
+        source_bed_file: BED file of source regions.
+        dest_genome: Destination genome name.
+
+    Returns:
+        The PSL records output by halLiftover.
+    """
+    cmd_args = [hal_liftover_exe, "--outPSL", hal_file, source_genome, source_bed_file, dest_genome, "stdout"]
+    process = subprocess.run(cmd_args, stdout=subprocess.PIPE, check=True, text=True, encoding="utf-8")
+    return read_psl(io.StringIO(process.stdout))
+
+
+def _write_psl_to_pipe(psl_records: PslRecords, pipe: IO[bytes]) -> None:
+    """Writes PSL records to a pipe, and closes it."""
+    try:
+        with io.TextIOWrapper(pipe, encoding="utf-8") as out_stream:
+            psl_records.write(out_stream)
+    except BrokenPipeError:
+        pass  # the reading process has failed, which is reported by its exit status
+
+
+def run_axt_chain(
+    axt_chain_exe: str,
+    psl_records: PslRecords,
+    target_2bit_file: Union[os.PathLike, str],
+    query_2bit_file: Union[os.PathLike, str],
+    chain_file: Union[os.PathLike, str],
+    linear_gap: str = "medium",
+    threads: int = 1,
+) -> None:
+    """Chains PSL records with axtChain, streaming its input and output.
+
+    Args:
+        axt_chain_exe: Path of axtChain executable.
+        psl_records: PSL records to chain.
+        target_2bit_file: 2bit file of target genome sequences.
+        query_2bit_file: 2bit file of query genome sequences.
+        chain_file: Output chain file, which is BGZF-compressed if its name ends in '.gz'.
+        linear_gap: axtChain linear gap costs, either 'loose' or 'medium', or a gap cost file.
+        threads: Number of threads compressing the output chain file.
+
+    Raises:
+        subprocess.CalledProcessError: If axtChain fails.
+    """
+    cmd_args = [
+        axt_chain_exe,
+        "-psl",
+        f"-linearGap={linear_gap}",
+        "stdin",
+        str(target_2bit_file),
+        str(query_2bit_file),
+        "stdout",
+    ]
+    with subprocess.Popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+        assert process.stdin is not None and process.stdout is not None
+        # PSL records are written by another thread, so that neither pipe can fill up and block.
+        writer_thread = threading.Thread(target=_write_psl_to_pipe, args=(psl_records, process.stdin))
+        writer_thread.start()
+        with open_output(chain_file, "wb", threads=threads) as out_file_obj:
+            shutil.copyfileobj(process.stdout, out_file_obj)
+        writer_thread.join()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd_args)
+
+
+def main() -> None:
+    """Main function of script."""
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("hal_file", help="Input HAL file.")
+    parser.add_argument("source_chrom_sizes_file", help="Chrom sizes file of the source genome.")
+    parser.add_argument("source_genome", help="Source genome name.")
+    parser.add_argument("dest_genome", help="Destination genome name.")
+    parser.add_argument("source_2bit_file", help="2bit file of source genome sequences.")
+    parser.add_argument("dest_2bit_file", help="2bit file of destination genome sequences.")
+    parser.add_argument(
+        "chain_file", help="Output chain file, which is BGZF-compressed if its name ends in '.gz'."
+    )
+    parser.add_argument(
+        "--source-sequence",
+        action="append",
+        required=True,
+        help="Source sequence name. Given once per source region.",
+    )
+    parser.add_argument(
+        "--source-start",
+        metavar="INT",
+        type=int,
+        action="append",
+        required=True,
+        help="1-based source start. Given once per source region.",
+    )
+    parser.add_argument(
+        "--source-end",
+        metavar="INT",
+        type=int,
+        action="append",
+        required=True,
+        help="1-based source end. Given once per source region.",
+    )
+    parser.add_argument(
+        "--source-strand",
+        metavar="INT",
+        type=int,
+        action="append",
+        help="Source strand; either 1 for plus strand or -1 for minus strand."
+        " If given, it must be given once per source region; otherwise all regions are on the plus strand.",
+    )
+    parser.add_argument("--hal-liftover-exe", default="halLiftover", help="Path of halLiftover executable.")
+    parser.add_argument("--axt-chain-exe", default="axtChain", help="Path of axtChain executable.")
+    parser.add_argument("--linear-gap", default="medium", help="axtChain linear gap costs.")
+    parser.add_argument(
+        "--threads",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of threads compressing the output chain file.",
+    )
+    args = parser.parse_args()
+
+    source_strands = args.source_strand if args.source_strand is not None else [1] * len(args.source_sequence)
+    region_attribs = [args.source_sequence, args.source_start, args.source_end, source_strands]
+    if len({len(x) for x in region_attribs}) != 1:
+        parser.error("each source region must have one sequence, start, end and strand")
+    source_regions = [SimpleRegion.from_1_based_region_attribs(*x) for x in zip(*region_attribs)]
+
+    source_chrom_sizes = load_chrom_sizes_file(args.source_chrom_sizes_file)
+    with TemporaryDirectory() as tmp_dir:
+        source_bed_file = Path(tmp_dir) / "liftover_source.bed"
+        make_source_bed_file(source_regions, source_chrom_sizes, source_bed_file)
+        liftover_psl = run_hal_liftover(
+            args.hal_liftover_exe, args.hal_file, args.source_genome, source_bed_file, args.dest_genome
+        )
+
+    # The source genome is the chain target, as the liftover PSL records are swapped.
+    run_axt_chain(
+        args.axt_chain_exe,
+        liftover_psl.pos_target().swap(),
+        args.source_2bit_file,
+        args.dest_2bit_file,
+        args.chain_file,
+        linear_gap=args.linear_gap,
+        threads=args.threads,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -17,18 +17,119 @@
 
 from __future__ import annotations
 from argparse import ArgumentParser
+import os
 from pathlib import Path
+from typing import Iterable, Optional, Union
 
+import numpy as np
 import pandas as pd
 
+from ensembl.compara.utils.chunking import pack_seqs_into_bins
 from ensembl.compara.utils.ucsc import load_chrom_sizes_file
 
 
-if __name__ == "__main__":
+def load_chrom_sizes_table(chrom_sizes_dir: Union[os.PathLike, str], genomes: Iterable[str]) -> pd.DataFrame:
+    """Load the chrom sizes of the given genomes into one long-format table.
+
+    Args:
+        chrom_sizes_dir: Directory of chrom sizes files.
+        genomes: Names of genomes whose chrom sizes are loaded.
+
+    Returns:
+        A table with one row per genome sequence, with columns 'source_genome',
+        'source_sequence' and 'source_length'. The sequences of each genome are
+        in the order of its chrom sizes file.
+    """
+    chrom_sizes_dir_path = Path(chrom_sizes_dir)
+    genome_tables = []
+    for genome in sorted(genomes):
+        chrom_sizes = load_chrom_sizes_file(chrom_sizes_dir_path / f"{genome}.chrom.sizes")
+        seq_names = np.char.decode(chrom_sizes.names[chrom_sizes.file_order], "utf-8")
+        genome_tables.append(
+            pd.DataFrame(
+                {
+                    "source_genome": genome,
+                    "source_sequence": pd.Series(seq_names, dtype=object),
+                    "source_length": chrom_sizes.lengths[chrom_sizes.file_order],
+                }
+            )
+        )
+    return pd.concat(genome_tables, ignore_index=True)
+
+
+def assign_task_bins(param_df: pd.DataFrame, seq_lengths: pd.Series, bin_length: int) -> pd.Series:
+    """Assign each sequence-level task of a genome-level task group to a task bin.
+
+    The sequences of each task group are packed into task bins of roughly ``bin_length``
+    total sequence length, as by :func:`ensembl.compara.utils.chunking.pack_seqs_into_bins`.
+
+    Args:
+        param_df: Task parameters, with one row per sequence-level task, grouped by 'group_key'.
+        seq_lengths: Length of the source sequence of each task.
+        bin_length: Target total sequence length of a task bin.
+
+    Returns:
+        The task bin name of each task, which is unique within its task group.
+
+    Raises:
+        ValueError: If ``bin_length`` is not positive.
+    """
+    if bin_length <= 0:
+        raise ValueError(f"'bin_length' must be greater than 0: {bin_length}")
+
+    seq_length_array = seq_lengths.to_numpy(dtype=np.int64)
+    bin_idxs = np.zeros(len(param_df), dtype=np.int64)
+    for group_row_idxs in param_df.groupby("group_key", sort=False).indices.values():
+        bin_idxs[group_row_idxs] = pack_seqs_into_bins(seq_length_array[group_row_idxs], bin_length)
+    return pd.Series(np.char.add("bin", (bin_idxs + 1).astype(str)), index=param_df.index)
+
+
+def expand_genome_tasks(
+    param_df: pd.DataFrame, chrom_sizes_table: pd.DataFrame, bin_length: Optional[int] = None
+) -> pd.DataFrame:
+    """Expand genome-level tasks into sequence-level tasks grouped by genome.
+
+    Args:
+        param_df: Genome-level task parameters.
+        chrom_sizes_table: Long-format chrom sizes table, as loaded by :func:`load_chrom_sizes_table`.
+        bin_length: If specified, sequences are packed into tasks of roughly this
+            total sequence length, as by :func:`assign_task_bins`.
+
+    Returns:
+        Sequence-level task parameters, with one row per source genome sequence.
+    """
+    # A left merge orders tasks by input row, then by source sequence order.
+    seq_param_df = param_df.merge(chrom_sizes_table, how="left", on="source_genome", sort=False)
+    seq_param_df = seq_param_df.dropna(subset=["source_sequence"]).reset_index(drop=True)
+    seq_param_df.insert(1, "source_sequence", seq_param_df.pop("source_sequence"))
+
+    seq_lengths = seq_param_df.pop("source_length")
+    seq_param_df["group_level"] = "genome"
+    seq_param_df["group_key"] = seq_param_df["source_genome"] + "|" + seq_param_df["dest_genome"]
+    if bin_length is not None:
+        seq_param_df["task_bin"] = assign_task_bins(seq_param_df, seq_lengths, bin_length)
+        task_keys = seq_param_df["group_key"] + "|" + seq_param_df["task_bin"]
+        group_sizes = task_keys.groupby(seq_param_df["group_key"]).transform("nunique")
+    else:
+        group_sizes = seq_param_df.groupby("group_key")["group_key"].transform("size")
+    seq_param_df.insert(seq_param_df.columns.get_loc("group_key"), "group_size", group_sizes)
+    return seq_param_df
+
+
+def main() -> None:
+    """Main function of script."""
+
     parser = ArgumentParser(description=__doc__)
     parser.add_argument("input_tsv", help="Input parameter TSV file.")
     parser.add_argument("chrom_sizes_dir", help="Directory of chrom sizes files.")
     parser.add_argument("output_tsv", help="Output prepped parameter TSV file.")
+    parser.add_argument(
+        "--bin-length",
+        metavar="INT",
+        type=int,
+        help="Pack genome sequences into tasks of roughly this total sequence length."
+        " Only valid for genome-level task sheets; other task sheets may set a 'task_bin' column.",
+    )
     args = parser.parse_args()
 
     supported_col_names = [
@@ -38,20 +139,13 @@ if __name__ == "__main__":
         "source_end",
         "source_strand",
         "dest_genome",
+        "task_bin",
     ]
 
     param_df = pd.read_csv(args.input_tsv, sep="\t")
     rel_col_names = param_df.columns[param_df.columns.isin(supported_col_names)]
     param_df = param_df[rel_col_names].drop_duplicates(ignore_index=True)
 
-    genomes = set(param_df["source_genome"]) | set(param_df["dest_genome"])
-
-    chrom_sizes_dir_path = Path(args.chrom_sizes_dir)
-    genome_to_chr_sizes = {}
-    for genome in genomes:
-        chrom_sizes_file_path = chrom_sizes_dir_path / f"{genome}.chrom.sizes"
-        genome_to_chr_sizes[genome] = load_chrom_sizes_file(chrom_sizes_file_path)
-
     known_location_params = {"source_start", "source_end", "source_strand"}
     specified_location_params = set(param_df.columns) & known_location_params
 
@@ -62,6 +156,8 @@ if __name__ == "__main__":
                 f"cannot set source location parameters ("
                 f"{','.join(specified_location_params)}) without 'source_sequence'"
             )
+        if "task_bin" in param_df.columns:
+            raise ValueError("cannot set 'task_bin' without 'source_sequence'")
     else:
         if len(specified_location_params) == 0:
             liftover_level = "sequence"
@@ -75,37 +171,34 @@ if __name__ == "__main__":
                     f" without setting {' and '.join(missing_location_params)}"
                 )
 
-    if liftover_level == "genome":
-        temp_dfs = []
-        for _, row in param_df.iterrows():
-            temp_df = pd.DataFrame(
-                [
-                    (row.source_genome, seq_name)
-                    for seq_name in genome_to_chr_sizes[row.source_genome]
-                ],
-                columns=["source_genome", "source_sequence"],
-            )
-            temp_df = temp_df.merge(row.to_frame().transpose(), on="source_genome")
-            temp_dfs.append(temp_df)
-        param_df = pd.concat(temp_dfs)
+    if args.bin_length is not None and liftover_level != "genome":
+        raise ValueError("cannot bin sequences of a task sheet that sets 'source_sequence'")
 
-        param_df["group_level"] = "genome"
-        param_df["group_size"] = param_df.apply(
-            lambda row: len(genome_to_chr_sizes[row.source_genome]), axis=1
-        )
-        param_df["group_key"] = param_df.apply(
-            lambda row: f"{row.source_genome}|{row.dest_genome}", axis=1
-        )
+    genomes = set(param_df["source_genome"]) | set(param_df["dest_genome"])
+    chrom_sizes_table = load_chrom_sizes_table(args.chrom_sizes_dir, genomes)
 
+    if liftover_level == "genome":
+        param_df = expand_genome_tasks(param_df, chrom_sizes_table, bin_length=args.bin_length)
         liftover_level = "sequence"
 
     if liftover_level in ("genome", "sequence"):
+        seq_lengths = param_df[["source_genome", "source_sequence"]].merge(
+            chrom_sizes_table, how="left", on=["source_genome", "source_sequence"], validate="many_to_one"
+        )["source_length"]
+        if seq_lengths.isna().any():
+            unknown_seq = param_df[seq_lengths.isna().to_numpy()].iloc[0]
+            raise ValueError(
+                f"source sequence '{unknown_seq.source_sequence}' not found"
+                f" in chrom sizes of genome '{unknown_seq.source_genome}'"
+            )
         param_df["source_start"] = 1
-        param_df["source_end"] = param_df.apply(
-            lambda x: genome_to_chr_sizes[x.source_genome][x.source_sequence], axis=1
-        )
+        param_df["source_end"] = seq_lengths.astype(np.int64).to_numpy()
         param_df["source_strand"] = 1
 
     param_df["liftover_level"] = liftover_level
 
     param_df.to_csv(args.output_tsv, sep="\t", index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -49,12 +49,17 @@ def composeChainFileName(task_params, level) {
     */
     def source_tag_parts = [task_params.source_genome]
     if (level in ["sequence", "location"]) {
-        source_tag_parts.add(task_params.source_sequence)
-
-        if (level == "location") {
-            source_tag_parts.addAll([task_params.source_start,
-                                     task_params.source_end,
-                                     task_params.source_strand])
+        if (task_params.containsKey("source_sequence")) {
+            source_tag_parts.add(task_params.source_sequence)
+
+            if (level == "location") {
+                source_tag_parts.addAll([task_params.source_start,
+                                         task_params.source_end,
+                                         task_params.source_strand])
+            }
+        } else {
+            // A task of several binned source regions is named by its task bin.
+            source_tag_parts.add(task_params.task_bin)
         }
     }
 
@@ -128,6 +133,21 @@ def getNonemptyChains(chain_files) {
     return chain_files.findAll { chainFileHasData(it) }
 }
 
+def getTaskBinParams(region_param_sets) {
+    /**
+    * Get task parameters of a task bin of source regions.
+    *
+    * @param region_param_sets List of task parameters of each source region in the task bin.
+    * @return Task parameters common to the source regions, without any source region
+    * parameters if there is more than one source region.
+    */
+    def task_params = getCommonMapEntries(region_param_sets)
+    if (region_param_sets.size() > 1) {
+        task_params.keySet().removeAll(["source_sequence", "source_start", "source_end", "source_strand"])
+    }
+    return task_params
+}
+
 def loadMappingFromTsv(file_path) {
     /**
     * Load mapping from two-column TSV file.
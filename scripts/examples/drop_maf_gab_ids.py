@@ -22,7 +22,7 @@ import re
 import shutil
 from tempfile import TemporaryDirectory
 
-from Bio.AlignIO.MafIO import MafIterator, MafWriter
+from ensembl.compara.utils.maf import iter_maf_blocks, MafWriter
 
 
 class ComparaMafPreprocessor(Iterator):
@@ -84,7 +84,7 @@ if __name__ == "__main__":
             maf_writer.write_header()
             with open(in_maf_path, encoding="utf-8") as in_file_obj:
                 preprocessed_lines = ComparaMafPreprocessor(in_file_obj)
-                for maf_block in MafIterator(preprocessed_lines):
-                    maf_writer.write_alignment(maf_block)
+                for maf_block in iter_maf_blocks(preprocessed_lines):
+                    maf_writer.write_block(maf_block)
 
         shutil.move(tmp_maf_path, out_maf_path)
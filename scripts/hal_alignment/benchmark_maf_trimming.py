@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark MAF block trimming of ``process_cactus_maf.py`` on synthetic blocks.
+
+Two kinds of block are trimmed: wide blocks with few rows and many columns,
+and deep blocks with many rows. Each synthetic block has gap-only columns and
+an overhang at either end.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ensembl.compara.utils.maf import MafBlock
+
+from process_cactus_maf import trim_maf_block
+
+
+def make_synthetic_block(num_rows: int, num_cols: int, rng: np.random.Generator) -> MafBlock:
+    """Returns a synthetic MAF block with gap-only and overhang columns.
+
+    Args:
+        num_rows: Number of rows in the block.
+        num_cols: Number of columns in the block.
+        rng: Random number generator.
+    """
+    seqs = rng.choice(np.array(list(b"ACGT-"), dtype=np.uint8), size=(num_rows, num_cols))
+    seqs[:, rng.random(num_cols) < 0.05] = ord("-")
+
+    overhang_length = min(100, num_cols // 10)
+    seqs[1:, :overhang_length] = ord("-")
+    seqs[:-1, num_cols - overhang_length :] = ord("-")
+    seqs[0, :overhang_length] = ord("A")
+    seqs[-1, num_cols - overhang_length :] = ord("C")
+
+    return MafBlock(
+        seqs.view("S1"),
+        [f"genome{i}.chr1" for i in range(num_rows)],
+        np.zeros(num_rows, dtype=np.int64),
+        (seqs != ord("-")).sum(axis=1).astype(np.int64),
+        np.ones(num_rows, dtype=np.int8),
+        np.full(num_rows, 10**9, dtype=np.int64),
+    )
+
+
+def benchmark_trimming(maf_block: MafBlock, repeats: int) -> float:
+    """Returns the best time in seconds taken to trim a copy of the given MAF block."""
+    timings = []
+    for _ in range(repeats):
+        block_copy = maf_block.take_rows(np.arange(maf_block.num_rows))
+        start_time = time.perf_counter()
+        trim_maf_block(block_copy)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main() -> None:
+    """Main function of script."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--wide-shape",
+        metavar="INT",
+        nargs=2,
+        type=int,
+        default=[4, 1_000_000],
+        help="Number of rows and columns of the wide block.",
+    )
+    parser.add_argument(
+        "--deep-shape",
+        metavar="INT",
+        nargs=2,
+        type=int,
+        default=[1_000, 1_000],
+        help="Number of rows and columns of the deep block.",
+    )
+    parser.add_argument(
+        "--repeats", metavar="INT", type=int, default=5, help="Number of times each block is trimmed."
+    )
+    parser.add_argument("--seed", metavar="INT", type=int, default=42, help="Random number seed.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for block_type, (num_rows, num_cols) in [("wide", args.wide_shape), ("deep", args.deep_shape)]:
+        maf_block = make_synthetic_block(num_rows, num_cols, rng)
+        best_time = benchmark_trimming(maf_block, args.repeats)
+        print(
+            f"{block_type} block ({num_rows} x {num_cols}): {best_time * 1000:.2f} ms,"
+            f" {num_rows * num_cols / best_time / 1e6:.1f} M cells/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,15 +13,24 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Calculate genomic coverage for a sequence chunk in a HAL file."""
+"""Calculate genomic coverage for a sequence chunk in a HAL file.
+
+Coverage may instead be calculated for a task bin of sequence chunks, as listed in
+a task sheet made by ``chunk-task-sheet coverage``, in which case the coverage
+stats of the chunks are summed.
+"""
 
 from argparse import ArgumentParser
+import csv
 import json
 from pathlib import Path
 import re
 import subprocess
 from tempfile import SpooledTemporaryFile
-from typing import Dict, Iterable, TextIO, Union
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple, Union
+import warnings
+
+import numpy as np
 
 
 def hal_genomic_coverage(
@@ -32,6 +41,7 @@ def hal_genomic_coverage(
     length: int,
     target_genomes: Iterable[str],
     hal_alignment_depth_exe: Union[Path, str] = "halAlignmentDepth",
+    chunk_size: int = 1_048_576,
 ) -> Dict:
     """Uses halAlignmentDepth to get genomic coverage for the given sequence chunk.
 
@@ -44,10 +54,14 @@ def hal_genomic_coverage(
         target_genomes: Target genomes to be considered for genomic coverage calculation.
         hal_alignment_depth_exe: Path of halAlignmentDepth executable. By default, assumed
             to be available via the PATH environment variable.
+        chunk_size: Number of characters of halAlignmentDepth output parsed at a time.
 
     Returns:
         Dictionary of genomic coverage stats for the
         specified reference genome sequence chunk.
+
+    Raises:
+        RuntimeError: If halAlignmentDepth terminates with a non-zero exit status.
     """
     cmd_args = [
         hal_alignment_depth_exe,
@@ -64,71 +78,219 @@ def hal_genomic_coverage(
         str(length),
     ]
 
-    rollover_limit = 10_485_760
-    with SpooledTemporaryFile(max_size=rollover_limit, mode="w+t") as tmp_file_obj:
+    # The output of halAlignmentDepth is parsed as it is written, without a temporary file.
+    parser = WiggleCoverageParser()
+    parse_error = None
+    with subprocess.Popen(
+        cmd_args, stdout=subprocess.PIPE, text=True, encoding="ascii"
+    ) as process:
+        assert process.stdout is not None
         try:
-            subprocess.run(
-                cmd_args, stdout=tmp_file_obj, text=True, encoding="ascii", check=True
-            )
-        except subprocess.CalledProcessError as exc:
-            status_type = "exit code" if exc.returncode > 0 else "signal"
-            raise RuntimeError(
-                f"halAlignmentDepth terminated with {status_type} {abs(exc.returncode)}"
-                f" for sequence '{ref_sequence}' of genome 'ref_genome'"
-            ) from exc
+            while chunk := process.stdout.read(chunk_size):
+                parser.feed(chunk)
+        except ValueError as exc:
+            parse_error = exc
+            process.kill()
 
-        tmp_file_obj.flush()
-        tmp_file_obj.seek(0)
-        result_part = load_genomic_coverage_wiggle(tmp_file_obj)
+    # If halAlignmentDepth was killed after a parse error, the parse error is raised.
+    if process.returncode > 0 or (process.returncode < 0 and parse_error is None):
+        status_type = "exit code" if process.returncode > 0 else "signal"
+        raise RuntimeError(
+            f"halAlignmentDepth terminated with {status_type} {abs(process.returncode)}"
+            f" for sequence '{ref_sequence}' of genome 'ref_genome'"
+        ) from parse_error
+    if parse_error is not None:
+        raise parse_error
 
+    result_part = parser.close()
     return result_part[ref_sequence]
 
 
+class WiggleCoverageParser:
+    """Incremental parser of fixedStep wiggle data generated by halAlignmentDepth.
+
+    Wiggle text is passed to :meth:`feed` in chunks of any size, and data lines
+    between declaration lines are parsed in bulk with NumPy.
+
+    Args:
+        return_depths: Include an array of the depth at each position of each sequence.
+        return_histogram: Include a histogram of depths for each sequence, as an array
+            of position counts indexed by depth.
+    """
+
+    declaration_line_re = re.compile(
+        r"fixedStep chrom=(?P<chrom>\S+) start=(?P<start>[0-9]+) step=(?P<step>[0-9]+)\s*"
+    )
+    non_data_line_re = re.compile(r"^[^\S\n]*[^\s0-9+-].*\n", re.MULTILINE)
+    blank_line_re = re.compile(r"^[^\S\n]*\n", re.MULTILINE)
+
+    def __init__(self, return_depths: bool = False, return_histogram: bool = False):
+        self.return_depths = return_depths
+        self.return_histogram = return_histogram
+        self.cov_stats: Dict[str, Dict] = {}
+        self._curr_seq_name: Optional[str] = None
+        self._depth_blocks: Dict[str, List[np.ndarray]] = {}
+        self._tail = ""
+
+    def feed(self, text: str) -> None:
+        """Parse a chunk of wiggle text, buffering any incomplete last line.
+
+        Args:
+            text: Wiggle text.
+        """
+        text = self._tail + text
+        split_pos = text.rfind("\n") + 1
+        self._tail = text[split_pos:]
+        self._parse_lines(text[:split_pos])
+
+    def close(self) -> Dict:
+        """Finish parsing wiggle text.
+
+        Returns:
+            Nested dictionary of coverage stats, with the key being the sequence name,
+            and the value being a dictionary of coverage stats for that sequence.
+        """
+        if self._tail:
+            self._parse_lines(self._tail + "\n")
+            self._tail = ""
+
+        for seq_name, depth_blocks in self._depth_blocks.items():
+            depths = (
+                np.concatenate(depth_blocks)
+                if depth_blocks
+                else np.array([], dtype=np.int64)
+            )
+            if self.return_depths:
+                self.cov_stats[seq_name]["depths"] = depths
+            if self.return_histogram:
+                self.cov_stats[seq_name]["depth_histogram"] = np.bincount(
+                    depths.clip(min=0)
+                )
+
+        return self.cov_stats
+
+    def _parse_lines(self, text: str) -> None:
+        """Parse complete lines of wiggle text."""
+        pos = 0
+        for match in self.non_data_line_re.finditer(text):
+            self._parse_data_lines(text[pos : match.start()])
+            self._parse_declaration_line(match.group())
+            pos = match.end()
+        self._parse_data_lines(text[pos:])
+
+    def _parse_declaration_line(self, line: str) -> None:
+        """Parse a wiggle declaration line."""
+        if match := self.declaration_line_re.fullmatch(line):
+            seq_name = match["chrom"]
+            if seq_name in self.cov_stats:
+                raise ValueError(f"multiple occurrences of sequence '{seq_name}' found")
+            self.cov_stats[seq_name] = {
+                "num_aligned_positions": 0,
+                "num_positions": 0,
+                "start": int(match["start"]),
+                "step": int(match["step"]),
+            }
+            self._curr_seq_name = seq_name
+            if self.return_depths or self.return_histogram:
+                self._depth_blocks[seq_name] = []
+        elif line.startswith("variableStep"):
+            raise ValueError("variableStep blocks not supported")
+        else:
+            raise ValueError(f"failed to parse wiggle line: {line}")
+
+    def _parse_data_lines(self, text: str) -> None:
+        """Parse a block of complete wiggle data lines, with one depth per line."""
+        if not text:
+            return
+        try:
+            if self.blank_line_re.search(text):
+                raise ValueError("blank wiggle line")
+            with warnings.catch_warnings():
+                # Older NumPy versions warn and return a partial array on invalid data.
+                warnings.simplefilter("ignore", DeprecationWarning)
+                depths = np.fromstring(text, dtype=np.int64, sep="\n")
+            if depths.size != text.count("\n"):
+                raise ValueError("invalid wiggle data line")
+        except ValueError:
+            depths = self._parse_data_lines_slowly(text)
+
+        if self._curr_seq_name is None:
+            raise ValueError(
+                f"failed to parse wiggle line: {text.splitlines(keepends=True)[0]}"
+            )
+
+        seq_stats = self.cov_stats[self._curr_seq_name]
+        seq_stats["num_positions"] += depths.size
+        seq_stats["num_aligned_positions"] += int(np.count_nonzero(depths > 0))
+        if self.return_depths or self.return_histogram:
+            self._depth_blocks[self._curr_seq_name].append(depths)
+
+    @staticmethod
+    def _parse_data_lines_slowly(text: str) -> np.ndarray:
+        """Parse wiggle data lines one at a time, reporting the first invalid line."""
+        depths = []
+        for line in text.splitlines(keepends=True):
+            try:
+                depths.append(int(line))
+            except ValueError as exc:
+                raise ValueError(f"failed to parse wiggle line: {line}") from exc
+        return np.array(depths, dtype=np.int64)
+
+
 def load_genomic_coverage_wiggle(
-    wiggle_file_obj: Union[SpooledTemporaryFile, TextIO]
+    wiggle_file_obj: Union[SpooledTemporaryFile, TextIO],
+    return_depths: bool = False,
+    return_histogram: bool = False,
+    chunk_size: int = 1_048_576,
 ) -> Dict:
     """Load data from wiggle file generated by halAlignmentDepth.
 
     Args:
         wiggle_file_obj: Input wiggle file object.
+        return_depths: Include an array of the depth at each position of each sequence.
+        return_histogram: Include a histogram of depths for each sequence, as an array
+            of position counts indexed by depth.
+        chunk_size: Number of characters of wiggle data read at a time.
 
     Returns:
         Nested dictionary of coverage stats, with the key being the sequence name,
         and the value being a dictionary of coverage stats for that sequence.
     """
-    declaration_line_re = re.compile(
-        r"fixedStep chrom=(?P<chrom>\S+) start=(?P<start>[0-9]+) step=(?P<step>[0-9]+)\s*"
+    parser = WiggleCoverageParser(
+        return_depths=return_depths, return_histogram=return_histogram
     )
+    while chunk := wiggle_file_obj.read(chunk_size):
+        parser.feed(chunk)
+    return parser.close()
 
-    cov_stats = {}
-    curr_seq_name = None
-    for line in wiggle_file_obj:
-        try:
-            aligned_genome_count = int(line)
-        except ValueError as exc:
-            if match := declaration_line_re.fullmatch(line):
-                curr_seq_name = match["chrom"]
-                if curr_seq_name in cov_stats:
-                    raise ValueError(
-                        f"multiple occurrences of sequence '{curr_seq_name}' found"
-                    ) from exc
-                cov_stats[curr_seq_name] = {
-                    "num_aligned_positions": 0,
-                    "num_positions": 0,
-                    "start": int(match["start"]),
-                    "step": int(match["step"]),
-                }
-            elif line.startswith("variableStep"):
-                raise ValueError("variableStep blocks not supported") from exc
-            else:
-                raise ValueError(f"failed to parse wiggle line: {line}") from exc
 
-        else:
-            if aligned_genome_count > 0:
-                cov_stats[curr_seq_name]["num_aligned_positions"] += 1
-            cov_stats[curr_seq_name]["num_positions"] += 1
+def load_task_bin_chunks(
+    task_sheet_file: Union[Path, str], task_bin: str
+) -> List[Tuple[str, int, int]]:
+    """Load the sequence chunks of a task bin from a coverage task sheet.
 
-    return cov_stats
+    Args:
+        task_sheet_file: Input task sheet TSV file, with columns 'task_bin',
+            'ref_sequence', 'start' and 'length'.
+        task_bin: Name of the task bin whose chunks are loaded.
+
+    Returns:
+        List of tuples of sequence name, 0-based chunk start and chunk length.
+
+    Raises:
+        ValueError: If the task sheet has no chunks in the given task bin.
+    """
+    with open(task_sheet_file, newline="") as in_file_obj:
+        seq_chunks = [
+            (row["ref_sequence"], int(row["start"]), int(row["length"]))
+            for row in csv.DictReader(in_file_obj, delimiter="\t")
+            if row["task_bin"] == task_bin
+        ]
+    if not seq_chunks:
+        raise ValueError(
+            f"task bin '{task_bin}' not found in task sheet: {task_sheet_file}"
+        )
+    return seq_chunks
 
 
 def main() -> None:
@@ -147,16 +309,25 @@ def main() -> None:
     parser.add_argument(
         "--start",
         metavar="INT",
-        required=True,
         type=int,
-        help="Start of sequence chunk (0-based).",
+        help="Start of sequence chunk (0-based). Required unless --task-sheet is set.",
     )
     parser.add_argument(
         "--length",
         metavar="INT",
-        required=True,
         type=int,
-        help="Length of sequence chunk.",
+        help="Length of sequence chunk. Required unless --task-sheet is set.",
+    )
+    parser.add_argument(
+        "--task-sheet",
+        metavar="FILE",
+        help="Coverage task sheet of sequence chunks. If set, coverage is calculated"
+        " for the sequence chunks of the task bin given by --task-bin.",
+    )
+    parser.add_argument(
+        "--task-bin",
+        metavar="STR",
+        help="Name of task bin in the coverage task sheet.",
     )
     parser.add_argument(
         "--target-genomes",
@@ -168,32 +339,47 @@ def main() -> None:
     parser.add_argument(
         "--hal_alignment_depth_exe",
         metavar="STR",
+        default="halAlignmentDepth",
         help="Path of halAlignmentDepth executable. By default, assumed"
         " to be available via the PATH environment variable.",
     )
 
     args = parser.parse_args()
 
-    hal_cov_result = hal_genomic_coverage(
-        args.hal_path,
-        args.ref_genome,
-        args.ref_sequence,
-        args.start,
-        args.length,
-        args.target_genomes.split(","),
-        hal_alignment_depth_exe=args.hal_alignment_depth_exe,
-    )
-    obs_num_positions = hal_cov_result["num_positions"]
+    if args.task_sheet is not None:
+        if args.task_bin is None:
+            parser.error("--task-bin is required with --task-sheet")
+        if any(x is not None for x in (args.ref_sequence, args.start, args.length)):
+            parser.error(
+                "--ref-sequence, --start and --length cannot be used with --task-sheet"
+            )
+        seq_chunks = load_task_bin_chunks(args.task_sheet, args.task_bin)
+    else:
+        if args.start is None or args.length is None:
+            parser.error("--start and --length are required without --task-sheet")
+        seq_chunks = [(args.ref_sequence, args.start, args.length)]
 
-    if obs_num_positions != args.length:
-        raise ValueError(
-            f"sequence-length mismatch: {obs_num_positions} vs {args.length}"
+    output = {"num_positions": 0, "num_aligned_positions": 0}
+    for ref_sequence, start, length in seq_chunks:
+        hal_cov_result = hal_genomic_coverage(
+            args.hal_path,
+            args.ref_genome,
+            ref_sequence,
+            start,
+            length,
+            args.target_genomes.split(","),
+            hal_alignment_depth_exe=args.hal_alignment_depth_exe,
         )
+        obs_num_positions = hal_cov_result["num_positions"]
+
+        if obs_num_positions != length:
+            raise ValueError(
+                f"sequence-length mismatch: {obs_num_positions} vs {length}"
+                f" for sequence '{ref_sequence}' chunk at {start}"
+            )
 
-    output = {
-        "num_positions": obs_num_positions,
-        "num_aligned_positions": hal_cov_result["num_aligned_positions"],
-    }
+        output["num_positions"] += obs_num_positions
+        output["num_aligned_positions"] += hal_cov_result["num_aligned_positions"]
 
     print(json.dumps(output))
 
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Calculate genomic coverage for a genome in a HAL file, in parallel sequence chunks.
+
+Completed chunks are recorded in a JSON-lines checkpoint file, so that an
+interrupted run can be resumed without recalculating their coverage.
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import as_completed, ProcessPoolExecutor
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+from ensembl.compara.utils.ucsc import load_chrom_sizes_file
+
+from hal_cov_one_seq_chunk import hal_genomic_coverage
+
+
+def iter_seq_chunks(
+    chrom_sizes: Mapping[str, int], chunk_size: int
+) -> Iterator[Tuple[str, int, int]]:
+    """Yield sequence chunks covering every sequence of a genome.
+
+    Args:
+        chrom_sizes: Mapping of genome sequence names to their lengths.
+        chunk_size: Maximum length of a sequence chunk.
+
+    Yields:
+        Tuples of sequence name, 0-based chunk start and chunk length.
+    """
+    for seq_name, seq_length in chrom_sizes.items():
+        for start in range(0, seq_length, chunk_size):
+            yield seq_name, start, min(chunk_size, seq_length - start)
+
+
+def load_checkpoint(
+    checkpoint_file: Union[Path, str],
+) -> Dict[Tuple[str, int, int], Dict]:
+    """Load the coverage results of completed chunks from a checkpoint file.
+
+    A final line without a newline is assumed to have been partially written
+    by an interrupted run, and is removed from the checkpoint file.
+
+    Args:
+        checkpoint_file: Input JSON-lines checkpoint file.
+
+    Returns:
+        Dictionary mapping each completed chunk to its coverage result.
+    """
+    results: Dict[Tuple[str, int, int], Dict] = {}
+    if not Path(checkpoint_file).is_file():
+        return results
+
+    complete_size = 0
+    with open(checkpoint_file, "rb") as in_file_obj:
+        for line in in_file_obj:
+            if not line.endswith(b"\n"):
+                break
+            result = json.loads(line)
+            results[(result["ref_sequence"], result["start"], result["length"])] = (
+                result
+            )
+            complete_size += len(line)
+
+    if Path(checkpoint_file).stat().st_size > complete_size:
+        os.truncate(checkpoint_file, complete_size)
+
+    return results
+
+
+def calculate_chunk_coverage(
+    hal_path: Union[Path, str],
+    ref_genome: str,
+    ref_sequence: str,
+    start: int,
+    length: int,
+    target_genomes: List[str],
+    hal_alignment_depth_exe: Union[Path, str],
+) -> Dict:
+    """Calculate genomic coverage for one sequence chunk.
+
+    Returns:
+        Dictionary of the chunk and its numbers of positions and aligned positions.
+
+    Raises:
+        ValueError: If the number of positions differs from the chunk length.
+    """
+    hal_cov_result = hal_genomic_coverage(
+        hal_path,
+        ref_genome,
+        ref_sequence,
+        start,
+        length,
+        target_genomes,
+        hal_alignment_depth_exe=hal_alignment_depth_exe,
+    )
+    obs_num_positions = hal_cov_result["num_positions"]
+
+    if obs_num_positions != length:
+        raise ValueError(
+            f"sequence-length mismatch for sequence '{ref_sequence}' chunk at {start}:"
+            f" {obs_num_positions} vs {length}"
+        )
+
+    return {
+        "ref_sequence": ref_sequence,
+        "start": start,
+        "length": length,
+        "num_positions": obs_num_positions,
+        "num_aligned_positions": hal_cov_result["num_aligned_positions"],
+    }
+
+
+def aggregate_coverage(
+    chrom_sizes: Mapping[str, int], chunk_results: Iterable[Dict]
+) -> Dict:
+    """Aggregate chunk coverage results into sequence and genome totals.
+
+    Args:
+        chrom_sizes: Mapping of genome sequence names to their lengths.
+        chunk_results: Coverage results of sequence chunks.
+
+    Returns:
+        Dictionary of genome coverage totals, with per-sequence totals under 'sequences'.
+    """
+    seq_totals = {
+        seq_name: {"num_positions": 0, "num_aligned_positions": 0}
+        for seq_name in chrom_sizes
+    }
+    for result in chunk_results:
+        seq_total = seq_totals[result["ref_sequence"]]
+        seq_total["num_positions"] += result["num_positions"]
+        seq_total["num_aligned_positions"] += result["num_aligned_positions"]
+
+    return {
+        "num_positions": sum(x["num_positions"] for x in seq_totals.values()),
+        "num_aligned_positions": sum(
+            x["num_aligned_positions"] for x in seq_totals.values()
+        ),
+        "sequences": seq_totals,
+    }
+
+
+def main() -> None:
+    """Main function of script."""
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("hal_path", help="Input HAL file.")
+    parser.add_argument(
+        "ref_genome", help="Name of genome for which genomic coverage is calculated."
+    )
+    parser.add_argument(
+        "chrom_sizes_file", help="Chrom sizes file of the reference genome."
+    )
+    parser.add_argument(
+        "--target-genomes",
+        metavar="STR",
+        required=True,
+        help="Comma-separated list of target genomes.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        metavar="INT",
+        default=10_000_000,
+        type=int,
+        help="Maximum length of sequence chunks.",
+    )
+    parser.add_argument(
+        "--jobs",
+        metavar="INT",
+        default=1,
+        type=int,
+        help="Number of sequence chunks processed in parallel.",
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        metavar="FILE",
+        required=True,
+        help="JSON-lines file of completed chunk results. If this file exists,"
+        " the coverage of the chunks it contains is not recalculated.",
+    )
+    parser.add_argument(
+        "--hal_alignment_depth_exe",
+        metavar="STR",
+        default="halAlignmentDepth",
+        help="Path of halAlignmentDepth executable. By default, assumed"
+        " to be available via the PATH environment variable.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        metavar="FILE",
+        help="Output JSON file of genome coverage. By default, output is printed.",
+    )
+
+    args = parser.parse_args()
+
+    if args.chunk_size < 1:
+        raise ValueError(f"chunk size must be greater than 0: {args.chunk_size}")
+    if args.jobs < 1:
+        raise ValueError(f"number of jobs must be greater than 0: {args.jobs}")
+
+    chrom_sizes = load_chrom_sizes_file(args.chrom_sizes_file)
+    seq_chunks = list(iter_seq_chunks(chrom_sizes, args.chunk_size))
+    target_genomes = args.target_genomes.split(",")
+
+    chunk_results = load_checkpoint(args.checkpoint_file)
+    pending_chunks = [x for x in seq_chunks if x not in chunk_results]
+    # Chunks are submitted longest first, so that the last chunks to finish are short.
+    pending_chunks.sort(key=lambda x: x[2], reverse=True)
+
+    with open(args.checkpoint_file, "a") as checkpoint_file_obj:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                executor.submit(
+                    calculate_chunk_coverage,
+                    args.hal_path,
+                    args.ref_genome,
+                    ref_sequence,
+                    start,
+                    length,
+                    target_genomes,
+                    args.hal_alignment_depth_exe,
+                ): (ref_sequence, start, length)
+                for ref_sequence, start, length in pending_chunks
+            }
+            # Chunks that complete are checkpointed even if another chunk fails.
+            errors = []
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    errors.append((futures[future], exc))
+                    continue
+                print(json.dumps(result), file=checkpoint_file_obj, flush=True)
+                chunk_results[
+                    (result["ref_sequence"], result["start"], result["length"])
+                ] = result
+
+    if errors:
+        (ref_sequence, start, length), first_exc = errors[0]
+        raise RuntimeError(
+            f"failed to calculate coverage of {len(errors)} sequence chunks,"
+            f" first of which is {ref_sequence}:{start}+{length}"
+        ) from first_exc
+
+    output = {
+        "genome": args.ref_genome,
+        **aggregate_coverage(chrom_sizes, (chunk_results[x] for x in seq_chunks)),
+    }
+
+    if args.output_file:
+        with open(args.output_file, "w") as out_file_obj:
+            json.dump(output, out_file_obj)
+    else:
+        print(json.dumps(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,16 +22,105 @@ this script left-aligns any indels in the non-reference sequence.
 
 import argparse
 import os
-import re
 import shutil
 from tempfile import TemporaryDirectory
+from typing import List
 
-from Bio.Align import MultipleSeqAlignment
-from Bio.AlignIO.MafIO import MafIterator, MafWriter
-from Bio.Seq import Seq
+import numpy as np
 
+from ensembl.compara.utils.maf import MafBlock, run_maf_transform
 
-def left_align_indels(maf_block):
+_GAP_BYTE = ord("-")
+
+# Maps each byte value to its upper-case value, as for :meth:`bytes.upper`.
+_CASE_FOLD_TABLE = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8)
+
+
+def _find_left_shifts(
+    ref_seq: np.ndarray, alt_seq: np.ndarray, gap_starts: np.ndarray, gap_ends: np.ndarray
+) -> np.ndarray:
+    """Returns the number of columns by which each non-reference gap can be shifted left.
+
+    A gap can be shifted left by one column while the reference base aligned
+    with its final gap site is equal to the non-reference base just before it,
+    ignoring case. Gaps are shifted in turn from left to right, and a gap stops
+    at the first mismatching base or at the previous gap.
+
+    Args:
+        ref_seq: Reference sequence bytes, as an array of ``uint8``.
+        alt_seq: Non-reference sequence bytes, as an array of ``uint8``.
+        gap_starts: Start column of each non-reference gap.
+        gap_ends: End column of each non-reference gap.
+
+    Returns:
+        Array of left shifts, one per gap.
+    """
+    gap_lengths = gap_ends - gap_starts
+    prev_gap_ends = np.concatenate(([0], gap_ends[:-1]))
+    segment_lengths = gap_starts - prev_gap_ends
+
+    # Each gap is first shifted through the non-reference bases between it and the previous
+    # gap, while each base is equal to the reference base one gap length to its right. All
+    # gaps are checked at once, in windows of increasing size going left from each gap, so
+    # that the number of bases checked for a gap is roughly proportional to its shift.
+    shifts = np.zeros_like(gap_starts)
+    pending_idxs = np.flatnonzero(segment_lengths > 0)
+    window_start = 0
+    window_end = 1
+    while pending_idxs.size:
+        window_ends = np.minimum(segment_lengths[pending_idxs], window_end)
+        window_sizes = window_ends - window_start
+        window_gap_idxs = np.repeat(pending_idxs, window_sizes)
+        window_offsets = (
+            np.arange(window_gap_idxs.size)
+            - np.repeat(np.cumsum(window_sizes) - window_sizes, window_sizes)
+            + window_start
+        )
+        cols = gap_starts[window_gap_idxs] - 1 - window_offsets
+        mismatch_idxs = np.flatnonzero(
+            _CASE_FOLD_TABLE[ref_seq[cols + gap_lengths[window_gap_idxs]]] != _CASE_FOLD_TABLE[alt_seq[cols]]
+        )
+
+        # The shift of a gap is the offset of its first mismatch, if any.
+        mismatch_gap_idxs = window_gap_idxs[mismatch_idxs]
+        first_mismatch_mask = np.ones(mismatch_idxs.size, dtype=bool)
+        first_mismatch_mask[1:] = mismatch_gap_idxs[1:] != mismatch_gap_idxs[:-1]
+        shifts[mismatch_gap_idxs[first_mismatch_mask]] = window_offsets[mismatch_idxs[first_mismatch_mask]]
+        unresolved_mask = np.ones(gap_starts.size, dtype=bool)
+        unresolved_mask[mismatch_gap_idxs] = False
+
+        # Otherwise, a gap is shifted through its whole segment, or is checked in the next window.
+        unresolved_mask = unresolved_mask[pending_idxs]
+        segment_end_mask = window_ends == segment_lengths[pending_idxs]
+        shifted_idxs = pending_idxs[unresolved_mask & segment_end_mask]
+        shifts[shifted_idxs] = segment_lengths[shifted_idxs]
+        pending_idxs = pending_idxs[unresolved_mask & ~segment_end_mask]
+        window_start = window_end
+        window_end *= 4
+
+    # A gap that reaches the original end of the previous gap can continue through the bases
+    # moved by the previous gap, until it reaches the previous gap itself. This can only happen
+    # in low-complexity sequence, and these gaps are resolved in order, in ungapped coordinates.
+    continued_gap_idxs = np.flatnonzero((shifts == segment_lengths)[1:] & (shifts[:-1] > 0)) + 1
+    if continued_gap_idxs.size:
+        ungapped_alt_seq = alt_seq[alt_seq != _GAP_BYTE]
+        cum_gap_lengths = np.cumsum(gap_lengths)
+        ungapped_gap_starts = gap_starts - (cum_gap_lengths - gap_lengths)
+        for gap_idx in continued_gap_idxs.tolist():
+            prev_shift = shifts[gap_idx - 1]
+            base_end = ungapped_gap_starts[gap_idx - 1]
+            base_start = base_end - prev_shift
+            ref_offset = cum_gap_lengths[gap_idx]
+            base_mismatches = np.flatnonzero(
+                _CASE_FOLD_TABLE[ref_seq[base_start + ref_offset : base_end + ref_offset]]
+                != _CASE_FOLD_TABLE[ungapped_alt_seq[base_start:base_end]]
+            )
+            shifts[gap_idx] += prev_shift - 1 - base_mismatches[-1] if base_mismatches.size else prev_shift
+
+    return shifts
+
+
+def left_align_indels(maf_block: MafBlock) -> MafBlock:
     """Left-align indels in a MAF block.
 
     Args:
@@ -42,79 +131,78 @@ def left_align_indels(maf_block):
         The input MAF block, with non-reference indels left-aligned.
     """
 
-    gap_byte_re = re.compile(b"-{1,}")
-    gap_byte_value = ord(b"-")
-
-    try:
-        ref_rec, alt_rec = maf_block
-    except ValueError as exc:
-        if re.match(r"(not enough values to unpack|too many values to unpack)", str(exc)):
-            raise ValueError(
-                f"cannot process MAF alignment; MAF block has {len(maf_block)} sequences"
-            ) from exc
-        raise
+    if maf_block.num_rows != 2:
+        raise ValueError(f"cannot process MAF alignment; MAF block has {maf_block.num_rows} sequences")
 
-    if ref_rec.annotations["strand"] != 1:
+    if maf_block.strands[0] != 1:
         # This function assumes the MAF reference is on the positive strand.
         raise ValueError("cannot process MAF alignment; MAF reference sequence is not on the positive strand")
 
-    ref_seq_str = str(ref_rec.seq)
-    alt_seq_str = str(alt_rec.seq)
-    if "-" in ref_seq_str:
+    ref_seq_bytes = maf_block.seqs[0].view(np.uint8)
+    alt_seq_bytes = maf_block.seqs[1].view(np.uint8)
+    if (ref_seq_bytes == _GAP_BYTE).any():
         # This function assumes the MAF reference is ungapped.
         raise ValueError("cannot process MAF alignment; MAF reference sequence contains gaps")
 
-    if "-" in alt_seq_str:
-        ref_seq_bytes = bytearray(ref_seq_str, encoding="ascii")
-        alt_seq_bytes = bytearray(alt_seq_str, encoding="ascii")
-
-        gap_spans = []
-        for match in gap_byte_re.finditer(alt_seq_bytes):
-            gap_spans.append(match.span())
-
-        for gap_start, gap_stop in gap_spans:
-            # We use byte ranges in the test clause to enable
-            # us to check for case-insensitive equality.
-            while (
-                ref_seq_bytes[gap_stop - 1 : gap_stop].upper()  # ref base aligning with final gap site
-                == alt_seq_bytes[gap_start - 1 : gap_start].upper()  # alt base just before initial gap site
-            ):
-                # Once we've checked for case-insensitive equality,
-                # we can deal with bytes as integer values.
-                alt_seq_bytes[gap_stop - 1] = alt_seq_bytes[gap_start - 1]
-                alt_seq_bytes[gap_start - 1] = gap_byte_value
-                gap_start -= 1
-                gap_stop -= 1
-
-        new_alt_seq_str = Seq(alt_seq_bytes.decode(encoding="ascii"))
-        if new_alt_seq_str != alt_seq_str:
-            alt_rec.seq = Seq(new_alt_seq_str)
-            maf_block = MultipleSeqAlignment([ref_rec, alt_rec])
-
-    return maf_block
+    alt_gap_mask = alt_seq_bytes == _GAP_BYTE
+    if not alt_gap_mask.any():
+        return maf_block
+
+    gap_edges = np.diff(alt_gap_mask.astype(np.int8), prepend=0, append=0)
+    gap_starts = np.flatnonzero(gap_edges == 1)
+    gap_ends = np.flatnonzero(gap_edges == -1)
+    shifts = _find_left_shifts(ref_seq_bytes, alt_seq_bytes, gap_starts, gap_ends)
+    if not shifts.any():
+        return maf_block
+
+    gap_edge_counts = np.zeros(alt_seq_bytes.size + 1, dtype=np.int8)
+    gap_edge_counts[gap_starts - shifts] += 1
+    gap_edge_counts[gap_ends - shifts] -= 1  # shifted gaps may abut, but never overlap
+    new_alt_gap_mask = np.cumsum(gap_edge_counts[:-1], dtype=np.int8) > 0
+
+    # The updated alignment is output as a new alignment block.
+    seqs = maf_block.seqs.copy()
+    new_alt_seq_bytes = seqs[1].view(np.uint8)
+    new_alt_seq_bytes[new_alt_gap_mask] = _GAP_BYTE
+    new_alt_seq_bytes[~new_alt_gap_mask] = alt_seq_bytes[~alt_gap_mask]
+    return MafBlock(
+        seqs,
+        maf_block.srcs,
+        maf_block.starts,
+        maf_block.sizes,
+        maf_block.strands,
+        maf_block.src_sizes,
+    )
+
+
+def left_align_maf_block(maf_block: MafBlock) -> List[MafBlock]:
+    """Returns a list containing the input MAF block with non-reference indels left-aligned."""
+    return [left_align_indels(maf_block)]
 
 
 def main() -> None:
     """Main function of script."""
 
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("input_maf", help="Input MAF file.")
-    parser.add_argument("output_maf", help="Output MAF file with any indels left-aligned.")
+    parser.add_argument("input_maf", help="Input MAF file, which may be gzip- or BGZF-compressed.")
+    parser.add_argument(
+        "output_maf",
+        help="Output MAF file with any indels left-aligned, BGZF-compressed if its name ends in '.gz'.",
+    )
+    parser.add_argument(
+        "--jobs",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of chunks of the input MAF file processed in parallel,"
+        " and of threads compressing the output MAF file if its name ends in '.gz'.",
+    )
     args = parser.parse_args()
 
     with TemporaryDirectory() as tmp_dir:
-        temp_maf = os.path.join(tmp_dir, "temp.maf")
-
-        with (
-            open(args.input_maf, encoding="utf-8") as in_file_obj,
-            open(temp_maf, mode="w", encoding="utf-8") as out_file_obj,
-        ):
-            writer = MafWriter(out_file_obj)
-            writer.write_header()
-            for maf_block in MafIterator(in_file_obj):
-                maf_block = left_align_indels(maf_block)
-                writer.write_alignment(maf_block)
-
+        # The temporary file is named as the output file, so that it is compressed likewise.
+        temp_maf = os.path.join(tmp_dir, os.path.basename(args.output_maf))
+        run_maf_transform(args.input_maf, temp_maf, left_align_maf_block, jobs=args.jobs)
         shutil.move(temp_maf, args.output_maf)
 
 
@@ -13,61 +13,216 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Map MAF src field values."""
+"""Map MAF src field values.
+
+The input MAF file is streamed line by line: the src field of each 's' line is
+mapped, and any block with an unmapped src field is dropped. The input MAF file
+may be gzip- or BGZF-compressed, and the output MAF file is BGZF-compressed if
+its name ends in '.gz'.
+"""
 
 import argparse
 import csv
 import os
 import shutil
 from tempfile import TemporaryDirectory
+from typing import BinaryIO, Dict, Iterable, List, Mapping, Optional, Union
+
+from ensembl.compara.utils.compression import open_input, open_output
+from ensembl.compara.utils.maf import MafRunStats, MafWriter
+
+_DOT_BYTE = ord(".")
+_ZERO_BYTE = ord("0")
+
+
+def load_src_map(src_map_files: Iterable[Union[os.PathLike, str]]) -> Dict[bytes, bytes]:
+    """Loads a MAF src field mapping from HAL mapping TSV files.
+
+    Args:
+        src_map_files: Input MAF src field mapping TSV files.
+
+    Returns:
+        Mapping of old to new src field values, in which any space in a new src
+        field value is replaced by an underscore, as in MAF output.
+
+    Raises:
+        ValueError: If an old src field value is mapped more than once.
+    """
+    src_map = {}
+    for src_map_file in src_map_files:
+        with open(src_map_file, encoding="utf-8") as in_file_obj:
+            reader = csv.DictReader(in_file_obj, delimiter="\t")
+            for row in reader:
+                old_src = f"{row['hal_genome_name']}.{row['hal_sequence_name']}".encode("utf-8")
+                new_src = row["assembly_sequence"].replace(" ", "_").encode("utf-8")
+                if old_src in src_map:
+                    raise ValueError(f"duplicate old src field: {old_src.decode('utf-8')}")
+                src_map[old_src] = new_src
+    return src_map
+
+
+def _format_a_line(line: bytes) -> bytes:
+    """Formats a MAF 'a' line, keeping only its 'score' and 'pass' annotations."""
+    annot_strings = line.strip().split()[1:]
+    if len(annot_strings) != line.count(b"="):
+        raise ValueError("Error parsing alignment - invalid key in 'a' line")
+    annotations = dict(x.split(b"=") for x in annot_strings)
+    return b"a %s\n" % b" ".join(
+        b"%s=%s" % (k, v) for k, v in annotations.items() if k in (b"score", b"pass")
+    )
+
+
+def _get_row_seq(seq: bytes, first_seq: Optional[bytes]) -> bytes:
+    """Returns the aligned sequence of a row, with any dot replaced by the base of the first sequence.
+
+    Raises:
+        ValueError: If the first sequence has a dot, or if the sequence differs in length from the first.
+    """
+    if first_seq is None:
+        if b"." in seq:
+            raise ValueError("Found dot/period in first sequence of alignment")
+        return seq
+    if b"." in seq:
+        seq = bytes(r if c == _DOT_BYTE else c for c, r in zip(seq, first_seq))
+    if len(seq) != len(first_seq):
+        raise ValueError("Sequences must all be the same length")
+    return seq
+
+
+def _format_s_line(src: bytes, fields: List[bytes], seq: bytes) -> bytes:
+    """Formats a MAF 's' line from its fields, with the given src field and aligned sequence."""
+    _, _, start, size, strand, src_size, _ = fields
+    if not (
+        start.isdigit()
+        and size.isdigit()
+        and src_size.isdigit()
+        and start[0] != _ZERO_BYTE
+        and size[0] != _ZERO_BYTE
+        and src_size[0] != _ZERO_BYTE
+    ):
+        # Integer fields other than positive integers without leading zeros are normalised.
+        start, size, src_size = (b"%d" % int(x) for x in (start, size, src_size))
+    strand = b"-" if strand == b"-" else b"+"
+    return (
+        b" ".join((b"s", src.ljust(40), start.rjust(15), size.rjust(5), strand, src_size.rjust(15), seq))
+        + b"\n"
+    )
+
 
-from Bio.AlignIO.MafIO import MafIterator, MafWriter
+def map_maf_src_lines(
+    in_stream: BinaryIO, out_stream: BinaryIO, src_map: Mapping[bytes, bytes]
+) -> MafRunStats:
+    """Maps the src fields of a MAF stream, dropping any block with an unmapped src field.
+
+    Lines are parsed and written as by :func:`ensembl.compara.utils.maf.iter_maf_blocks`
+    and :class:`ensembl.compara.utils.maf.MafWriter`, but each 's' line is only split
+    into its fields, and the lines of a block are buffered until the end of the block.
+
+    Args:
+        in_stream: Input MAF file stream.
+        out_stream: Output MAF file stream.
+        src_map: Mapping of old to new src field values.
+
+    Returns:
+        Block and sequence counts of the run.
+
+    Raises:
+        ValueError: If the input MAF file cannot be parsed.
+    """
+    stats = MafRunStats()
+    out_stream.write(MafWriter.header.encode("utf-8"))
+
+    block_lines: Optional[List[bytes]] = None
+    block_is_mapped = True
+    first_seq: Optional[bytes] = None
+    for line in in_stream:
+        if block_lines is None:
+            if line.startswith(b"a"):
+                block_lines = [_format_a_line(line)]
+                block_is_mapped = True
+                first_seq = None
+            continue
+
+        if line.startswith(b"s"):
+            fields = line.split()
+            if len(fields) != 7:
+                raise ValueError("Error parsing alignment - 's' line must have 7 fields")
+            seq = _get_row_seq(fields[6], first_seq)
+            if first_seq is None:
+                first_seq = seq
+
+            new_src = src_map.get(fields[1])
+            if new_src is None:
+                block_is_mapped = False
+            elif block_is_mapped:
+                block_lines.append(_format_s_line(new_src, fields, seq))
+        elif not line.strip():
+            _write_block(block_lines, block_is_mapped, out_stream, stats)
+            block_lines = None
+        elif line[:1] not in b"ieq#":
+            raise ValueError(f"Error parsing alignment - unexpected line:\n{line.decode('utf-8')}")
+
+    if block_lines is not None:
+        _write_block(block_lines, block_is_mapped, out_stream, stats)
+
+    return stats
+
+
+def _write_block(
+    block_lines: List[bytes], block_is_mapped: bool, out_stream: BinaryIO, stats: MafRunStats
+) -> None:
+    """Writes the buffered lines of a MAF block if all of its src fields were mapped."""
+    stats.input_block_count += 1
+    if block_is_mapped:
+        block_lines.append(b"\n")
+        out_stream.write(b"".join(block_lines))
+        stats.output_block_count += 1
+        stats.output_seq_count += len(block_lines) - 2
 
 
 def main() -> None:
     """Main function of script."""
 
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("input_maf", help="Input MAF file.")
-    parser.add_argument("output_maf", help="Output MAF file with src fields updated.")
-    parser.add_argument("--src-map-file", action="append", help="Input MAF src field mapping TSV file.")
+    parser.add_argument("input_maf", help="Input MAF file, which may be gzip- or BGZF-compressed.")
+    parser.add_argument(
+        "output_maf",
+        help="Output MAF file with src fields updated, which is BGZF-compressed if its name ends in '.gz'.",
+    )
+    parser.add_argument(
+        "--src-map-file",
+        action="append",
+        required=True,
+        help="Input MAF src field mapping TSV file. May be specified more than once.",
+    )
     parser.add_argument(
         "--only-seq-name",
         action="store_true",
         help="Output sequence name without its corresponding assembly UUID.",
     )
+    parser.add_argument(
+        "--threads",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of threads compressing the output MAF file if its name ends in '.gz'.",
+    )
 
     args = parser.parse_args()
 
-    src_map = {}
-    for src_map_file in args.src_map_file:
-        with open(src_map_file, encoding="utf-8") as in_file_obj:
-            reader = csv.DictReader(in_file_obj, delimiter="\t")
-            for row in reader:
-                old_src = f"{row['hal_genome_name']}.{row['hal_sequence_name']}"
-                new_src = row["assembly_sequence"]
-                if old_src in src_map:
-                    raise ValueError(f"duplicate old src field: {old_src}")
-                src_map[old_src] = new_src
+    src_map = load_src_map(args.src_map_file)
 
     with TemporaryDirectory() as tmp_dir:
-        temp_maf = os.path.join(tmp_dir, "temp.maf")
+        # The temporary file is named as the output file, so that it is compressed likewise.
+        temp_maf = os.path.join(tmp_dir, os.path.basename(args.output_maf))
 
+        # Compression speed is favoured over size: level 1 is several times faster than
+        # the default level on MAF sequence, and the output size is similar.
         with (
-            open(args.input_maf, encoding="utf-8") as in_file_obj,
-            open(temp_maf, mode="w", encoding="utf-8") as out_file_obj,
+            open_input(args.input_maf, "rb") as in_file_obj,
+            open_output(temp_maf, "wb", threads=args.threads, level=1) as out_file_obj,
         ):
-            writer = MafWriter(out_file_obj)
-            writer.write_header()
-            for maf_block in MafIterator(in_file_obj):
-                num_mapped = 0
-                for rec in maf_block:
-                    if rec.id in src_map:
-                        rec.id = rec.name = src_map[rec.id]
-                        num_mapped += 1
-
-                if num_mapped == len(maf_block):
-                    writer.write_alignment(maf_block)
+            map_maf_src_lines(in_file_obj, out_file_obj, src_map)
 
         shutil.move(temp_maf, args.output_maf)
 
@@ -15,13 +15,204 @@
 # limitations under the License.
 """Merge chain files.
 
-The input chain files are assumed to be named with
-an integer prefix which can be used to order them.
+By default, the input chain files are assumed to be named with
+an integer prefix which can be used to order them, and chains
+are output in that order. Alternatively, chains can be sorted by
+descending score or by reference position, in which case input
+chain files are read in the listed order, and inputs too large
+to sort in memory are sorted in runs and merged from temporary
+files. Chain IDs are renumbered from 1 in output order.
+
+Input chain files may be gzip- or BGZF-compressed, and are read
+ahead by a pool of threads. The merged chain file is
+BGZF-compressed if its name ends in '.gz'.
 """
 
 import argparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+from operator import itemgetter
+import os
 from pathlib import Path
 import re
+import struct
+from tempfile import TemporaryDirectory
+from typing import BinaryIO, Deque, Iterable, Iterator, List, Tuple, Union
+
+from ensembl.compara.utils.compression import open_input, open_output
+
+_CHAIN_HEADER_RE = re.compile(rb"^chain[^\n]*", re.MULTILINE)
+_EXP_CHAIN_COL_COUNT = 13
+_RUN_RECORD_SIZE = struct.Struct("<Q")
+
+
+def _format_chain_header(header: bytes, chain_id: int) -> bytes:
+    """Returns a chain header line, without its newline, with its chain ID replaced."""
+    # A header with single spaces between its columns is updated without splitting it.
+    if (
+        header.count(b" ") == _EXP_CHAIN_COL_COUNT - 1
+        and b"  " not in header
+        and b"\t" not in header
+        and not header.endswith(b" ")
+    ):
+        prefix = header.rpartition(b" ")[0]
+    else:
+        fields = header.split()
+        if len(fields) != _EXP_CHAIN_COL_COUNT:
+            raise ValueError(
+                f"found {len(fields)} columns in chain header, but expected {_EXP_CHAIN_COL_COUNT}"
+            )
+        prefix = b" ".join(fields[:-1])
+    return b"%s %d" % (prefix, chain_id)
+
+
+def renumber_chains(chain_data: bytes, first_chain_id: int) -> Tuple[bytes, int]:
+    """Renumbers the chains of chain file data.
+
+    Only chain header lines are rewritten: all other lines are kept as they are.
+
+    Args:
+        chain_data: Chain file data.
+        first_chain_id: ID of the first chain.
+
+    Returns:
+        A tuple of the renumbered chain file data and the ID of the next chain.
+
+    Raises:
+        ValueError: If a chain header does not have the expected number of columns.
+    """
+    parts = []
+    pos = 0
+    chain_id = first_chain_id
+    for match in _CHAIN_HEADER_RE.finditer(chain_data):
+        parts.append(chain_data[pos : match.start()])
+        parts.append(_format_chain_header(match.group(), chain_id))
+        pos = match.end()
+        chain_id += 1
+    parts.append(chain_data[pos:])
+    return b"".join(parts), chain_id
+
+
+def _split_chain_records(chain_data: bytes) -> List[bytes]:
+    """Returns the chains of chain file data, each ending with a blank line.
+
+    Any lines before the first chain header, such as comment lines, are dropped.
+    """
+    starts = [match.start() for match in _CHAIN_HEADER_RE.finditer(chain_data)]
+    ends = starts[1:] + [len(chain_data)]
+    return [chain_data[start:end].rstrip(b"\n") + b"\n\n" for start, end in zip(starts, ends)]
+
+
+def _get_sort_key(chain_record: bytes, sort_by: str) -> Tuple:
+    """Returns the sort key of a chain: descending score, or reference name, start and end."""
+    fields = chain_record[: chain_record.find(b"\n")].split()
+    if len(fields) != _EXP_CHAIN_COL_COUNT:
+        raise ValueError(f"found {len(fields)} columns in chain header, but expected {_EXP_CHAIN_COL_COUNT}")
+    if sort_by == "score":
+        return (-float(fields[1]),)
+    return (fields[2], int(fields[5]), int(fields[6]))
+
+
+def _write_run(keyed_records: List[Tuple[Tuple, bytes]], run_file: Path) -> None:
+    """Sorts keyed chains, and writes them to a run file as length-prefixed records."""
+    keyed_records.sort(key=itemgetter(0))
+    with open(run_file, "wb") as out_file_obj:
+        for _key, chain_record in keyed_records:
+            out_file_obj.write(_RUN_RECORD_SIZE.pack(len(chain_record)))
+            out_file_obj.write(chain_record)
+
+
+def _iter_run(run_file: Path, sort_by: str) -> Iterator[Tuple[Tuple, bytes]]:
+    """Reads the keyed chains of a run file in order."""
+    with open(run_file, "rb") as in_file_obj:
+        while record_size_bytes := in_file_obj.read(_RUN_RECORD_SIZE.size):
+            (record_size,) = _RUN_RECORD_SIZE.unpack(record_size_bytes)
+            chain_record = in_file_obj.read(record_size)
+            yield _get_sort_key(chain_record, sort_by), chain_record
+
+
+def write_sorted_chains(
+    chain_data_iter: Iterable[bytes], out_stream: BinaryIO, sort_by: str, buffer_size: int, tmp_dir: Path
+) -> int:
+    """Sorts and renumbers the chains of chain file data in bounded memory.
+
+    Chains with equal sort keys are kept in input order. Once the chains held in
+    memory reach the buffer size, they are sorted and written to a run file in the
+    temporary directory, and run files are then merged.
+
+    Args:
+        chain_data_iter: Chain file data, in input order.
+        out_stream: Output binary stream.
+        sort_by: Either 'score' to sort by descending score, or 'position' to sort
+            by reference sequence name, start and end.
+        buffer_size: Approximate maximum size in bytes of chains held in memory.
+        tmp_dir: Directory of temporary run files.
+
+    Returns:
+        The number of chains written.
+
+    Raises:
+        ValueError: If a chain header does not have the expected number of columns.
+    """
+    keyed_records: List[Tuple[Tuple, bytes]] = []
+    buffered_size = 0
+    run_files: List[Path] = []
+    for chain_data in chain_data_iter:
+        for chain_record in _split_chain_records(chain_data):
+            keyed_records.append((_get_sort_key(chain_record, sort_by), chain_record))
+            buffered_size += len(chain_record)
+            if buffered_size >= buffer_size:
+                run_files.append(tmp_dir / f"run_{len(run_files)}.bin")
+                _write_run(keyed_records, run_files[-1])
+                keyed_records = []
+                buffered_size = 0
+
+    sorted_records: Iterable[Tuple[Tuple, bytes]]
+    if run_files:
+        if keyed_records:
+            run_files.append(tmp_dir / f"run_{len(run_files)}.bin")
+            _write_run(keyed_records, run_files[-1])
+        # The merge is stable, since runs are merged in input order.
+        sorted_records = heapq.merge(*(_iter_run(x, sort_by) for x in run_files), key=itemgetter(0))
+    else:
+        keyed_records.sort(key=itemgetter(0))
+        sorted_records = keyed_records
+
+    chain_id = 0
+    for chain_id, (_key, chain_record) in enumerate(sorted_records, start=1):
+        header_end = chain_record.find(b"\n")
+        out_stream.write(_format_chain_header(chain_record[:header_end], chain_id))
+        out_stream.write(chain_record[header_end:])
+    return chain_id
+
+
+def _read_chain_file(chain_file: Union[os.PathLike, str]) -> bytes:
+    """Returns the decompressed data of a chain file."""
+    with open_input(chain_file, "rb") as in_file_obj:
+        return in_file_obj.read()
+
+
+def iter_chain_file_data(chain_files: Iterable[Union[os.PathLike, str]], threads: int) -> Iterator[bytes]:
+    """Reads chain files in order, reading ahead in a pool of threads.
+
+    At most two files per thread are read ahead of the file being yielded.
+
+    Args:
+        chain_files: Input chain files, which may be gzip- or BGZF-compressed.
+        threads: Number of threads reading chain files.
+
+    Yields:
+        The decompressed data of each chain file.
+    """
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for chain_file in chain_files:
+            pending.append(executor.submit(_read_chain_file, chain_file))
+            if len(pending) > 2 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 def main() -> None:
@@ -30,34 +221,50 @@ def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("chain_list_file", help="Input file listing chain files to merge, one per line.")
     parser.add_argument("merged_chain_file", help="Output merged chain file.")
+    parser.add_argument(
+        "--sort-by",
+        choices=["file-name", "score", "position"],
+        default="file-name",
+        help="Order of output chains: by integer prefix of input file name, by descending"
+        " chain score, or by reference sequence name, start and end.",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        metavar="BYTES",
+        type=int,
+        default=2**30,
+        help="Approximate maximum size of chains held in memory when sorting by score or position.",
+    )
+    parser.add_argument(
+        "--threads",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of threads reading input chain files ahead, and compressing"
+        " the merged chain file if its name ends in '.gz'.",
+    )
 
     args = parser.parse_args()
 
     with open(args.chain_list_file, encoding="utf-8") as in_file_obj:
         chain_file_paths = [Path(line.rstrip()) for line in in_file_obj]
 
-    greedy_file_suffix_re = re.compile(r"\..+$")
-
-    chain_file_paths.sort(key=lambda x: int(greedy_file_suffix_re.sub("", str(x.name))))
-
-    exp_chain_col_count = 13
-    next_chain_id = 1
-    with open(args.merged_chain_file, mode="w", encoding="utf-8") as out_file_obj:
-        for chain_file_path in chain_file_paths:
-            with open(chain_file_path, encoding="utf-8") as in_file_obj:
-                for line in in_file_obj:
-                    if line.startswith("chain"):
-                        line = line.rstrip()
-                        fields = line.split()
-                        if len(fields) != exp_chain_col_count:
-                            raise ValueError(
-                                f"found {len(fields)} columns in chain header,"
-                                f" but expected {exp_chain_col_count}"
-                            )
-                        fields[-1] = str(next_chain_id)
-                        line = " ".join(fields) + "\n"
-                        next_chain_id += 1
-                    out_file_obj.write(line)
+    if args.sort_by == "file-name":
+        greedy_file_suffix_re = re.compile(r"\..+$")
+        chain_file_paths.sort(key=lambda x: int(greedy_file_suffix_re.sub("", str(x.name))))
+
+    chain_data_iter = iter_chain_file_data(chain_file_paths, args.threads)
+    with open_output(args.merged_chain_file, "wb", threads=args.threads) as out_file_obj:
+        if args.sort_by == "file-name":
+            next_chain_id = 1
+            for chain_data in chain_data_iter:
+                renumbered_data, next_chain_id = renumber_chains(chain_data, next_chain_id)
+                out_file_obj.write(renumbered_data)
+        else:
+            with TemporaryDirectory(dir=Path(args.merged_chain_file).parent) as tmp_dir:
+                write_sorted_chains(
+                    chain_data_iter, out_file_obj, args.sort_by, args.buffer_size, Path(tmp_dir)
+                )
 
 
 if __name__ == "__main__":
@@ -16,106 +16,138 @@
 """Process Cactus MAF file according to specified parameters."""
 
 import argparse
+from functools import partial
 import json
 import os
 import shutil
 from tempfile import TemporaryDirectory
-from typing import Iterator, TextIO
+from typing import List, Tuple
 
-from Bio.Align import MultipleSeqAlignment
-from Bio.AlignIO.MafIO import MafIterator, MafWriter
-from Bio.Seq import Seq
 import numpy as np
 
+from ensembl.compara.utils.maf import MafBlock, read_maf_block_count, run_maf_transform
 
-def _make_overhang_column_mask(aln_block: MultipleSeqAlignment, block_arr: np.ndarray) -> np.ndarray:
-    """Returns an overhang column mask for the input alignment block.
 
-    The overhang column mask is expected to be used to filter overhang columns
-    at either end of the alignment block. If an overhang is identified at the
-    start of the block, this function will also update the annotations of the
-    input alignment block so that they reflect the overhang removal.
+def _find_overhangs(maf_block: MafBlock, gap_mask: np.ndarray, gap_col_mask: np.ndarray) -> Tuple[int, int]:
+    """Returns the overhang lengths of the input alignment block.
+
+    An overhang is a run of columns at either end of the alignment block in
+    which only one row is ungapped. Gap-only columns are ignored, and are not
+    counted in overhang lengths. If an overhang is identified, this function
+    will also update the start and size of the overhanging row so that they
+    reflect the overhang removal.
 
     Args:
-        aln_block: Input multiple sequence alignment block.
-        block_arr: A NumPy array of sequence data for ``aln_block``.
-            Due to the way this internal function is used, this array does
-            not necessarily have the same number of columns as ``aln_block``.
+        maf_block: Input MAF block.
+        gap_mask: Boolean gap mask of the sequences of ``maf_block``.
+        gap_col_mask: Boolean mask of the gap-only columns of ``maf_block``.
 
     Returns:
-        An overhang column mask, which may be used to remove
-        overhang columns from the input alignment.
+        Numbers of columns, excluding gap-only columns, in the left and right overhangs.
     """
-    gap_mask = block_arr.transpose() == b"-"
-    gap_mask_first_col = gap_mask[0]
-    gap_mask_final_col = gap_mask[-1]
+    kept_col_idxs = np.flatnonzero(~gap_col_mask)
+    num_rows = maf_block.num_rows
+    if num_rows < 2 or kept_col_idxs.size < 2:
+        return 0, 0
+
+    end_gap_masks = gap_mask[:, kept_col_idxs[[0, -1]]]
+    overhang_lengths = np.zeros(2, dtype=np.int64)
+    for end_idx in np.flatnonzero(end_gap_masks.sum(axis=0) == num_rows - 1):
+        # An overhang ends at the first column with a different gap pattern from the end column.
+        change_mask = (gap_mask != end_gap_masks[:, end_idx, np.newaxis]).any(axis=0) & ~gap_col_mask
+        if not change_mask.any():
+            continue
+        if end_idx == 0:
+            overhang_lengths[0] = np.searchsorted(kept_col_idxs, change_mask.argmax())
+        else:
+            final_change_col_idx = change_mask.size - 1 - change_mask[::-1].argmax()
+            overhang_lengths[1] = kept_col_idxs.size - np.searchsorted(
+                kept_col_idxs, final_change_col_idx, side="right"
+            )
+
+    overhang_row_idxs = end_gap_masks.argmin(axis=0)
+    np.subtract.at(maf_block.sizes, overhang_row_idxs, overhang_lengths)
+    maf_block.starts[overhang_row_idxs[0]] += overhang_lengths[0]
+    return int(overhang_lengths[0]), int(overhang_lengths[1])
+
+
+def trim_maf_block(maf_block: MafBlock) -> MafBlock:
+    """Trims gap-only and overhang columns out of a MAF block.
 
-    num_rows = len(aln_block)
-    num_cols = len(gap_mask)
+    Args:
+        maf_block: Input MAF block, which is updated in place.
 
-    if num_rows > 1 and num_cols > 1:
-        left_overhang_found = gap_mask_first_col.sum() == num_rows - 1
-        right_overhang_found = gap_mask_final_col.sum() == num_rows - 1
+    Returns:
+        The input MAF block, with gap-only and overhang columns removed.
+    """
+    gap_mask = maf_block.seqs.view(np.uint8) == ord("-")
+    gap_col_mask = gap_mask.all(axis=0)
+    left_overhang_length, right_overhang_length = _find_overhangs(maf_block, gap_mask, gap_col_mask)
+
+    kept_col_idxs = np.flatnonzero(~gap_col_mask)
+    kept_col_idxs = kept_col_idxs[left_overhang_length : kept_col_idxs.size - right_overhang_length]
+    if kept_col_idxs.size == 0:
+        maf_block.seqs = maf_block.seqs[:, :0]
+    elif kept_col_idxs[-1] - kept_col_idxs[0] + 1 == kept_col_idxs.size:
+        # The kept columns are contiguous, so they can be sliced without copying.
+        maf_block.seqs = maf_block.seqs[:, kept_col_idxs[0] : kept_col_idxs[-1] + 1]
     else:
-        left_overhang_found = right_overhang_found = False
-
-    overhang_mask = np.zeros((num_cols,), dtype=bool)
-    if left_overhang_found or right_overhang_found:
-        col_idxs = range(num_cols)
-
-        if left_overhang_found:
-            for col_idx in col_idxs:
-                if not np.array_equal(gap_mask[col_idx], gap_mask_first_col):
-                    first_non_overhang_col_idx = col_idx
-                    break
-            overhang_mask[:first_non_overhang_col_idx] = True
-            left_overhang_length = first_non_overhang_col_idx
-            left_overhang_row_idx = int(np.flatnonzero(~gap_mask_first_col)[0])
-            left_overhang_row = aln_block[left_overhang_row_idx]
-            left_overhang_row.annotations["size"] -= left_overhang_length
-            left_overhang_row.annotations["start"] += left_overhang_length
-
-        if right_overhang_found:
-            for col_idx in reversed(col_idxs):
-                if not np.array_equal(gap_mask[col_idx], gap_mask_final_col):
-                    final_non_overhang_col_idx = col_idx
-                    break
-            overhang_mask[final_non_overhang_col_idx + 1 :] = True
-            right_overhang_length = num_cols - (final_non_overhang_col_idx + 1)
-            right_overhang_row_idx = int(np.flatnonzero(~gap_mask_final_col)[0])
-            right_overhang_row = aln_block[right_overhang_row_idx]
-            right_overhang_row.annotations["size"] -= right_overhang_length
-
-    return overhang_mask
-
-
-def trimming_maf_iterator(stream: TextIO) -> Iterator[MultipleSeqAlignment]:
-    """Yields a MAF block with gap-only and overhang columns trimmed out."""
-    for aln_block in MafIterator(stream):
-        gap_arrays =[np.array([b"-"]) for _ in range(len(aln_block))]
-        gap_column = np.vstack(gap_arrays)
-        block_arr = np.array(aln_block, dtype=bytes)
-
-        gap_col_mask = (block_arr == gap_column).all(axis=0)
-        gap_cols_found = gap_col_mask.any()
-        if gap_cols_found:
-            block_arr = block_arr[:, ~gap_col_mask]
-
-        overhang_col_mask = _make_overhang_column_mask(aln_block, block_arr)
-        overhang_found = overhang_col_mask.any()
-        if overhang_found:
-            block_arr = block_arr[:, ~overhang_col_mask]
-
-        if gap_cols_found or overhang_found:
-            for row_arr, aln_row in zip(block_arr, aln_block):
-                aln_row.seq = Seq(row_arr.tobytes().decode("ascii"))
-        yield aln_block
+        maf_block.seqs = maf_block.seqs[:, kept_col_idxs]
+    return maf_block
 
 
-if __name__ == "__main__":
+def process_maf_block(
+    maf_block: MafBlock, min_block_rows: int, min_block_cols: int, min_seq_length: int
+) -> List[MafBlock]:
+    """Trims and filters a MAF block.
+
+    Args:
+        maf_block: Input MAF block.
+        min_block_rows: Minimum number of alignment rows per block.
+        min_block_cols: Minimum number of alignment columns per block.
+        min_seq_length: Minimum unaligned sequence length of each aligned sequence.
+
+    Returns:
+        A list containing the processed MAF block, or an empty list if the block is filtered out.
+    """
+    # We need to remove gap-only columns before we apply any other filters.
+    maf_block = trim_maf_block(maf_block)
+    if maf_block.num_cols < min_block_cols:
+        return []
+
+    processed_block = maf_block.take_rows(maf_block.sizes >= min_seq_length)
+    if processed_block.num_rows < min_block_rows:
+        return []
+
+    processed_block.annotations = None  # output as a new alignment block
+    return [processed_block]
+
+
+def check_block_count(block_count: int, expected_block_count: int) -> None:
+    """Checks that the number of input blocks matches the expected block count.
+
+    Args:
+        block_count: Number of input blocks.
+        expected_block_count: Expected number of input blocks.
+
+    Raises:
+        RuntimeError: If the number of input blocks does not match the expected block count.
+    """
+    if block_count != expected_block_count:
+        raise RuntimeError(
+            f"Number of input blocks ({block_count}) does"
+            f" not match expected block count ({expected_block_count})"
+        )
+
+
+def main() -> None:
+    """Main function of script."""
+
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("input_maf", help="Input MAF file.")
-    parser.add_argument("processed_maf", help="Output processed MAF file.")
+    parser.add_argument("input_maf", help="Input MAF file, which may be gzip- or BGZF-compressed.")
+    parser.add_argument(
+        "processed_maf", help="Output processed MAF file, BGZF-compressed if its name ends in '.gz'."
+    )
 
     parser.add_argument(
         "--min-block-rows",
@@ -148,52 +180,35 @@ if __name__ == "__main__":
         "--dataflow-file",
         help="Optional dataflow JSON file.",
     )
+    parser.add_argument(
+        "--jobs",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of chunks of the input MAF file processed in parallel,"
+        " and of threads compressing the output MAF file if its name ends in '.gz'.",
+    )
     args = parser.parse_args()
 
-    stats_col_names = [
-        "block_count_before_processing",
-        "block_count_after_processing",
-        "seq_count_after_processing",
-    ]
-
-    stats = dict.fromkeys(stats_col_names, 0)
-
     with TemporaryDirectory() as tmp_dir:
-        temp_maf = os.path.join(tmp_dir, "temp.maf")
-        with (
-            open(args.input_maf, encoding="utf-8") as in_file_obj,
-            open(temp_maf, "w", encoding="utf-8") as out_file_obj,
-        ):
-            writer = MafWriter(out_file_obj)
-            writer.write_header()
-
-            # The trimming_maf_iterator is not the most elegant or speedy solution, but
-            # we need to remove gap-only columns before we apply any other filters.
-            for maf_block in trimming_maf_iterator(in_file_obj):
-                stats["block_count_before_processing"] += 1
-
-                if maf_block.get_alignment_length() < args.min_block_cols:
-                    continue
-
-                processed_block = MultipleSeqAlignment([])
-                for rec in maf_block:
-                    if rec.annotations["size"] < args.min_seq_length:
-                        continue
-                    processed_block.append(rec)
-
-                if len(processed_block) < args.min_block_rows:
-                    continue
-
-                writer.write_alignment(processed_block)
-                stats["seq_count_after_processing"] += len(processed_block)
-                stats["block_count_after_processing"] += 1
+        # The temporary file is named as the output file, so that it is compressed likewise.
+        temp_maf = os.path.join(tmp_dir, os.path.basename(args.processed_maf))
+        transform = partial(
+            process_maf_block,
+            min_block_rows=args.min_block_rows,
+            min_block_cols=args.min_block_cols,
+            min_seq_length=args.min_seq_length,
+        )
+        if args.expected_block_count:
+            # If the input MAF file has an up-to-date index, its block count can be checked up front.
+            indexed_block_count = read_maf_block_count(args.input_maf)
+            if indexed_block_count is not None:
+                check_block_count(indexed_block_count, args.expected_block_count)
+
+        stats = run_maf_transform(args.input_maf, temp_maf, transform, jobs=args.jobs)
 
         if args.expected_block_count:
-            if stats["block_count_before_processing"] != args.expected_block_count:
-                raise RuntimeError(
-                    f"Number of input blocks ({stats['block_count_before_processing']}) does"
-                    f" not match expected block count ({args.expected_block_count})"
-                )
+            check_block_count(stats.input_block_count, args.expected_block_count)
 
         shutil.move(temp_maf, args.processed_maf)
 
@@ -202,11 +217,15 @@ if __name__ == "__main__":
         dataflow_json = json.dumps(
             {
                 "maf_file": args.processed_maf,
-                "maf_block_count": stats["block_count_after_processing"],
-                "maf_seq_count": stats["seq_count_after_processing"],
+                "maf_block_count": stats.output_block_count,
+                "maf_seq_count": stats.output_seq_count,
             }
         )
         dataflow_event = f"{dataflow_branch} {dataflow_json}"
 
         with open(args.dataflow_file, "w", encoding="utf-8") as out_file_obj:
             print(dataflow_event, file=out_file_obj)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,98 +23,74 @@ this script splits each MAF block into one or more gapless MAF blocks.
 import argparse
 import json
 import os
-import re
 import shutil
 from tempfile import TemporaryDirectory
 
-from Bio.Align import MultipleSeqAlignment
-from Bio.AlignIO.MafIO import MafIterator, MafWriter
-from Bio.SeqRecord import SeqRecord
+import numpy as np
+
+from ensembl.compara.utils.maf import MafBlock, MafBlockSlices, run_maf_transform
+
+_GAP_BYTE = ord("-")
+
+
+def split_maf_block(maf_block: MafBlock) -> MafBlockSlices:
+    """Splits a MAF block on gaps in its non-reference sequence.
+
+    Args:
+        maf_block: An input MAF block with two sequences, in which the reference sequence is ungapped.
+
+    Returns:
+        Gapless MAF blocks, in alignment order, as slices of the input MAF block.
+
+    Raises:
+        ValueError: If the MAF block does not have two sequences, or if its reference sequence has gaps.
+    """
+    if maf_block.num_rows != 2:
+        raise ValueError(f"cannot process MAF alignment; MAF block has {maf_block.num_rows} sequences")
+    seq_bytes = maf_block.seqs.view(np.uint8)
+    if (seq_bytes[0] == _GAP_BYTE).any():
+        raise ValueError("cannot process MAF alignment; reference sequence contains gaps")
+
+    # Find the ungapped runs of the non-reference sequence.
+    alt_ungapped = np.zeros(maf_block.num_cols + 2, dtype=bool)
+    np.not_equal(seq_bytes[1], _GAP_BYTE, out=alt_ungapped[1:-1])
+    run_bounds = np.flatnonzero(alt_ungapped[1:] != alt_ungapped[:-1])
+    chunk_starts = run_bounds[::2]
+    chunk_stops = run_bounds[1::2]
+    chunk_lengths = chunk_stops - chunk_starts
+    chunk_row_starts = np.empty((chunk_starts.size, 2), dtype=np.int64)
+    chunk_row_starts[:, 0] = chunk_starts + maf_block.starts[0]
+    chunk_row_starts[:, 1] = np.cumsum(chunk_lengths) - chunk_lengths + maf_block.starts[1]
+
+    return MafBlockSlices(
+        maf_block, chunk_starts, chunk_stops, chunk_row_starts, np.repeat(chunk_lengths, 2).reshape(-1, 2)
+    )
 
 
 def main() -> None:
     """Main function of script."""
 
-    maf_keys = ["start", "strand", "srcSize"]  # these MAF fields are stored in SeqRecord annotations
-    ungapped_re = re.compile("[^-]+")
-
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("input_maf", help="Input MAF file.")
-    parser.add_argument("output_maf", help="Output MAF file with ungapped alignment blocks.")
+    parser.add_argument("input_maf", help="Input MAF file, which may be gzip- or BGZF-compressed.")
+    parser.add_argument(
+        "output_maf",
+        help="Output MAF file with ungapped alignment blocks, BGZF-compressed if its name ends in '.gz'.",
+    )
     parser.add_argument("--dataflow-file", help="Optional dataflow JSON file.")
+    parser.add_argument(
+        "--jobs",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="Number of chunks of the input MAF file processed in parallel,"
+        " and of threads compressing the output MAF file if its name ends in '.gz'.",
+    )
     args = parser.parse_args()
 
-    stats_col_names = [
-        "block_count_after_processing",
-        "seq_count_after_processing",
-    ]
-
-    stats = dict.fromkeys(stats_col_names, 0)
-
     with TemporaryDirectory() as tmp_dir:
-        temp_maf = os.path.join(tmp_dir, "temp.maf")
-
-        with (
-            open(args.input_maf, encoding="utf-8") as in_file_obj,
-            open(temp_maf, mode="w", encoding="utf-8") as out_file_obj,
-        ):
-            writer = MafWriter(out_file_obj)
-            writer.write_header()
-            for maf_block in MafIterator(in_file_obj):
-                try:
-                    ref_rec, alt_rec = maf_block
-                except ValueError as exc:
-                    raise ValueError(
-                        f"cannot process MAF alignment; MAF block has {len(maf_block)} sequences"
-                    ) from exc
-                if "-" in ref_rec.seq:
-                    raise ValueError("cannot process MAF alignment; reference sequence contains gaps")
-
-                ref_start, ref_strand, ref_src_size = (ref_rec.annotations[k] for k in maf_keys)
-                alt_start, alt_strand, alt_src_size = (alt_rec.annotations[k] for k in maf_keys)
-
-                cumul_chunk_length = 0
-                for match in ungapped_re.finditer(str(alt_rec.seq)):
-                    chunk_start, chunk_stop = match.span()
-                    chunk_length = chunk_stop - chunk_start
-
-                    chunk_ref_seq = ref_rec.seq[chunk_start:chunk_stop]
-                    chunk_ref_annot = {
-                        "start": ref_start + chunk_start,
-                        "size": chunk_length,
-                        "strand": ref_strand,
-                        "srcSize": ref_src_size,
-                    }
-                    chunk_ref_rec = SeqRecord(
-                        seq=chunk_ref_seq,
-                        id=ref_rec.id,
-                        name=ref_rec.name,
-                        description=ref_rec.description,
-                        annotations=chunk_ref_annot,
-                    )
-
-                    chunk_alt_seq = alt_rec.seq[chunk_start:chunk_stop]
-                    chunk_alt_annot = {
-                        "start": alt_start + cumul_chunk_length,
-                        "size": chunk_length,
-                        "strand": alt_strand,
-                        "srcSize": alt_src_size,
-                    }
-                    chunk_alt_rec = SeqRecord(
-                        seq=chunk_alt_seq,
-                        id=alt_rec.id,
-                        name=alt_rec.name,
-                        description=alt_rec.description,
-                        annotations=chunk_alt_annot,
-                    )
-
-                    chunk = MultipleSeqAlignment([chunk_ref_rec, chunk_alt_rec])
-                    writer.write_alignment(chunk)
-                    cumul_chunk_length += chunk_length
-
-                    stats["seq_count_after_processing"] += len(chunk)
-                    stats["block_count_after_processing"] += 1
-
+        # The temporary file is named as the output file, so that it is compressed likewise.
+        temp_maf = os.path.join(tmp_dir, os.path.basename(args.output_maf))
+        stats = run_maf_transform(args.input_maf, temp_maf, split_maf_block, jobs=args.jobs)
         shutil.move(temp_maf, args.output_maf)
 
     if args.dataflow_file:
@@ -122,8 +98,8 @@ def main() -> None:
         dataflow_json = json.dumps(
             {
                 "maf_file": args.output_maf,
-                "maf_block_count": stats["block_count_after_processing"],
-                "maf_seq_count": stats["seq_count_after_processing"],
+                "maf_block_count": stats.output_block_count,
+                "maf_seq_count": stats.output_seq_count,
             }
         )
         dataflow_event = f"{dataflow_branch} {dataflow_json}"
@@ -15,9 +15,10 @@
 """CITest plugin for pytest."""
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
-from typing import Dict, Iterator, Optional
+from typing import Dict, Iterator, List, Optional
 
 import py
 import pytest
@@ -42,6 +43,8 @@ def pytest_addoption(parser: Parser) -> None:
                     help="URL to target database")
     group.addoption('--target-dir', action='store', metavar='PATH', dest='target_dir',
                     help="Path to target root directory")
+    group.addoption('--db-workers', action='store', type=int, default=4, metavar='INT', dest='db_workers',
+                    help="Number of threads querying the reference and target databases (default: 4)")
 
 
 def pytest_collect_file(parent: pytest.Session, path: py.path.local) -> Optional[pytest.File]:
@@ -54,6 +57,24 @@ def pytest_collect_file(parent: pytest.Session, path: py.path.local) -> Optional
 def pytest_sessionstart(session: pytest.Session) -> None:
     """Adds required variables to the session before entering the run test loop."""
     session.report = {}
+    # Database connection handlers are shared by URL, so all the tests use the same connection pools
+    session.db_connections = {}
+    session.db_executor = ThreadPoolExecutor(max_workers=max(1, session.config.getoption('db_workers')))
+    # Location in the CITest JSON file of the test entry of each collected item
+    session.test_entries = {}
+
+
+def pytest_collection_finish(session: pytest.Session) -> None:
+    """Prepares the prefetching of database tests once the final list of items to run is known."""
+    db_items = [item for item in session.items if isinstance(item, CITestDBItem)]
+    # Keep up to two queries per thread ahead of the test being run to bound the memory used
+    session.db_prefetcher = DBPrefetcher(db_items, 2 * max(1, session.config.getoption('db_workers')))
+
+
+def pytest_runtest_setup(item: pytest.Item) -> None:
+    """Starts prefetching the data of the upcoming database tests."""
+    if isinstance(item, CITestDBItem):
+        item.session.db_prefetcher.advance(item)
 
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
@@ -67,6 +88,8 @@ def pytest_runtest_makereport(item: pytest.Item) -> TestReport:
 
 def pytest_sessionfinish(session: pytest.Session) -> None:
     """Generates a custom report before returning the exit status to the system."""
+    # Discard any prefetched data of tests that have not been run, e.g. if the session was interrupted
+    session.db_executor.shutdown(cancel_futures=True)
     # Use the configuration JSON file as template for the report
     config_filename = session.config.getoption('file_or_dir')[0]
     with open(config_filename) as f:
@@ -77,20 +100,17 @@ def pytest_sessionfinish(session: pytest.Session) -> None:
     # Add the reported information of each test
     failed = 0
     for item, report in session.report.items():
-        if isinstance(item, CITestDBItem):
-            test_list = full_report['database_tests'][item.table]
-        else:
-            test_list = full_report['files_tests']
-        for test in test_list:
-            # Find the test entry corresponding to this item
-            if (test['test'] == item.name) and (test['args'] == item.args):
-                test['status'] = report.outcome.capitalize()
-                if report.failed:
-                    failed += 1
-                    test['error'] = OrderedDict([('message', report.longreprtext)])
-                    if item.error_info:
-                        test['error']['details'] = item.error_info
-                break
+        # Find the test entry corresponding to this item
+        section, *keys = session.test_entries[item]
+        test = full_report[section]
+        for key in keys:
+            test = test[key]
+        test['status'] = report.outcome.capitalize()
+        if report.failed:
+            failed += 1
+            test['error'] = OrderedDict([('message', report.longreprtext)])
+            if item.error_info:
+                test['error']['details'] = item.error_info
     # Save full report in a JSON file with the same name as the citest JSON file
     report_filename = os.path.basename(config_filename).rsplit(".", 1)[0] + ".report.json"
     # Make sure not to overwrite previous reports
@@ -127,17 +147,20 @@ class JsonFile(pytest.File):
             # Load the reference and target DBs
             ref_url = self._get_arg(pipeline_tests, 'reference_db')
             target_url = self._get_arg(pipeline_tests, 'target_db')
-            ref_dbc = DBConnection(ref_url)
-            target_dbc = DBConnection(target_url)
+            ref_dbc = self._get_db_connection(ref_url)
+            target_dbc = self._get_db_connection(target_url)
             for table, test_list in pipeline_tests['database_tests'].items():
-                for test in test_list:
+                for i, test in enumerate(test_list):
                     # Ensure required keys are present in every test
                     if 'test' not in test:
                         raise AttributeError(f"Missing argument 'test' in database_tests['{table}']")
                     if 'args' not in test:
                         raise AttributeError(
                             f"Missing argument 'args' in database_tests['{table}']['{test['test']}']")
-                    yield CITestDBItem(test['test'], self, ref_dbc, target_dbc, table, test['args'])
+                    db_item = CITestDBItem(test['test'], self, ref_dbc, target_dbc, table, test['args'],
+                                           self.session.db_executor)
+                    self.session.test_entries[db_item] = ('database_tests', table, i)
+                    yield db_item
         if 'files_tests' in pipeline_tests:
             # Load the reference and target directory paths
             ref_path = os.path.expandvars(self._get_arg(pipeline_tests, 'reference_dir'))
@@ -149,7 +172,20 @@ class JsonFile(pytest.File):
                     raise AttributeError(f"Missing argument 'test' in files_tests #{i}")
                 if 'args' not in test:
                     raise AttributeError(f"Missing argument 'args' in files_tests #{i}")
-                yield CITestFilesItem(test['test'], self, dir_cmp, test['args'])
+                files_item = CITestFilesItem(test['test'], self, dir_cmp, test['args'])
+                self.session.test_entries[files_item] = ('files_tests', i - 1)
+                yield files_item
+
+    def _get_db_connection(self, url: str) -> DBConnection:
+        """Returns the database connection handler of `url`, shared by all the tests of the session.
+
+        Args:
+            url: URL to the database.
+
+        """
+        if url not in self.session.db_connections:
+            self.session.db_connections[url] = DBConnection(url)
+        return self.session.db_connections[url]
 
     def _get_arg(self, pipeline_tests: Dict, name: str) -> str:
         """Returns the requested parameter from the command line (priority) or the JSON configuration file.
@@ -167,3 +203,30 @@ class JsonFile(pytest.File):
         if not argument:
             raise ValueError(f"Required argument '--{name.replace('_', '-')}' or '{name}' key in JSON file")
         return argument
+
+
+class DBPrefetcher:
+    """Read-ahead of the data of database tests, in the order they will be run.
+
+    Args:
+        db_items: Database tests to run, in order.
+        window: Maximum number of tests to prefetch ahead of the test being run.
+
+    """
+    def __init__(self, db_items: List[CITestDBItem], window: int) -> None:
+        self._db_items = db_items
+        self._positions = {item: i for i, item in enumerate(db_items)}
+        self._window = window
+        self._num_prefetched = 0
+
+    def advance(self, item: CITestDBItem) -> None:
+        """Prefetches the data of `item` and of the database tests following it, up to the window size.
+
+        Args:
+            item: Database test about to be run.
+
+        """
+        end = min(self._positions.get(item, -1) + self._window + 1, len(self._db_items))
+        for db_item in self._db_items[self._num_prefetched:end]:
+            db_item.prefetch()
+        self._num_prefetched = max(self._num_prefetched, end)
@@ -17,7 +17,9 @@
 __all__ = ['CITestDBItem', 'CITestDBError', 'CITestDBContentError', 'CITestDBGroupingError',
            'CITestDBNumRowsError']
 
-from typing import Any, Dict, List, Union
+from concurrent.futures import Executor, Future
+import inspect
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import pandas
 import pytest
@@ -34,6 +36,10 @@ from ._citest import CITestItem
 class CITestDBItem(CITestItem):
     """Generic tests to compare a table in two (analogous) Ensembl Compara MySQL databases.
 
+    If an executor is provided, the reference and target databases are queried concurrently, each through a
+    connection checked out from the connection pool of its handler, and :meth:`CITestDBItem.prefetch()` can
+    start querying both databases before the test is run.
+
     Args:
         name: Name of the test to run.
         parent: The parent collector node.
@@ -41,19 +47,24 @@ class CITestDBItem(CITestItem):
         target_dbc: Target database connection handler.
         table: Table to be tested.
         args: Arguments to pass to the test call.
+        executor: Executor to query the reference and target databases concurrently.
 
     Attributes:
         ref_dbc (DBConnection): Reference database connection handler.
         target_dbc (DBConnection): Target database connection handler.
         table (str): Table to be tested.
+        executor (Optional[Executor]): Executor to query the reference and target databases concurrently.
 
     """
     def __init__(self, name: str, parent: pytest.Item, ref_dbc: DBConnection, target_dbc: DBConnection,
-                 table: str, args: Dict) -> None:
+                 table: str, args: Dict, executor: Optional[Executor] = None) -> None:
         super().__init__(name, parent, args)
         self.ref_dbc = ref_dbc
         self.target_dbc = target_dbc
         self.table = table
+        self.executor = executor
+        # SQL query of the prefetched data and the futures of reference and target data, in that order
+        self._prefetched = None  # type: Optional[Tuple[str, Future, Future]]
 
     def repr_failure(self, excinfo: ExceptionInfo, style: str = None
                     ) -> Union[str, ReprExceptionInfo, ExceptionChainRepr, FixtureLookupErrorRepr]:
@@ -80,6 +91,95 @@ class CITestDBItem(CITestItem):
         """Returns the header to display in the error report."""
         return f"Database table: {self.table}, test: {self.name}"
 
+    def prefetch(self) -> None:
+        """Starts querying the reference and target databases for the data required by this test.
+
+        The queries are submitted to the executor, so that the data of several tests can be retrieved in
+        parallel while earlier tests are being run. Nothing is prefetched if there is no executor, or if the
+        query of the test cannot be composed (any error will be raised when the test is run).
+
+        """
+        if self.executor is None or self._prefetched is not None:
+            return
+        query_method = self._get_query_method()
+        if query_method is None:
+            return
+        parameters = inspect.signature(query_method).parameters
+        try:
+            query = query_method(**{key: value for key, value in self.args.items() if key in parameters})
+        except Exception:  # pylint: disable=broad-exception-caught
+            # This is called while setting up an earlier test: leave the error to be raised by this test
+            return
+        self._prefetched = (str(query), *self._submit_queries(query))
+
+    def _get_query_method(self) -> Optional[Callable[..., Query]]:
+        """Returns the method composing the SQL query of this test, ``None`` if the test is unknown."""
+        return getattr(self, '_query_' + self.name, None)
+
+    def _submit_queries(self, query: Query) -> Tuple[Future, Future]:
+        """Submits `query` to the executor for both reference and target databases."""
+        assert self.executor is not None
+        return (self.executor.submit(_read_sql, query, self.ref_dbc),
+                self.executor.submit(_read_sql, query, self.target_dbc))
+
+    def _read_data(self, query: Query) -> Tuple[pandas.DataFrame, pandas.DataFrame]:
+        """Returns the result of `query` in the reference and target databases (in that order).
+
+        The prefetched data is returned if it was retrieved with the same query.
+
+        """
+        prefetched, self._prefetched = self._prefetched, None
+        if prefetched is not None:
+            query_str, ref_future, target_future = prefetched
+            if query_str == str(query):
+                return ref_future.result(), target_future.result()
+            ref_future.cancel()
+            target_future.cancel()
+        if self.executor is None:
+            return _read_sql(query, self.ref_dbc), _read_sql(query, self.target_dbc)
+        ref_future, target_future = self._submit_queries(query)
+        return ref_future.result(), target_future.result()
+
+    def _query_num_rows(self, group_by: Optional[Union[str, List]] = None,
+                        filter_by: Optional[Union[str, List]] = None) -> Query:
+        """Returns the SQL query of :meth:`CITestDBItem.test_num_rows()`."""
+        # Both databases should have the same table schema
+        table = self.ref_dbc.tables[self.table]
+        columns = [table.columns[col] for col in to_list(group_by)]
+        # Use primary key (if any) in count to improve the query performance
+        primary_keys = self.ref_dbc.get_primary_key_columns(self.table)
+        primary_key_col = table.columns[primary_keys[0]] if primary_keys else None
+        query = select(columns + [func.count(primary_key_col).label('nrows')]).select_from(table)
+        if columns:
+            # ORDER BY to ensure that the results are always in the same order (for the same groups)
+            query = query.group_by(*columns).order_by(*columns)
+        for clause in to_list(filter_by):
+            query = query.where(text(clause))
+        return query
+
+    def _query_content(self, columns: Optional[Union[str, List]] = None,
+                       ignore_columns: Optional[Union[str, List]] = None,
+                       filter_by: Optional[Union[str, List]] = None) -> Query:
+        """Returns the SQL query of :meth:`CITestDBItem.test_content()`.
+
+        Raise:
+            TypeError: If both `columns` and `ignore_columns` are provided.
+
+        """
+        if columns and ignore_columns:
+            raise TypeError("Expected either 'columns' or 'ignore_columns', not both")
+        # Both databases should have the same table schema
+        table = self.ref_dbc.tables[self.table]
+        if columns:
+            db_columns = [table.columns[col] for col in to_list(columns)]
+        else:
+            ignore_columns = to_list(ignore_columns)
+            db_columns = [col for col in table.columns if col.name not in ignore_columns]
+        query = select(db_columns)
+        for clause in to_list(filter_by):
+            query = query.where(text(clause))
+        return query
+
     def test_num_rows(self, variation: float = 0.0, group_by: Union[str, List] = None,
                       filter_by: Union[str, List] = None) -> None:
         """Compares the number of rows between reference and target tables.
@@ -97,22 +197,10 @@ class CITestDBItem(CITestItem):
                 one group.
 
         """
-        # Compose the SQL query from the given parameters (both databases should have the same table schema)
-        table = self.ref_dbc.tables[self.table]
+        query = self._query_num_rows(group_by, filter_by)
         group_by = to_list(group_by)
-        columns = [table.columns[col] for col in group_by]
-        # Use primary key (if any) in count to improve the query performance
-        primary_keys = self.ref_dbc.get_primary_key_columns(self.table)
-        primary_key_col = table.columns[primary_keys[0]] if primary_keys else None
-        query = select(columns + [func.count(primary_key_col).label('nrows')]).select_from(table)
-        if columns:
-            # ORDER BY to ensure that the results are always in the same order (for the same groups)
-            query = query.group_by(*columns).order_by(*columns)
-        for clause in to_list(filter_by):
-            query = query.where(text(clause))
         # Get the number of rows for both databases
-        ref_data = pandas.read_sql(query, self.ref_dbc.connect())
-        target_data = pandas.read_sql(query, self.target_dbc.connect())
+        ref_data, target_data = self._read_data(query)
         if group_by:
             # Check if the groups returned are the same
             merged_data = ref_data.merge(target_data, on=group_by, how='outer', indicator=True)
@@ -148,23 +236,9 @@ class CITestDBItem(CITestItem):
             CITestDBContentError: If one or more rows have different content.
 
         """
-        if columns and ignore_columns:
-            raise TypeError("Expected either 'columns' or 'ignore_columns', not both")
-        # Compose the SQL query from the given parameters (both databases should have the same table schema)
-        table = self.ref_dbc.tables[self.table]
-        if columns:
-            columns = to_list(columns)
-            db_columns = [table.columns[col] for col in columns]
-        else:
-            ignore_columns = to_list(ignore_columns)
-            db_columns = [col for col in table.columns if col.name not in ignore_columns]
-            columns = [col.name for col in db_columns]
-        query = select(db_columns)
-        for clause in to_list(filter_by):
-            query = query.where(text(clause))
+        query = self._query_content(columns, ignore_columns, filter_by)
         # Get the table content for the selected columns
-        ref_data = pandas.read_sql(query, self.ref_dbc.connect())
-        target_data = pandas.read_sql(query, self.target_dbc.connect())
+        ref_data, target_data = self._read_data(query)
         # Check if the size of the returned tables are the same
         # Note: although not necessary, this control provides a better error message
         if ref_data.shape != target_data.shape:
@@ -178,6 +252,12 @@ class CITestDBItem(CITestItem):
             raise CITestDBContentError(self.table, ref_only, target_only, query)
 
 
+def _read_sql(query: Query, dbc: DBConnection) -> pandas.DataFrame:
+    """Returns the result of `query` using a connection checked out from the pool of `dbc`."""
+    with dbc.connect() as connection:
+        return pandas.read_sql(query, connection)
+
+
 class CITestDBError(Exception):
     """Exception subclass created to handle test failures separatedly from unexpected exceptions.
 
@@ -0,0 +1,111 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Chunk task sheet console script module."""
+
+import pathlib
+from typing import Optional, TextIO, Tuple
+
+import click
+
+from ensembl.compara.utils.chunking import (
+    make_seq_chunks,
+    write_coverage_task_sheet,
+    write_liftover_task_sheet,
+)
+from ensembl.compara.utils.ucsc import load_chrom_sizes_file
+
+_chrom_sizes_file_argument = click.argument(
+    "chrom_sizes_file", type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path)
+)
+_num_bins_option = click.option(
+    "-n",
+    "--num-bins",
+    metavar="INT",
+    type=click.IntRange(min=1),
+    required=True,
+    help="Number of task bins.",
+)
+_max_chunk_length_option = click.option(
+    "--max-chunk-length",
+    metavar="INT",
+    type=click.IntRange(min=1),
+    help="Maximum length of a sequence chunk. By default, this is the mean total sequence length of a bin.",
+)
+_output_file_option = click.option(
+    "-o",
+    "--output-file",
+    metavar="FILE",
+    type=click.File("w"),
+    default="-",
+    help="Output task sheet TSV file. By default, output is printed.",
+)
+
+
+@click.group("chunk-task-sheet", context_settings={"show_default": True})
+def main() -> None:
+    """Make task sheets of genome sequence chunks packed into size-balanced task bins.
+
+    Sequences in CHROM_SIZES_FILE that are longer than the maximum chunk length
+    are split into near-equal chunks, and chunks are packed into task bins longest
+    first, each into the bin with the least total length so far.
+    """
+
+
+@main.command("coverage")
+@_chrom_sizes_file_argument
+@_num_bins_option
+@_max_chunk_length_option
+@_output_file_option
+def coverage(
+    chrom_sizes_file: pathlib.Path, num_bins: int, max_chunk_length: Optional[int], output_file: TextIO
+) -> None:
+    """Make a task sheet for 'hal_cov_one_seq_chunk.py --task-sheet'."""
+    seq_chunks = make_seq_chunks(
+        load_chrom_sizes_file(chrom_sizes_file), num_bins, max_chunk_length=max_chunk_length
+    )
+    write_coverage_task_sheet(seq_chunks, output_file)
+
+
+@main.command("liftover")
+@_chrom_sizes_file_argument
+@click.option("--source-genome", metavar="STR", required=True, help="Source genome name.")
+@click.option(
+    "--dest-genome",
+    "dest_genomes",
+    metavar="STR",
+    multiple=True,
+    required=True,
+    help="Destination genome name. May be given more than once.",
+)
+@_num_bins_option
+@_max_chunk_length_option
+@_output_file_option
+def liftover(
+    chrom_sizes_file: pathlib.Path,
+    source_genome: str,
+    dest_genomes: Tuple[str, ...],
+    num_bins: int,
+    max_chunk_length: Optional[int],
+    output_file: TextIO,
+) -> None:
+    """Make a location-level HalCacheChain task sheet of a source genome.
+
+    CHROM_SIZES_FILE is the chrom sizes file of the source genome. Each task bin is
+    lifted over to each destination genome in one HalCacheChain task.
+    """
+    seq_chunks = make_seq_chunks(
+        load_chrom_sizes_file(chrom_sizes_file), num_bins, max_chunk_length=max_chunk_length
+    )
+    write_liftover_task_sheet(seq_chunks, output_file, source_genome, dest_genomes)
@@ -15,34 +15,48 @@
 """HAL liftover console script module."""
 
 from __future__ import annotations
+import asyncio
+import collections
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
 import csv
-import itertools
 import json
 import pathlib
-from tempfile import TemporaryDirectory
-from typing import Any, Dict, Iterable, TextIO, Union
+import sys
+import threading
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 import click
-from cmmodule.mapregion import crossmap_region_file
-from cmmodule.utils import read_chain_file
 
+from ensembl.compara.utils.chain import ChainIndex, load_chain_index
 from ensembl.compara.utils.csv import UnquotedUnixTab
 from ensembl.compara.utils.hal import (
     extract_region_sequences_from_2bit,
-    extract_regions_from_bed,
-    make_src_region_file,
+    make_flanked_src_region,
+    RegionArray,
     SimpleRegion,
 )
-from ensembl.compara.utils.ucsc import load_chrom_sizes_file
+from ensembl.compara.utils.ucsc import ChromSizes, load_chrom_sizes_file
 
 
 def liftover_via_chain(
     src_region: SimpleRegion,
     src_genome: str,
-    src_chr_sizes: Dict[str, int],
+    src_chr_sizes: Mapping[str, int],
     dst_genome: str,
     dst_2bit_file: Union[pathlib.Path, str],
-    map_tree: Dict,
+    chain_index: ChainIndex,
     flank_length: int = 0,
     min_map_ratio: float = 0.85,
 ) -> Dict[str, Any]:
@@ -54,69 +68,491 @@ def liftover_via_chain(
         src_chr_sizes: Source genome chromosome name-to-length mapping.
         dst_genome: Destination genome.
         dst_2bit_file: 2bit file of destination genome sequences.
-        map_tree: Dictionary mapping chromosome name to interval tree.
+        chain_index: Index of the chain file from source to destination genome.
         flank_length: Length of upstream/downstream flanking regions to request.
         min_map_ratio: Minimum ratio of bases mapped to the destination region relative
-            to the total number of bases in the source region. Passed to CrossMap.
+            to the total number of bases in the source region.
 
     Returns:
         Dictionary containing liftover parameters and results.
     """
+    return liftover_regions_via_chain(
+        [src_region],
+        src_genome,
+        src_chr_sizes,
+        dst_genome,
+        dst_2bit_file,
+        chain_index,
+        flank_length=flank_length,
+        min_map_ratio=min_map_ratio,
+    )[0]
+
+
+def liftover_regions_via_chain(
+    src_regions: Iterable[SimpleRegion],
+    src_genome: str,
+    src_chr_sizes: Mapping[str, int],
+    dst_genome: str,
+    dst_2bit_file: Union[pathlib.Path, str],
+    chain_index: ChainIndex,
+    flank_length: int = 0,
+    min_map_ratio: float = 0.85,
+) -> List[Dict[str, Any]]:
+    """Liftover regions using a pairwise assembly chain file.
+
+    All regions are mapped in memory against the chain index, and the sequences
+    of all destination regions are then extracted from the 2bit file together.
+
+    Args:
+        src_regions: Regions to liftover.
+        src_genome: Source genome.
+        src_chr_sizes: Source genome chromosome name-to-length mapping.
+        dst_genome: Destination genome.
+        dst_2bit_file: 2bit file of destination genome sequences.
+        chain_index: Index of the chain file from source to destination genome.
+        flank_length: Length of upstream/downstream flanking regions to request.
+        min_map_ratio: Minimum ratio of bases mapped to the destination region relative
+            to the total number of bases in the source region.
+
+    Returns:
+        List of dictionaries containing liftover parameters and results,
+        one per source region and in the same order.
+
+    Raises:
+        ValueError: If any source region has an unknown chromosome or
+            invalid coordinates, or if ``flank_length`` is negative.
+    """
     _strand_sign_to_num = {"+": 1, "-": -1}
 
-    rec: Dict[str, Any] = {}
-    rec["params"] = {
-        "src_genome": src_genome,
-        "src_chr": src_region.chrom,
-        "src_start": src_region.start + 1,
-        "src_end": src_region.end,
-        "src_strand": _strand_sign_to_num[src_region.strand],
-        "flank": flank_length,
-        "dest_genome": dst_genome,
-    }
-
-    if src_region.name:
-        rec["params"]["src_name"] = src_region.name
-
-    rec["results"] = []
-    with TemporaryDirectory() as tmp_dir:
-        tmp_dir_path = pathlib.Path(tmp_dir)
-
-        src_bed_file = tmp_dir_path / "src_regions.bed"
-        make_src_region_file(
-            src_region.chrom,
-            src_region.start + 1,
-            src_region.end,
-            _strand_sign_to_num[src_region.strand],
-            src_chr_sizes,
-            src_bed_file,
-            flank_length=flank_length,
+    recs = []
+    dst_regions = []
+    for src_region in src_regions:
+        rec: Dict[str, Any] = {}
+        rec["params"] = {
+            "src_genome": src_genome,
+            "src_chr": src_region.chrom,
+            "src_start": src_region.start + 1,
+            "src_end": src_region.end,
+            "src_strand": _strand_sign_to_num[src_region.strand],
+            "flank": flank_length,
+            "dest_genome": dst_genome,
+        }
+
+        if src_region.name:
+            rec["params"]["src_name"] = src_region.name
+
+        rec["results"] = []
+        recs.append(rec)
+
+        flanked_region = make_flanked_src_region(src_region, src_chr_sizes, flank_length=flank_length)
+        mapping = chain_index.map_region(
+            flanked_region.chrom,
+            flanked_region.start,
+            flanked_region.end,
+            flanked_region.strand,
+            min_map_ratio=min_map_ratio,
+        )
+        if mapping is not None:
+            dst_regions.append((rec, SimpleRegion(*mapping)))
+
+    dst_sequences = extract_region_sequences_from_2bit([x for _, x in dst_regions], dst_2bit_file)
+
+    for (rec, dst_region), dst_sequence in zip(dst_regions, dst_sequences):
+        rec["results"].append(
+            {
+                "dest_chr": dst_region.chrom,
+                "dest_start": dst_region.start + 1,
+                "dest_end": dst_region.end,
+                "dest_strand": _strand_sign_to_num[dst_region.strand],
+                "dest_sequence": dst_sequence,
+            }
         )
 
-        dst_bed_file = tmp_dir_path / "dst_regions.bed"
-        crossmap_region_file(map_tree, str(src_bed_file), str(dst_bed_file), min_ratio=min_map_ratio)
-        dst_regions = extract_regions_from_bed(dst_bed_file)
+    return recs
+
+
+def load_source_regions(src_region: Optional[str], src_region_tsv: Optional[TextIO]) -> RegionArray:
+    """Load liftover source regions from either a region string or a region TSV file.
+
+    Args:
+        src_region: A 1-based region string.
+        src_region_tsv: Input TSV file stream with columns 'chr', 'start', 'end',
+            'strand' and optionally 'name'.
+
+    Returns:
+        Array of source regions.
+
+    Raises:
+        RuntimeError: If neither or both of ``src_region`` and ``src_region_tsv`` are set.
+    """
+    if src_region is not None:
+        if src_region_tsv is not None:
+            raise RuntimeError("only one of '--src-region' or '--src-region-tsv' can be set")
+        source_regions = RegionArray.from_region_strings([src_region])
+    elif src_region_tsv is not None:
+        source_regions = RegionArray.from_tsv(src_region_tsv)
+    else:
+        raise RuntimeError("one of '--src-region' or '--src-region-tsv' must be set")
+
+    return source_regions
+
 
-        if not dst_regions:
-            return rec
+def liftover_chromosome_regions(
+    src_regions: Iterable[SimpleRegion],
+    src_genome: str,
+    src_chr_sizes: Mapping[str, int],
+    dst_genome: str,
+    dst_2bit_file: Union[pathlib.Path, str],
+    chain_file: Union[pathlib.Path, str],
+    flank_length: int = 0,
+    min_map_ratio: float = 0.85,
+) -> List[Dict[str, Any]]:
+    """Liftover regions of one source chromosome, loading the chain index of that chromosome.
+
+    This is the unit of work of a ``hal-liftover`` run, so that chromosomes can
+    be lifted over in separate worker processes.
+
+    Args:
+        src_regions: Regions to liftover, all on the same source chromosome.
+        src_genome: Source genome.
+        src_chr_sizes: Source genome chromosome name-to-length mapping.
+        dst_genome: Destination genome.
+        dst_2bit_file: 2bit file of destination genome sequences.
+        chain_file: Chain file from the source chromosome to the destination genome.
+        flank_length: Length of upstream/downstream flanking regions to request.
+        min_map_ratio: Minimum ratio of bases mapped to the destination region relative
+            to the total number of bases in the source region.
 
-        dst_sequences = extract_region_sequences_from_2bit(dst_regions, dst_2bit_file)
+    Returns:
+        List of dictionaries containing liftover parameters and results,
+        one per source region and in the same order.
+    """
+    return liftover_regions_via_chain(
+        src_regions,
+        src_genome,
+        src_chr_sizes,
+        dst_genome,
+        dst_2bit_file,
+        load_chain_index(chain_file),
+        flank_length=flank_length,
+        min_map_ratio=min_map_ratio,
+    )
+
+
+# pylint: disable-next=too-many-instance-attributes
+class LiftoverSession:
+    """A long-lived liftover session over the HAL cache of one HAL file.
+
+    Chain indexes are kept in an LRU cache keyed by source genome, source
+    chromosome, destination genome and linear gap parameter, and are evicted
+    once their total size exceeds the memory budget of the session. The most
+    recently used chain index is always kept, even if it exceeds the budget on
+    its own. Repeated liftovers over the same genome pairs are therefore warm
+    lookups. Chain index access is thread-safe.
+
+    Args:
+        hal_cache: Directory of HAL-derived data files.
+        linear_gap: Default linear gap parameter of the chain files to use.
+        min_map_ratio: Default minimum ratio of bases mapped to the destination region
+            relative to the total number of bases in the source region.
+        max_cache_bytes: Memory budget of cached chain indexes, in bytes.
+    """
 
-        for dst_region, dst_sequence in zip(dst_regions, dst_sequences):
-            rec["results"].append(
-                {
-                    "dest_chr": dst_region.chrom,
-                    "dest_start": dst_region.start + 1,
-                    "dest_end": dst_region.end,
-                    "dest_strand": _strand_sign_to_num[dst_region.strand],
-                    "dest_sequence": dst_sequence,
-                }
+    def __init__(
+        self,
+        hal_cache: Union[pathlib.Path, str],
+        linear_gap: str = "medium",
+        min_map_ratio: float = 0.85,
+        max_cache_bytes: int = 2**30,
+    ) -> None:
+        self.hal_cache = pathlib.Path(hal_cache)
+        self.linear_gap = linear_gap
+        self.min_map_ratio = min_map_ratio
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self._chain_indexes: OrderedDict[Tuple[str, str, str, str], ChainIndex] = OrderedDict()
+        self._chrom_sizes: Dict[str, ChromSizes] = {}
+        self._lock = threading.Lock()
+        self._loading_locks: Dict[Tuple[str, str, str, str], threading.Lock] = {}
+
+    @property
+    def cache_bytes(self) -> int:
+        """Total size of the chain indexes in the cache of this session."""
+        with self._lock:
+            return sum(x.nbytes for x in self._chain_indexes.values())
+
+    def get_2bit_file(self, genome: str) -> pathlib.Path:
+        """Get the path of the 2bit file of the given genome.
+
+        Raises:
+            RuntimeError: If the 2bit file does not exist.
+        """
+        two_bit_file = self.hal_cache / "genome" / "2bit" / f"{genome}.2bit"
+        if not two_bit_file.is_file():
+            raise RuntimeError(f"cannot find destination genome 2bit file {two_bit_file}")
+        return two_bit_file
+
+    def get_chain_file(
+        self, src_genome: str, src_chr: str, dst_genome: str, linear_gap: Optional[str] = None
+    ) -> pathlib.Path:
+        """Get the path of the chain file from a source chromosome to a destination genome."""
+        if linear_gap is None:
+            linear_gap = self.linear_gap
+        chain_file_name = f"{src_genome}_{src_chr}_to_{dst_genome}.linearGap_{linear_gap}.chain.gz"
+        return self.hal_cache / "sequence" / "chain" / chain_file_name
+
+    def get_chrom_sizes(self, genome: str) -> ChromSizes:
+        """Get the chromosome name-to-length mapping of the given genome."""
+        with self._lock:
+            if genome not in self._chrom_sizes:
+                chrom_sizes_file = self.hal_cache / "genome" / "chrom_sizes" / f"{genome}.chrom.sizes"
+                self._chrom_sizes[genome] = load_chrom_sizes_file(chrom_sizes_file)
+            return self._chrom_sizes[genome]
+
+    def get_chain_index(
+        self, src_genome: str, src_chr: str, dst_genome: str, linear_gap: Optional[str] = None
+    ) -> ChainIndex:
+        """Get the chain index from a source chromosome to a destination genome.
+
+        Args:
+            src_genome: Source genome.
+            src_chr: Source chromosome.
+            dst_genome: Destination genome.
+            linear_gap: Linear gap parameter of the chain file. By default, that of the session.
+
+        Returns:
+            The chain index, loaded or built on first access.
+        """
+        if linear_gap is None:
+            linear_gap = self.linear_gap
+        key = (src_genome, src_chr, dst_genome, linear_gap)
+
+        with self._lock:
+            if key in self._chain_indexes:
+                self._chain_indexes.move_to_end(key)
+                self.cache_hits += 1
+                return self._chain_indexes[key]
+            key_lock = self._loading_locks.setdefault(key, threading.Lock())
+
+        # Concurrent requests for the same chain index wait for a single load.
+        with key_lock:
+            with self._lock:
+                if key in self._chain_indexes:
+                    self._chain_indexes.move_to_end(key)
+                    self.cache_hits += 1
+                    return self._chain_indexes[key]
+            chain_index = load_chain_index(self.get_chain_file(src_genome, src_chr, dst_genome, linear_gap))
+
+            with self._lock:
+                self._loading_locks.pop(key, None)
+                self.cache_misses += 1
+                self._chain_indexes[key] = chain_index
+                self._chain_indexes.move_to_end(key)
+                cache_bytes = sum(x.nbytes for x in self._chain_indexes.values())
+                while cache_bytes > self.max_cache_bytes and len(self._chain_indexes) > 1:
+                    _, evicted = self._chain_indexes.popitem(last=False)
+                    cache_bytes -= evicted.nbytes
+                    self.cache_evictions += 1
+
+        return chain_index
+
+    def clear_cache(self) -> None:
+        """Remove all chain indexes and chromosome sizes from the cache of this session."""
+        with self._lock:
+            self._chain_indexes.clear()
+            self._chrom_sizes.clear()
+
+    def liftover(
+        self,
+        src_region: Union[SimpleRegion, str],
+        src_genome: str,
+        dst_genome: str,
+        flank_length: int = 0,
+        linear_gap: Optional[str] = None,
+        min_map_ratio: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Liftover a region.
+
+        Args:
+            src_region: Region to liftover, or its 1-based region string.
+            src_genome: Source genome.
+            dst_genome: Destination genome.
+            flank_length: Length of upstream/downstream flanking regions to request.
+            linear_gap: Linear gap parameter of the chain file. By default, that of the session.
+            min_map_ratio: Minimum ratio of bases mapped to the destination region relative
+                to the total number of bases in the source region. By default, that of the session.
+
+        Returns:
+            Dictionary containing liftover parameters and results.
+        """
+        if isinstance(src_region, str):
+            src_region = SimpleRegion.from_1_based_region_string(src_region)
+        return self.liftover_regions(
+            [src_region], src_genome, dst_genome, flank_length, linear_gap, min_map_ratio
+        )[0]
+
+    def liftover_regions(
+        self,
+        src_regions: Iterable[SimpleRegion],
+        src_genome: str,
+        dst_genome: str,
+        flank_length: int = 0,
+        linear_gap: Optional[str] = None,
+        min_map_ratio: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Liftover regions, which may be on different source chromosomes.
+
+        Args:
+            src_regions: Regions to liftover.
+            src_genome: Source genome.
+            dst_genome: Destination genome.
+            flank_length: Length of upstream/downstream flanking regions to request.
+            linear_gap: Linear gap parameter of the chain files. By default, that of the session.
+            min_map_ratio: Minimum ratio of bases mapped to the destination region relative
+                to the total number of bases in the source region. By default, that of the session.
+
+        Returns:
+            List of dictionaries containing liftover parameters and results,
+            one per source region and in the same order.
+        """
+        if min_map_ratio is None:
+            min_map_ratio = self.min_map_ratio
+
+        src_chr_sizes = self.get_chrom_sizes(src_genome)
+        dst_2bit_file = self.get_2bit_file(dst_genome)
+
+        regions_by_chr: Dict[str, List[Tuple[int, SimpleRegion]]] = {}
+        for i, src_region in enumerate(src_regions):
+            regions_by_chr.setdefault(src_region.chrom, []).append((i, src_region))
+
+        recs: Dict[int, Dict[str, Any]] = {}
+        for src_chr, indexed_regions in regions_by_chr.items():
+            if src_chr not in src_chr_sizes:
+                raise ValueError(f"chromosome ID '{src_chr}' not found in genome chrom sizes")
+            chr_recs = liftover_regions_via_chain(
+                [x for _, x in indexed_regions],
+                src_genome,
+                src_chr_sizes,
+                dst_genome,
+                dst_2bit_file,
+                self.get_chain_index(src_genome, src_chr, dst_genome, linear_gap),
+                flank_length=flank_length,
+                min_map_ratio=min_map_ratio,
             )
+            recs.update(zip([i for i, _ in indexed_regions], chr_recs))
+
+        return [recs[i] for i in range(len(recs))]
+
+    def handle_request(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+        """Handle a liftover request.
+
+        A liftover request has the keys 'src_genome', 'dest_genome' and 'src_region'
+        (a 1-based region string), and optionally 'flank', 'linear_gap', 'min_map_ratio'
+        and 'id'. Any request ID is included in the response.
+
+        Args:
+            request: Liftover request.
+
+        Returns:
+            Dictionary containing liftover parameters and results, or an 'error'
+            message if the liftover request failed.
+        """
+        response: Dict[str, Any] = {"id": request["id"]} if "id" in request else {}
+        try:
+            str_params = {x: request[x] for x in ("src_region", "src_genome", "dest_genome")}
+            if request.get("linear_gap") is not None:
+                str_params["linear_gap"] = request["linear_gap"]
+            for param, value in str_params.items():
+                if not isinstance(value, str):
+                    raise TypeError(f"liftover request parameter '{param}' must be a string: {value!r}")
+            min_map_ratio = request.get("min_map_ratio")
+            response.update(
+                self.liftover(
+                    request["src_region"],
+                    request["src_genome"],
+                    request["dest_genome"],
+                    flank_length=int(request.get("flank", 0)),
+                    linear_gap=request.get("linear_gap"),
+                    min_map_ratio=float(min_map_ratio) if min_map_ratio is not None else None,
+                )
+            )
+        except KeyError as exc:
+            response["error"] = f"missing liftover request parameter: {exc}"
+        except (OSError, RuntimeError, TypeError, ValueError) as exc:
+            response["error"] = str(exc)
+        return response
+
+    def serve_lines(self, input_file: TextIO, output_file: TextIO) -> None:
+        """Answer JSON-lines liftover requests until the end of the input.
+
+        Each input line is a JSON liftover request, as accepted by :meth:`handle_request`,
+        and a JSON response line is output for each request. Blank lines are ignored.
+
+        Args:
+            input_file: Input file stream of liftover requests.
+            output_file: Output file stream of liftover responses.
+        """
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                response = self.handle_request(decode_liftover_request(line))
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                response = {"error": str(exc)}
+            output_file.write(json.dumps(response) + "\n")
+            output_file.flush()
+
+
+def decode_liftover_request(line: str) -> Dict[str, Any]:
+    """Decode a JSON-lines liftover request.
+
+    Args:
+        line: JSON-encoded liftover request.
+
+    Returns:
+        The liftover request.
+
+    Raises:
+        ValueError: If the line is not a JSON object.
+    """
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"invalid liftover request: {exc}") from exc
+    if not isinstance(request, dict):
+        raise ValueError("invalid liftover request: not a JSON object")
+    return request
+
+
+class _DefaultCommandGroup(click.Group):
+    """A command group that invokes its default command if no other command is named."""
+
+    def __init__(self, *args, default_command: str, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
 
-    return rec
+
+@click.group(
+    "hal-liftover",
+    cls=_DefaultCommandGroup,
+    default_command="liftover",
+    context_settings={"show_default": True},
+)
+def main() -> None:
+    """Do liftovers between genome sequences in a HAL file.
+
+    If no command is given, the 'liftover' command is run.
+    """
 
 
-@click.command("hal-liftover", context_settings={"show_default": True})
+@main.command("liftover")
 @click.argument("hal_file", type=click.Path(exists=True, path_type=pathlib.Path))
 @click.argument("src_genome")
 @click.argument("dest_genome")
@@ -154,82 +590,276 @@ def liftover_via_chain(
     metavar="FLOAT",
     default=0.85,
     help="Minimum ratio of bases mapped to the destination region relative to the"
-    " total number of bases in the source region. This is passed to CrossMap.",
+    " total number of bases in the source region.",
 )
 @click.option(
     "--output-format",
     default="JSON",
     metavar="STR",
-    type=click.Choice(["JSON", "TSV"], case_sensitive=False),
-    help="Format of output file.",
+    type=click.Choice(["JSON", "JSONL", "TSV"], case_sensitive=False),
+    help="Format of output file. Records are written as each source chromosome is"
+    " lifted over; 'JSONL' outputs one JSON record per line.",
 )
-def main(
+@click.option(
+    "--jobs",
+    metavar="INT",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of worker processes across which source chromosomes are lifted over.",
+)
+def liftover(
     hal_file: pathlib.Path,
     src_genome: str,
     dest_genome: str,
     output_file: TextIO,
-    src_region: str,
-    src_region_tsv: click.File,
+    src_region: Optional[str],
+    src_region_tsv: Optional[TextIO],
     hal_cache: pathlib.Path,
     flank: int,
     linear_gap: str,
     min_map_ratio: float,
     output_format: str,
+    jobs: int,
 ) -> None:
     """Do a liftover between two genome sequences in a HAL file."""
 
     if hal_cache is None:
         hal_cache = pathlib.Path(f"{hal_file.stem}_cache")
 
-    destination_2bit_file = hal_cache / "genome" / "2bit" / f"{dest_genome}.2bit"
-    if not destination_2bit_file.is_file():
-        raise RuntimeError(f"cannot find destination genome 2bit file {destination_2bit_file}")
-
-    cached_chain_dir = hal_cache / "sequence" / "chain"
-
-    chrom_sizes_file_path = hal_cache / "genome" / "chrom_sizes" / f"{src_genome}.chrom.sizes"
-    source_chr_sizes = load_chrom_sizes_file(chrom_sizes_file_path)
+    session = LiftoverSession(hal_cache, linear_gap=linear_gap, min_map_ratio=min_map_ratio)
+    destination_2bit_file = session.get_2bit_file(dest_genome)
+    source_chr_sizes = session.get_chrom_sizes(src_genome)
 
-    if src_region is not None:
-        if src_region_tsv is not None:
-            raise RuntimeError("only one of '--src-region' or '--src-region-tsv' can be set")
-        source_regions = [SimpleRegion.from_1_based_region_string(src_region)]
-    elif src_region_tsv is not None:
-        reader = csv.DictReader(src_region_tsv, dialect=UnquotedUnixTab)
-        source_regions = []
-        for row in reader:
-            source_region_name = row["name"] if "name" in row and row["name"] else None
-            source_region = SimpleRegion.from_1_based_region_attribs(
-                row["chr"], row["start"], row["end"], row["strand"], name=source_region_name
-            )
-            source_regions.append(source_region)
-    else:
-        raise RuntimeError("one of '--src-region' or '--src-region-tsv' must be set")
+    source_regions = load_source_regions(src_region, src_region_tsv)
 
-    regions_by_chr = {k: list(x) for k, x in itertools.groupby(source_regions, key=lambda x: x.chrom)}
+    regions_by_chr = source_regions.group_by_chrom()
     source_chr_names = sorted(regions_by_chr)
 
-    records = []
+    liftover_params = []
     for source_chr_name in source_chr_names:
-        cached_chain_name = f"{src_genome}_{source_chr_name}_to_{dest_genome}.linearGap_{linear_gap}.chain.gz"
-        cached_chain_path = cached_chain_dir / cached_chain_name
-
-        crossmap_tree, *_unused = read_chain_file(str(cached_chain_path))
-
-        for source_region in regions_by_chr[source_chr_name]:
-            record = liftover_via_chain(
-                source_region,
+        source_chr_size = {k: source_chr_sizes[k] for k in [source_chr_name] if k in source_chr_sizes}
+        liftover_params.append(
+            (
+                regions_by_chr[source_chr_name],
                 src_genome,
-                source_chr_sizes,
+                source_chr_size,
                 dest_genome,
                 destination_2bit_file,
-                crossmap_tree,
-                flank_length=flank,
-                min_map_ratio=min_map_ratio,
+                session.get_chain_file(src_genome, source_chr_name, dest_genome),
+                flank,
+                min_map_ratio,
             )
-            records.append(record)
+        )
+
+    with LiftoverOutputWriter(output_file, output_format) as writer:
+        if jobs > 1 and len(liftover_params) > 1:
+            max_workers = min(jobs, len(liftover_params))
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                # Keep at most one pending chromosome per worker, and write results
+                # in submission order, so that few chromosomes are held in memory.
+                pending: Deque[Future] = collections.deque()
+                for params in liftover_params:
+                    pending.append(executor.submit(liftover_chromosome_regions, *params))
+                    if len(pending) >= max_workers:
+                        writer.write_all(pending.popleft().result())
+                while pending:
+                    writer.write_all(pending.popleft().result())
+        else:
+            for params in liftover_params:
+                writer.write_all(liftover_chromosome_regions(*params))
+
+
+@main.command("serve")
+@click.argument("hal_file", type=click.Path(exists=True, path_type=pathlib.Path))
+@click.option(
+    "--hal-cache",
+    metavar="PATH",
+    type=click.Path(path_type=pathlib.Path),
+    help="Directory in which HAL-derived data files are created. By default, this is"
+    " determined from the input HAL file, as for the 'liftover' command.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    metavar="PATH",
+    type=click.Path(path_type=pathlib.Path),
+    help="UNIX socket on which to listen for requests. By default, requests are read"
+    " from standard input and responses are written to standard output.",
+)
+@click.option(
+    "--linear-gap",
+    metavar="STR|FILE",
+    default="medium",
+    help="Default linear gap parameter of chain files.",
+)
+@click.option(
+    "--min-map-ratio",
+    metavar="FLOAT",
+    default=0.85,
+    help="Default minimum ratio of bases mapped to the destination region relative to"
+    " the total number of bases in the source region.",
+)
+@click.option(
+    "--max-cache-mb",
+    metavar="INT",
+    default=1024,
+    type=click.IntRange(min=0),
+    help="Memory budget of cached chain indexes, in MiB.",
+)
+@click.option(
+    "--workers",
+    metavar="INT",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests answered concurrently.",
+)
+@click.option(
+    "--metrics-file",
+    metavar="FILE",
+    type=click.Path(path_type=pathlib.Path),
+    help="Output JSON file of request latency metrics, written when the server stops.",
+)
+def serve(
+    hal_file: pathlib.Path,
+    hal_cache: Optional[pathlib.Path],
+    socket_path: Optional[pathlib.Path],
+    linear_gap: str,
+    min_map_ratio: float,
+    max_cache_mb: int,
+    workers: int,
+    metrics_file: Optional[pathlib.Path],
+) -> None:
+    """Answer JSON-lines liftover requests from warm chain and 2bit caches.
+
+    Each request is a JSON object with the keys 'src_genome', 'dest_genome' and
+    'src_region' (a 1-based region string), and optionally 'flank', 'linear_gap',
+    'min_map_ratio' and 'id'. Responses are JSON objects containing the liftover
+    parameters and results, or an 'error' message, and include any request 'id'.
+    A request '{"command": "metrics"}' is answered with request latency metrics.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from ensembl.compara.cmd.hal_liftover_server import LiftoverServer
+
+    if hal_cache is None:
+        hal_cache = pathlib.Path(f"{hal_file.stem}_cache")
+
+    session = LiftoverSession(
+        hal_cache, linear_gap=linear_gap, min_map_ratio=min_map_ratio, max_cache_bytes=max_cache_mb * 2**20
+    )
+    with LiftoverServer(session, max_workers=workers) as server:
+        try:
+            if socket_path is not None:
+                asyncio.run(server.serve_unix(socket_path))
+            else:
+                asyncio.run(server.serve_stdio(sys.stdin, sys.stdout))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if metrics_file is not None:
+                with open(metrics_file, "w") as out_file_obj:
+                    json.dump(server.metrics.summary(), out_file_obj)
+
+
+class LiftoverOutputWriter:
+    """Streaming writer of liftover records.
+
+    Records are written as soon as they are passed to :meth:`write`, so that a
+    liftover does not need to hold its results in memory until the end of the run.
+    The ``JSON`` format is written incrementally as a single JSON array, as would
+    be output by ``json.dump``; the ``JSONL`` format has one JSON record per line.
+    If an exception is raised in its context, the writer is closed without
+    finishing the JSON array.
+
+    Args:
+        output_file: Output file stream.
+        output_format: Output format, one of 'JSON', 'JSONL' or 'TSV'.
+
+    Raises:
+        ValueError: If the output format is not supported.
+    """
+
+    tsv_field_names = [
+        "src_genome",
+        "src_name",
+        "src_chr",
+        "src_start",
+        "src_end",
+        "src_strand",
+        "flank",
+        "dest_genome",
+        "lifted_src_chr",
+        "lifted_src_start",
+        "lifted_src_end",
+        "lifted_src_strand",
+        "dest_chr",
+        "dest_start",
+        "dest_end",
+        "dest_strand",
+        "dest_sequence",
+    ]
+
+    def __init__(self, output_file: TextIO, output_format: str) -> None:
+        if output_format not in ("JSON", "JSONL", "TSV"):
+            raise ValueError(f"unsupported output format: {output_format}")
+        self.output_file = output_file
+        self.output_format = output_format
+        self.record_count = 0
+        self._closed = False
+        self._tsv_writer: Optional[csv.DictWriter] = None
+
+        if output_format == "JSON":
+            output_file.write("[")
+        elif output_format == "TSV":
+            self._tsv_writer = csv.DictWriter(output_file, self.tsv_field_names, dialect=UnquotedUnixTab)
+            self._tsv_writer.writeheader()
+
+    def __enter__(self) -> LiftoverOutputWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave an incomplete JSON array unterminated, so that it cannot be mistaken for a full output.
+            self._closed = True
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write one liftover record.
+
+        Args:
+            record: Dictionary containing liftover parameters and results.
+
+        Raises:
+            RuntimeError: If the writer has been closed.
+        """
+        if self._closed:
+            raise RuntimeError("cannot write to closed liftover output writer")
+        if self.output_format == "JSON":
+            if self.record_count > 0:
+                self.output_file.write(", ")
+            self.output_file.write(json.dumps(record))
+        elif self.output_format == "JSONL":
+            self.output_file.write(json.dumps(record) + "\n")
+        elif self._tsv_writer is not None:
+            params = record["params"]
+            for result in record["results"]:
+                self._tsv_writer.writerow({**params, **result})
+        self.record_count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Write liftover records.
+
+        Args:
+            records: Records to output.
+        """
+        for record in records:
+            self.write(record)
 
-    write_liftover_output(records, output_format, output_file)
+    def close(self) -> None:
+        """Finish the output. The output file stream is left open."""
+        if self.output_format == "JSON" and not self._closed:
+            self.output_file.write("]")
+        self._closed = True
 
 
 def write_liftover_output(records: Iterable[Dict[str, Any]], output_format: str, output_file: TextIO) -> None:
@@ -240,35 +870,5 @@ def write_liftover_output(records: Iterable[Dict[str, Any]], output_format: str,
         output_format: Output format.
         output_file: Output file stream.
     """
-    if output_format == "JSON":
-        json.dump(records, output_file)
-
-    elif output_format == "TSV":
-        output_field_names = [
-            "src_genome",
-            "src_name",
-            "src_chr",
-            "src_start",
-            "src_end",
-            "src_strand",
-            "flank",
-            "dest_genome",
-            "lifted_src_chr",
-            "lifted_src_start",
-            "lifted_src_end",
-            "lifted_src_strand",
-            "dest_chr",
-            "dest_start",
-            "dest_end",
-            "dest_strand",
-            "dest_sequence",
-        ]
-
-        writer = csv.DictWriter(output_file, output_field_names, dialect=UnquotedUnixTab)
-        writer.writeheader()
-        for record in records:
-            params = record["params"]
-            for result in record["results"]:
-                writer.writerow({**params, **result})
-    else:
-        raise ValueError(f"unsupported output format: {output_format}")
+    with LiftoverOutputWriter(output_file, output_format) as writer:
+        writer.write_all(records)
@@ -0,0 +1,208 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Asyncio server of JSON-lines liftover requests for the ``hal-liftover serve`` command."""
+
+from __future__ import annotations
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pathlib
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, TextIO, Union
+
+import numpy as np
+
+from ensembl.compara.cmd.hal_liftover import decode_liftover_request, LiftoverSession
+
+
+class LatencyMetrics:
+    """Request latency metrics of a liftover server.
+
+    Request and error counts cover all recorded requests, while latency
+    percentiles are computed over a window of the most recent requests.
+
+    Args:
+        window: Number of recent request latencies from which percentiles are computed.
+    """
+
+    def __init__(self, window: int = 10000) -> None:
+        self.request_count = 0
+        self.error_count = 0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+
+    def record(self, latency: float, error: bool = False) -> None:
+        """Record the latency of a request.
+
+        Args:
+            latency: Request latency, in seconds.
+            error: Whether the request failed.
+        """
+        self.request_count += 1
+        self.error_count += int(error)
+        self.max_latency = max(self.max_latency, latency)
+        self._total_latency += latency
+        self._latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        """Get a summary of the request latency metrics, with latencies in milliseconds."""
+        latency_ms: Dict[str, float] = {}
+        if self.request_count > 0:
+            latencies = np.fromiter(self._latencies, dtype=np.float64) * 1000
+            latency_ms["mean"] = 1000 * self._total_latency / self.request_count
+            for percentile in (50, 95, 99):
+                latency_ms[f"p{percentile}"] = float(np.percentile(latencies, percentile))
+            latency_ms["max"] = 1000 * self.max_latency
+        return {"requests": self.request_count, "errors": self.error_count, "latency_ms": latency_ms}
+
+
+class LiftoverServer:
+    """An asyncio server of JSON-lines liftover requests backed by a liftover session.
+
+    Requests are read from stdin/stdout-like streams or from the connections to a
+    local UNIX socket. Each request is answered in a worker thread as soon as it is
+    read, so that responses may be written out of request order; liftover requests
+    should therefore have an 'id'. A request ``{"command": "metrics"}`` is answered
+    with the request latency metrics of the server.
+
+    Args:
+        session: Liftover session from which requests are answered.
+        max_workers: Maximum number of requests answered concurrently.
+    """
+
+    def __init__(self, session: LiftoverSession, max_workers: int = 4) -> None:
+        self.session = session
+        self.metrics = LatencyMetrics()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self) -> LiftoverServer:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the worker threads of this server."""
+        self._executor.shutdown()
+
+    async def handle_line(self, line: str) -> Dict[str, Any]:
+        """Answer a JSON-lines request.
+
+        Args:
+            line: JSON-encoded liftover or metrics request.
+
+        Returns:
+            The response to the request.
+        """
+        start_time = time.perf_counter()
+        request: Dict[str, Any] = {}
+        try:
+            request = decode_liftover_request(line)
+            if request.get("command") == "metrics":
+                return self.metrics.summary()
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, self.session.handle_request, request)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # An unexpected error in one request must not bring down the server.
+            response = {"id": request["id"]} if "id" in request else {}
+            response["error"] = str(exc) or type(exc).__name__
+        self.metrics.record(time.perf_counter() - start_time, error="error" in response)
+        return response
+
+    async def serve_stream(
+        self, read_line: Callable[[], Awaitable[str]], write_line: Callable[[str], Awaitable[None]]
+    ) -> None:
+        """Answer requests from a stream of lines until the end of the stream.
+
+        Args:
+            read_line: Coroutine function returning the next line, or an empty string at
+                the end of the stream.
+            write_line: Coroutine function writing a response line.
+        """
+
+        # At most one request per worker is in flight, so that lines are only read as
+        # fast as requests are answered.
+        in_flight = asyncio.Semaphore(self.max_workers)
+
+        async def answer(line: str) -> None:
+            try:
+                response = await self.handle_line(line)
+                await write_line(json.dumps(response) + "\n")
+            finally:
+                in_flight.release()
+
+        pending: Set[asyncio.Task] = set()
+        while line := await read_line():
+            if line.strip():
+                await in_flight.acquire()
+                task = asyncio.create_task(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def serve_stdio(self, input_file: TextIO, output_file: TextIO) -> None:
+        """Answer requests from an input file stream until the end of the input.
+
+        Args:
+            input_file: Input file stream of requests.
+            output_file: Output file stream of responses.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def read_line() -> str:
+            # A separate thread is used, as file objects cannot be read asynchronously.
+            return await loop.run_in_executor(None, input_file.readline)
+
+        async def write_line(line: str) -> None:
+            output_file.write(line)
+            output_file.flush()
+
+        await self.serve_stream(read_line, write_line)
+
+    async def serve_unix(
+        self, socket_path: Union[pathlib.Path, str], ready: Optional[asyncio.Event] = None
+    ) -> None:
+        """Answer requests from connections to a UNIX socket until cancelled.
+
+        Args:
+            socket_path: Path of the UNIX socket to create.
+            ready: Event set once the server is accepting connections.
+        """
+
+        async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            async def read_line() -> str:
+                return (await reader.readline()).decode()
+
+            async def write_line(line: str) -> None:
+                writer.write(line.encode())
+                await writer.drain()
+
+            try:
+                await self.serve_stream(read_line, write_line)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle_connection, path=str(socket_path))
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            pathlib.Path(socket_path).unlink(missing_ok=True)
@@ -0,0 +1,101 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""MAF index console script module."""
+
+import pathlib
+import re
+from typing import BinaryIO, Tuple
+
+import click
+
+from ensembl.compara.utils.maf import build_maf_index, get_maf_index_path, load_maf_index
+
+_MAF_REGION_REGEX = re.compile(r"^(?P<src>[^:]+):(?P<start>[0-9]+)-(?P<end>[0-9]+)$")
+
+
+def parse_maf_region(region_string: str) -> Tuple[str, int, int]:
+    """Parse a 1-based MAF reference region string of the form 'src:start-end'.
+
+    Args:
+        region_string: 1-based region string.
+
+    Returns:
+        A tuple of reference sequence name and 0-based half-open start and end.
+
+    Raises:
+        ValueError: If the region string is not a valid 1-based region string.
+    """
+    if not (match := _MAF_REGION_REGEX.fullmatch(region_string)):
+        raise ValueError(f"failed to tokenise 1-based region string: '{region_string}'")
+    start = int(match["start"]) - 1
+    end = int(match["end"])
+    if not 0 <= start < end:
+        raise ValueError(f"invalid 1-based region: '{region_string}'")
+    return match["src"], start, end
+
+
+@click.group("maf-index", context_settings={"show_default": True})
+def main() -> None:
+    """Index MAF files by block reference region, and query indexed MAF files.
+
+    The reference sequence of a block is its first sequence. The index of a MAF
+    file is stored next to it with the suffix '.idx', and is rebuilt when the
+    MAF file changes.
+    """
+
+
+@main.command("build")
+@click.argument("maf_file", type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path))
+def build(maf_file: pathlib.Path) -> None:
+    """Build the index of a MAF file."""
+    maf_index = build_maf_index(maf_file)
+    click.echo(f"indexed {maf_index.block_count} blocks: {get_maf_index_path(maf_file)}")
+
+
+@main.command("count")
+@click.argument("maf_file", type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path))
+def count(maf_file: pathlib.Path) -> None:
+    """Print the number of blocks in a MAF file, building its index if necessary."""
+    click.echo(load_maf_index(maf_file).block_count)
+
+
+@main.command("query")
+@click.argument("maf_file", type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path))
+@click.argument("regions", metavar="REGION...", nargs=-1, required=True)
+@click.option(
+    "-o",
+    "--output-file",
+    metavar="FILE",
+    type=click.File("wb"),
+    default="-",
+    help="Output MAF file of the blocks overlapping each region. By default, output is printed.",
+)
+def query(maf_file: pathlib.Path, regions: Tuple[str, ...], output_file: BinaryIO) -> None:
+    """Output the blocks of a MAF file overlapping 1-based reference regions.
+
+    Each REGION has the form 'src:start-end', where 'src' is a MAF src field
+    value such as 'genomeA.chr1'. Blocks are output as in the MAF file, in
+    order of reference start within each region.
+    """
+    try:
+        parsed_regions = [parse_maf_region(x) for x in regions]
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="REGION") from exc
+
+    maf_index = load_maf_index(maf_file)
+    output_file.write(b"##maf version=1 scoring=none\n\n")
+    for src, start, end in parsed_regions:
+        for block_bytes in maf_index.read_raw_blocks(maf_file, src, start, end):
+            output_file.write(block_bytes)
@@ -0,0 +1,126 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for reading and writing binary index files of NumPy columns.
+
+A binary index file starts with an 8-byte magic string and the length of a
+JSON header, followed by the header and then the column data. Each column is
+aligned to 8 bytes, and its offset and length are stored in the header, so
+that columns can be memory-mapped on load.
+
+Typical usage example::
+
+    >>> from ensembl.compara.utils.binary_index import read_binary_index, write_binary_index
+    >>> write_binary_index("a.idx", b"EXAMPLE1", {"version": 1}, {"x": np.arange(3, dtype="<i8")})
+    >>> header, columns = read_binary_index("a.idx", b"EXAMPLE1", {"x": np.dtype("<i8")}, "example index")
+    >>> columns["x"].tolist()
+    [0, 1, 2]
+
+"""
+
+__all__ = ["read_binary_index", "write_binary_index"]
+
+import json
+import os
+from pathlib import Path
+import struct
+from typing import Any, Dict, Mapping, Tuple, Union
+
+import numpy as np
+
+_ALIGNMENT = 8
+
+
+def read_binary_index(
+    index_file: Union[Path, str], magic: bytes, column_dtypes: Mapping[str, np.dtype], file_type: str
+) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Read a binary index file, memory-mapping its columns.
+
+    Args:
+        index_file: Input binary index file.
+        magic: Expected 8-byte magic string of the index file.
+        column_dtypes: Mapping of column name to column data type.
+        file_type: Description of the index file type, for error messages.
+
+    Returns:
+        A tuple of the index file header and a dictionary of its columns.
+
+    Raises:
+        ValueError: If the file does not start with the expected magic string.
+    """
+    with open(index_file, "rb") as in_file_obj:
+        file_magic, header_length = struct.unpack("<8sQ", in_file_obj.read(16))
+        if file_magic != magic:
+            raise ValueError(f"not a {file_type} file: {index_file}")
+        header = json.loads(in_file_obj.read(header_length))
+
+    data = np.memmap(index_file, dtype=np.uint8, mode="r")
+    columns = {}
+    for name, (offset, length) in header.pop("columns").items():
+        dtype = column_dtypes[name]
+        columns[name] = data[offset : offset + length * dtype.itemsize].view(dtype)
+
+    return header, columns
+
+
+def write_binary_index(
+    index_file: Union[Path, str], magic: bytes, header: Mapping[str, Any], columns: Mapping[str, np.ndarray]
+) -> None:
+    """Write a binary index file.
+
+    The file is written to a temporary path and then moved into place, so
+    that concurrent readers never see a partially written index.
+
+    Args:
+        index_file: Output binary index file.
+        magic: 8-byte magic string of the index file.
+        header: JSON-serialisable header of the index file, which must not have a 'columns' key.
+        columns: Mapping of column name to column array.
+    """
+    column_layout = {}
+    offset = 0
+    for name, column in columns.items():
+        column_layout[name] = [offset, len(column)]
+        offset += _aligned(column.nbytes)
+
+    # Column data follows the header, whose length depends on the column
+    # offsets it contains, so the data offset is grown until the header fits.
+    full_header = dict(header, columns=column_layout)
+    data_offset = 0
+    header_bytes = json.dumps(full_header).encode("utf-8")
+    while 16 + len(header_bytes) > data_offset:
+        data_offset = _aligned(16 + len(header_bytes))
+        full_header["columns"] = {
+            name: [offset + data_offset, length] for name, (offset, length) in column_layout.items()
+        }
+        header_bytes = json.dumps(full_header).encode("utf-8")
+    header_bytes = header_bytes.ljust(data_offset - 16)
+
+    index_path = Path(index_file)
+    temp_path = index_path.with_name(f".{index_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as out_file_obj:
+            out_file_obj.write(struct.pack("<8sQ", magic, len(header_bytes)))
+            out_file_obj.write(header_bytes)
+            for column in columns.values():
+                column_bytes = column.tobytes()
+                out_file_obj.write(column_bytes.ljust(_aligned(len(column_bytes)), b"\0"))
+        os.replace(temp_path, index_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def _aligned(size: int) -> int:
+    """Round up a byte count to the index alignment."""
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
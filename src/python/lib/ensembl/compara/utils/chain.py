@@ -0,0 +1,419 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for working with UCSC chain files.
+
+A chain file is indexed into a set of sorted block arrays, which can be stored
+in a binary sidecar file next to the chain file and memory-mapped on load.
+Overlapping alignment blocks are then found by binary search, instead of
+decompressing the chain file and rebuilding an interval tree on every run.
+
+Typical usage example::
+
+    >>> from ensembl.compara.utils.chain import load_chain_index
+    >>> chain_index = load_chain_index("genomeA_chr1_to_genomeB.linearGap_medium.chain.gz")
+    >>> chain_index["chr1"].find(15, 18)
+    [ChainInterval(start=13, end=25, value=('chr1', 20, 32, '+'))]
+
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "ChainBlocks",
+    "ChainIndex",
+    "ChainInterval",
+    "get_chain_index_path",
+    "load_chain_index",
+]
+
+from collections.abc import Mapping
+import os
+from pathlib import Path
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .binary_index import read_binary_index, write_binary_index
+from .compression import open_input
+
+_INDEX_MAGIC = b"ECCHNIDX"
+_INDEX_VERSION = 1
+
+_COLUMN_DTYPES: Dict[str, np.dtype] = {
+    "src_start": np.dtype("<i8"),
+    "src_end": np.dtype("<i8"),
+    "src_max_end": np.dtype("<i8"),
+    "dst_start": np.dtype("<i8"),
+    "dst_end": np.dtype("<i8"),
+    "dst_chrom": np.dtype("<i4"),
+    "dst_strand": np.dtype("<i1"),
+}
+
+
+class ChainInterval(NamedTuple):
+    """A chain alignment block overlapping a query interval.
+
+    The ``start``, ``end`` and ``value`` attributes mirror those of the interval
+    objects returned by CrossMap, so that a :class:`ChainIndex` can be used as a
+    CrossMap mapping. The value is a tuple of the destination sequence name,
+    start, end and strand, with destination coordinates on the positive strand.
+    """
+
+    start: int
+    end: int
+    value: Tuple[str, int, int, str]
+
+
+class ChainBlocks:
+    """Sorted alignment blocks of one source sequence in a chain index.
+
+    Args:
+        columns: Mapping of column name to block array, sorted by source start.
+        dst_names: Destination sequence names, indexed by destination sequence code.
+    """
+
+    def __init__(self, columns: Mapping[str, np.ndarray], dst_names: List[str]) -> None:
+        self.columns = columns
+        self.src_starts = columns["src_start"]
+        self.src_ends = columns["src_end"]
+        self.src_max_ends = columns["src_max_end"]
+        self.dst_names = dst_names
+
+    def __len__(self) -> int:
+        return len(self.src_starts)
+
+    def overlapping(self, start: int, end: int) -> np.ndarray:
+        """Get the indices of the blocks overlapping the given 0-based half-open interval.
+
+        Args:
+            start: Start of query interval.
+            end: End of query interval.
+
+        Returns:
+            Array of block indices, in source start order.
+        """
+        # Blocks are sorted by start, and the running maximum of block ends is
+        # non-decreasing, so both bounds of the candidate range can be found by
+        # binary search even if blocks from different chains overlap.
+        hi = int(np.searchsorted(self.src_starts, end, side="left"))
+        lo = int(np.searchsorted(self.src_max_ends[:hi], start, side="right"))
+        return lo + np.flatnonzero(self.src_ends[lo:hi] > start)
+
+    def find(self, start: int, end: int) -> List[ChainInterval]:
+        """Find the blocks overlapping the given 0-based half-open interval.
+
+        Args:
+            start: Start of query interval.
+            end: End of query interval.
+
+        Returns:
+            List of overlapping blocks, in source start order.
+        """
+        dst_starts = self.columns["dst_start"]
+        dst_ends = self.columns["dst_end"]
+        dst_chroms = self.columns["dst_chrom"]
+        dst_strands = self.columns["dst_strand"]
+        return [
+            ChainInterval(
+                int(self.src_starts[i]),
+                int(self.src_ends[i]),
+                (
+                    self.dst_names[dst_chroms[i]],
+                    int(dst_starts[i]),
+                    int(dst_ends[i]),
+                    "+" if dst_strands[i] == 1 else "-",
+                ),
+            )
+            for i in self.overlapping(start, end)
+        ]
+
+    def map_interval(
+        self, start: int, end: int, strand: str = "+", min_map_ratio: float = 0.85
+    ) -> Optional[Tuple[str, int, int, str]]:
+        """Map a 0-based half-open interval through the chain alignment blocks.
+
+        This follows the region mapping rules of CrossMap: an interval overlapping
+        a single block is mapped to the corresponding part of that block, while an
+        interval overlapping several blocks is mapped to the span of their
+        destination intervals if they are all on the same destination sequence
+        and cover at least ``min_map_ratio`` of the query interval. In the latter
+        case, the query strand is kept as the destination strand.
+
+        Args:
+            start: Start of query interval.
+            end: End of query interval.
+            strand: Strand of query interval.
+            min_map_ratio: Minimum ratio of query bases that must be mapped when
+                the query interval overlaps more than one block.
+
+        Returns:
+            A tuple of destination sequence name, start, end and strand,
+            or None if the interval could not be mapped.
+        """
+        idxs = self.overlapping(start, end)
+        if len(idxs) == 0:
+            return None
+
+        block_starts = self.src_starts[idxs]
+        real_starts = np.maximum(block_starts, start)
+        sizes = np.minimum(self.src_ends[idxs], end) - real_starts
+        dst_strands = self.columns["dst_strand"][idxs]
+        dst_starts = np.where(
+            dst_strands == 1,
+            self.columns["dst_start"][idxs] + (real_starts - block_starts),
+            self.columns["dst_end"][idxs] - (real_starts - block_starts) - sizes,
+        )
+
+        if len(idxs) == 1:
+            dst_strand = "+" if (dst_strands[0] == 1) == (strand == "+") else "-"
+            dst_start = int(dst_starts[0])
+            return (
+                self.dst_names[self.columns["dst_chrom"][idxs[0]]],
+                dst_start,
+                dst_start + int(sizes[0]),
+                dst_strand,
+            )
+
+        dst_chroms = self.columns["dst_chrom"][idxs]
+        if sizes.sum() / (end - start) < min_map_ratio or (dst_chroms != dst_chroms[0]).any():
+            return None
+        return self.dst_names[dst_chroms[0]], int(dst_starts.min()), int((dst_starts + sizes).max()), strand
+
+
+class ChainIndex(Mapping[str, ChainBlocks]):
+    """Index of chain alignment blocks, mapping each source sequence name to its blocks.
+
+    Args:
+        columns: Mapping of column name to block array. Blocks are grouped by
+            source sequence and sorted by source start within each group.
+        src_ranges: Mapping of each source sequence name to the (begin, end)
+            range of its blocks in the block arrays.
+        dst_names: Destination sequence names, indexed by destination sequence code.
+    """
+
+    def __init__(
+        self,
+        columns: Mapping[str, np.ndarray],
+        src_ranges: Mapping[str, Tuple[int, int]],
+        dst_names: List[str],
+    ) -> None:
+        self.columns = columns
+        self.src_ranges = dict(src_ranges)
+        self.dst_names = list(dst_names)
+        self._blocks: Dict[str, ChainBlocks] = {}
+
+    def __getitem__(self, src_name: str) -> ChainBlocks:
+        if src_name not in self._blocks:
+            begin, end = self.src_ranges[src_name]
+            columns = {name: column[begin:end] for name, column in self.columns.items()}
+            self._blocks[src_name] = ChainBlocks(columns, self.dst_names)
+        return self._blocks[src_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.src_ranges)
+
+    def __len__(self) -> int:
+        return len(self.src_ranges)
+
+    def map_region(
+        self, chrom: str, start: int, end: int, strand: str = "+", min_map_ratio: float = 0.85
+    ) -> Optional[Tuple[str, int, int, str]]:
+        """Map a 0-based half-open region through the chain alignment blocks of its sequence.
+
+        See :meth:`ChainBlocks.map_interval()` for the mapping rules.
+
+        Args:
+            chrom: Source sequence name.
+            start: Start of query region.
+            end: End of query region.
+            strand: Strand of query region.
+            min_map_ratio: Minimum ratio of query bases that must be mapped when
+                the query region overlaps more than one block.
+
+        Returns:
+            A tuple of destination sequence name, start, end and strand,
+            or None if the region could not be mapped.
+        """
+        if chrom not in self.src_ranges:
+            return None
+        return self[chrom].map_interval(start, end, strand=strand, min_map_ratio=min_map_ratio)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size in bytes of the block arrays of this index."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    @classmethod
+    def from_chain_file(cls, chain_file: Union[Path, str]) -> ChainIndex:
+        """Build a chain index by parsing a chain file.
+
+        Args:
+            chain_file: Input chain file, which may be gzip-compressed.
+
+        Returns:
+            A chain index.
+
+        Raises:
+            ValueError: If the chain file is not in a valid chain format.
+        """
+        src_codes: Dict[str, int] = {}
+        dst_codes: Dict[str, int] = {}
+        block_rows: List[Tuple[int, int, int, int, int, int, int]] = []
+
+        with open_input(chain_file) as in_file_obj:
+            src_code = dst_code = dst_size = dst_strand = src_from = dst_from = -1
+            for line in in_file_obj:
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+
+                if fields[0] == "chain" and len(fields) in (12, 13):
+                    if fields[4] != "+":
+                        raise ValueError(f"source strand in a chain file must be '+': {line.strip()}")
+                    if fields[9] not in ("+", "-"):
+                        raise ValueError(f"destination strand must be '+' or '-': {line.strip()}")
+                    src_code = src_codes.setdefault(fields[2], len(src_codes))
+                    dst_code = dst_codes.setdefault(fields[7], len(dst_codes))
+                    dst_size = int(fields[8])
+                    dst_strand = 1 if fields[9] == "+" else -1
+                    src_from = int(fields[5])
+                    dst_from = int(fields[10])
+
+                elif fields[0] != "chain" and len(fields) in (1, 3):
+                    if src_code < 0:
+                        raise ValueError(f"alignment data line found before chain header: {line.strip()}")
+                    size = int(fields[0])
+                    if dst_strand == 1:
+                        dst_start, dst_end = dst_from, dst_from + size
+                    else:
+                        dst_start, dst_end = dst_size - (dst_from + size), dst_size - dst_from
+                    block_rows.append(
+                        (src_code, src_from, src_from + size, dst_start, dst_end, dst_code, dst_strand)
+                    )
+                    if len(fields) == 3:
+                        src_from += size + int(fields[1])
+                        dst_from += size + int(fields[2])
+
+                else:
+                    raise ValueError(f"invalid chain format: {line.strip()}")
+
+        block_arr = np.array(block_rows, dtype=np.int64).reshape(-1, 7)
+        order = np.lexsort((block_arr[:, 1], block_arr[:, 0]))
+        block_arr = block_arr[order]
+
+        columns = {
+            "src_start": block_arr[:, 1],
+            "src_end": block_arr[:, 2],
+            "dst_start": block_arr[:, 3],
+            "dst_end": block_arr[:, 4],
+            "dst_chrom": block_arr[:, 5],
+            "dst_strand": block_arr[:, 6],
+        }
+
+        src_names = sorted(src_codes, key=src_codes.__getitem__)
+        bounds = np.searchsorted(block_arr[:, 0], np.arange(len(src_names) + 1), side="left")
+        src_ranges = {name: (int(bounds[i]), int(bounds[i + 1])) for i, name in enumerate(src_names)}
+
+        src_max_end = np.empty_like(columns["src_end"])
+        for begin, end in src_ranges.values():
+            src_max_end[begin:end] = np.maximum.accumulate(columns["src_end"][begin:end])
+        columns["src_max_end"] = src_max_end
+
+        columns = {
+            name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in _COLUMN_DTYPES.items()
+        }
+        dst_names = sorted(dst_codes, key=dst_codes.__getitem__)
+
+        return cls(columns, src_ranges, dst_names)
+
+    @classmethod
+    def load(cls, index_file: Union[Path, str]) -> Tuple[ChainIndex, Dict]:
+        """Load a chain index file, memory-mapping its block arrays.
+
+        Args:
+            index_file: Input chain index file.
+
+        Returns:
+            A tuple of the chain index and the metadata stored with it.
+
+        Raises:
+            ValueError: If the file is not a chain index file of a supported version.
+        """
+        header, columns = read_binary_index(index_file, _INDEX_MAGIC, _COLUMN_DTYPES, "chain index")
+        if header["version"] != _INDEX_VERSION:
+            raise ValueError(f"unsupported chain index version: {header['version']}")
+
+        src_ranges = {name: tuple(bounds) for name, bounds in header["src_ranges"].items()}
+        return cls(columns, src_ranges, header["dst_names"]), header["metadata"]  # type: ignore[arg-type]
+
+    def save(self, index_file: Union[Path, str], metadata: Optional[Dict] = None) -> None:
+        """Save this chain index to a binary index file.
+
+        The file is written to a temporary path and then moved into place, so
+        that concurrent readers never see a partially written index.
+
+        Args:
+            index_file: Output chain index file.
+            metadata: Optional JSON-serialisable metadata to store with the index.
+        """
+        header = {
+            "version": _INDEX_VERSION,
+            "src_ranges": self.src_ranges,
+            "dst_names": self.dst_names,
+            "metadata": metadata if metadata is not None else {},
+        }
+        write_binary_index(index_file, _INDEX_MAGIC, header, self.columns)
+
+
+def get_chain_index_path(chain_file: Union[Path, str]) -> Path:
+    """Get the path of the index file of the given chain file."""
+    chain_path = Path(chain_file)
+    return chain_path.with_name(f"{chain_path.name}.idx")
+
+
+def load_chain_index(chain_file: Union[Path, str], build: bool = True) -> ChainIndex:
+    """Load the index of a chain file, building it if necessary.
+
+    If an up-to-date index file exists next to the chain file, its block arrays
+    are memory-mapped. Otherwise the chain file is parsed and, if ``build`` is
+    true, the resulting index is saved next to the chain file for later runs.
+
+    Args:
+        chain_file: Input chain file, which may be gzip-compressed.
+        build: Save a new index file if there is no up-to-date index file.
+
+    Returns:
+        A chain index.
+    """
+    chain_stat = os.stat(chain_file)
+    chain_metadata = {"chain_file_size": chain_stat.st_size, "chain_file_mtime_ns": chain_stat.st_mtime_ns}
+
+    index_path = get_chain_index_path(chain_file)
+    try:
+        chain_index, index_metadata = ChainIndex.load(index_path)
+    except (OSError, ValueError, KeyError, struct.error):
+        pass
+    else:
+        if index_metadata == chain_metadata:
+            return chain_index
+
+    chain_index = ChainIndex.from_chain_file(chain_file)
+    if build:
+        try:
+            chain_index.save(index_path, metadata=chain_metadata)
+        except OSError:
+            pass  # e.g. a read-only HAL cache; the in-memory index is still usable
+    return chain_index
@@ -0,0 +1,272 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for chunking genome sequences into size-balanced task bins.
+
+Sequences longer than a maximum chunk length are split into near-equal chunks,
+and all chunks are then packed into a given number of bins by the longest
+processing time (LPT) rule: chunks are taken longest first, and each is put in
+the bin with the least total length so far. The makespan of the resulting bins
+is at most 4/3 of the optimum. Whole sequences can likewise be packed into bins
+of a target total length with :func:`pack_seqs_into_bins`.
+
+Typical usage example::
+
+    >>> import sys
+    >>> from ensembl.compara.utils.chunking import make_seq_chunks, write_coverage_task_sheet
+    >>> seq_chunks = make_seq_chunks({"chr1": 250, "scaf1": 10, "scaf2": 10}, 2)
+    >>> write_coverage_task_sheet(seq_chunks, sys.stdout)
+    task_bin	ref_sequence	start	length
+    bin1	chr1	0	125
+    bin1	scaf1	0	10
+    bin2	chr1	125	125
+    bin2	scaf2	0	10
+
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "lpt_bin_packing",
+    "make_seq_chunks",
+    "pack_seqs_into_bins",
+    "SeqChunks",
+    "write_coverage_task_sheet",
+    "write_liftover_task_sheet",
+]
+
+import csv
+from dataclasses import dataclass
+import heapq
+from typing import Iterable, Mapping, Optional, TextIO
+
+import numpy as np
+
+from .csv import UnquotedUnixTab
+
+
+@dataclass(slots=True)
+class SeqChunks:
+    """A columnar array of sequence chunks assigned to task bins.
+
+    Chunks are ordered by task bin, then by their order in the input sequences.
+
+    Attributes:
+        seq_names: Sequence name of each chunk.
+        starts: 0-based start of each chunk.
+        lengths: Length of each chunk.
+        bins: 0-based task bin index of each chunk.
+    """
+
+    seq_names: np.ndarray
+    starts: np.ndarray
+    lengths: np.ndarray
+    bins: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def bin_lengths(self) -> np.ndarray:
+        """Total chunk length of each task bin."""
+        return np.bincount(self.bins, weights=self.lengths).astype(np.int64)
+
+    @property
+    def bin_names(self) -> np.ndarray:
+        """Name of the task bin of each chunk, numbered from 'bin1'."""
+        return np.char.add("bin", (self.bins + 1).astype(str))
+
+
+def lpt_bin_packing(weights: np.ndarray, num_bins: int) -> np.ndarray:
+    """Pack items into bins by the longest processing time rule.
+
+    Items are assigned in order of decreasing weight, each to the bin with the
+    least total weight so far. Ties are broken by item order and by bin index,
+    so that packing is deterministic.
+
+    Args:
+        weights: Non-negative weight of each item.
+        num_bins: Number of bins.
+
+    Returns:
+        The 0-based bin index of each item.
+
+    Raises:
+        ValueError: If ``num_bins`` is not positive.
+    """
+    if num_bins < 1:
+        raise ValueError(f"number of bins must be greater than 0: {num_bins}")
+
+    weights = np.asarray(weights)
+    bin_idxs = np.empty(len(weights), dtype=np.int64)
+    order = np.argsort(-weights, kind="stable")
+    # Until every bin has an item, the least-loaded bins are the empty ones.
+    num_first_items = min(num_bins, len(weights))
+    bin_idxs[order[:num_first_items]] = np.arange(num_first_items)
+    bin_heap = [(int(weights[x]), i) for i, x in enumerate(order[:num_first_items].tolist())]
+    heapq.heapify(bin_heap)
+
+    for item_idx, weight in zip(order[num_first_items:].tolist(), weights[order[num_first_items:]].tolist()):
+        bin_load, bin_idx = bin_heap[0]
+        bin_idxs[item_idx] = bin_idx
+        heapq.heapreplace(bin_heap, (bin_load + weight, bin_idx))
+
+    return bin_idxs
+
+
+def _number_bins_by_first_item(bin_idxs: np.ndarray) -> np.ndarray:
+    """Renumber the bins of items from 0 in order of their first item."""
+    _, first_item_idxs, inverse = np.unique(bin_idxs, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first_item_idxs))[inverse]
+
+
+def pack_seqs_into_bins(seq_lengths: np.ndarray, bin_length: int) -> np.ndarray:
+    """Pack whole sequences into task bins of roughly the given total length.
+
+    Sequences are not split. Each sequence at least ``bin_length`` long is counted
+    as needing a bin of its own, and the shorter sequences as needing enough bins
+    to hold their total length. All sequences are then packed into that many bins
+    by :func:`lpt_bin_packing`, so that long sequences are packed first, each into
+    an empty bin.
+
+    Args:
+        seq_lengths: Length of each sequence.
+        bin_length: Target total sequence length of a task bin.
+
+    Returns:
+        The 0-based task bin index of each sequence. Bins are numbered in order of
+        their first sequence.
+
+    Raises:
+        ValueError: If ``bin_length`` is not positive.
+    """
+    if bin_length < 1:
+        raise ValueError(f"bin length must be greater than 0: {bin_length}")
+
+    seq_lengths = np.asarray(seq_lengths, dtype=np.int64)
+    if len(seq_lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+    long_mask = seq_lengths >= bin_length
+    num_short_bins = -(-int(seq_lengths[~long_mask].sum()) // bin_length)
+    num_bins = max(1, int(np.count_nonzero(long_mask)) + num_short_bins)
+    return _number_bins_by_first_item(lpt_bin_packing(seq_lengths, num_bins))
+
+
+def make_seq_chunks(
+    chrom_sizes: Mapping[str, int], num_bins: int, max_chunk_length: Optional[int] = None
+) -> SeqChunks:
+    """Split genome sequences into chunks and pack them into size-balanced task bins.
+
+    Args:
+        chrom_sizes: Mapping of genome sequence names to their lengths.
+        num_bins: Number of task bins. Fewer bins are used if there are fewer chunks.
+        max_chunk_length: Maximum length of a sequence chunk. By default, this is
+            the mean total sequence length of a bin, rounded up.
+
+    Returns:
+        The sequence chunks, with their task bins. Bins are numbered in order of
+        their first chunk, and sequences of zero length are omitted.
+
+    Raises:
+        ValueError: If ``num_bins`` or ``max_chunk_length`` is not positive.
+    """
+    if num_bins < 1:
+        raise ValueError(f"number of bins must be greater than 0: {num_bins}")
+
+    seq_names = np.array(list(chrom_sizes.keys()), dtype=object)
+    seq_lengths = np.fromiter(chrom_sizes.values(), dtype=np.int64, count=len(chrom_sizes))
+    if max_chunk_length is None:
+        max_chunk_length = max(1, -(-int(seq_lengths.sum()) // num_bins))
+    elif max_chunk_length < 1:
+        raise ValueError(f"maximum chunk length must be greater than 0: {max_chunk_length}")
+
+    # Each sequence is split into the fewest near-equal chunks that fit the maximum length.
+    num_seq_chunks = -(-seq_lengths // max_chunk_length)
+    chunk_seq_idxs = np.repeat(np.arange(len(seq_lengths)), num_seq_chunks)
+    chunk_offsets = np.cumsum(num_seq_chunks) - num_seq_chunks
+    chunk_ranks = np.arange(len(chunk_seq_idxs)) - chunk_offsets[chunk_seq_idxs]
+    chunk_seq_lengths = seq_lengths[chunk_seq_idxs]
+    chunk_num_chunks = num_seq_chunks[chunk_seq_idxs]
+    starts = chunk_ranks * chunk_seq_lengths // chunk_num_chunks
+    ends = (chunk_ranks + 1) * chunk_seq_lengths // chunk_num_chunks
+    lengths = ends - starts
+
+    bins = _number_bins_by_first_item(lpt_bin_packing(lengths, num_bins))
+    # Chunks are grouped by bin.
+    order = np.argsort(bins, kind="stable")
+    return SeqChunks(seq_names[chunk_seq_idxs][order], starts[order], lengths[order], bins[order])
+
+
+def write_coverage_task_sheet(seq_chunks: SeqChunks, out_stream: TextIO) -> None:
+    """Write a task sheet of sequence chunks for ``hal_cov_one_seq_chunk.py``.
+
+    The task sheet has one row per chunk, with columns 'task_bin', 'ref_sequence',
+    'start' and 'length'; chunk starts are 0-based.
+
+    Args:
+        seq_chunks: Sequence chunks with their task bins.
+        out_stream: Output text stream.
+    """
+    writer = csv.writer(out_stream, dialect=UnquotedUnixTab)
+    writer.writerow(["task_bin", "ref_sequence", "start", "length"])
+    writer.writerows(
+        zip(
+            seq_chunks.bin_names.tolist(),
+            seq_chunks.seq_names,
+            seq_chunks.starts.tolist(),
+            seq_chunks.lengths.tolist(),
+        )
+    )
+
+
+def write_liftover_task_sheet(
+    seq_chunks: SeqChunks, out_stream: TextIO, source_genome: str, dest_genomes: Iterable[str]
+) -> None:
+    """Write a location-level HalCacheChain task sheet of sequence chunks.
+
+    The task sheet has one row per chunk and destination genome, with columns
+    'source_genome', 'source_sequence', 'source_start', 'source_end', 'source_strand',
+    'dest_genome' and 'task_bin'; chunk locations are 1-based and on the plus strand.
+
+    Args:
+        seq_chunks: Sequence chunks of the source genome, with their task bins.
+        out_stream: Output text stream.
+        source_genome: Source genome name.
+        dest_genomes: Destination genome names.
+    """
+    writer = csv.writer(out_stream, dialect=UnquotedUnixTab)
+    writer.writerow(
+        [
+            "source_genome",
+            "source_sequence",
+            "source_start",
+            "source_end",
+            "source_strand",
+            "dest_genome",
+            "task_bin",
+        ]
+    )
+    chunk_rows = list(
+        zip(
+            seq_chunks.seq_names,
+            (seq_chunks.starts + 1).tolist(),
+            (seq_chunks.starts + seq_chunks.lengths).tolist(),
+            seq_chunks.bin_names.tolist(),
+        )
+    )
+    for dest_genome in dest_genomes:
+        writer.writerows(
+            (source_genome, seq_name, start, end, 1, dest_genome, task_bin)
+            for seq_name, start, end, task_bin in chunk_rows
+        )
@@ -0,0 +1,358 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for reading and writing gzip- and BGZF-compressed files.
+
+BGZF is the blocked gzip format of ``bgzip`` and htslib: a series of gzip members,
+each holding at most 64 KiB of data, followed by an empty end-of-file member. Any
+gzip reader can decompress a BGZF file, while its blocks allow random access by
+virtual offset, which is the offset of a compressed block in the file shifted left
+by 16 bits, plus an offset within the uncompressed data of that block.
+
+Input files are decompressed transparently by :func:`open_input`, and output
+files with a '.gz' or '.bgz' suffix are written in BGZF format by :func:`open_output`,
+with blocks compressed by a pool of threads.
+
+Typical usage example::
+
+    >>> from ensembl.compara.utils.compression import open_input, open_output
+    >>> with open_input("in.maf.gz") as in_file_obj, open_output("out.maf.gz", threads=4) as out_file_obj:
+    ...     for line in in_file_obj:
+    ...         out_file_obj.write(line)
+
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "BgzfReader",
+    "BgzfWriter",
+    "get_bgzf_block_offsets",
+    "is_bgzf_file",
+    "is_compressed_output_path",
+    "is_gzip_file",
+    "open_input",
+    "open_output",
+]
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+import io
+import os
+import struct
+from typing import BinaryIO, Deque, Literal, Optional, TextIO, Tuple, Union, cast, overload
+import zlib
+
+import numpy as np
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+# Uncompressed data per block, as in htslib, so that a compressed block fits in 64 KiB.
+_BGZF_BLOCK_DATA_SIZE = 0xFF00
+_BGZF_MAX_BLOCK_SIZE = 0x10000
+_BGZF_HEADER = struct.Struct("<4BI2BH2BHH")
+_BGZF_FOOTER = struct.Struct("<II")
+_BGZF_EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_COMPRESSED_OUTPUT_SUFFIXES = (".gz", ".bgz")
+
+
+def is_gzip_file(file_path: Union[os.PathLike, str]) -> bool:
+    """Check whether a file starts with the gzip magic number."""
+    with open(file_path, "rb") as in_file_obj:
+        return in_file_obj.read(2) == _GZIP_MAGIC
+
+
+def is_bgzf_file(file_path: Union[os.PathLike, str]) -> bool:
+    """Check whether a file starts with a BGZF block header."""
+    with open(file_path, "rb") as in_file_obj:
+        header = in_file_obj.read(_BGZF_HEADER.size)
+    return _parse_bgzf_header(header) is not None
+
+
+def is_compressed_output_path(file_path: Union[os.PathLike, str]) -> bool:
+    """Check whether an output file is to be compressed, based on its file name suffix."""
+    return os.fspath(file_path).endswith(_COMPRESSED_OUTPUT_SUFFIXES)
+
+
+@overload
+def open_input(file_path: Union[os.PathLike, str], mode: Literal["rt"] = ...) -> TextIO: ...
+
+
+@overload
+def open_input(file_path: Union[os.PathLike, str], mode: Literal["rb"]) -> BinaryIO: ...
+
+
+def open_input(file_path: Union[os.PathLike, str], mode: str = "rt") -> Union[TextIO, BinaryIO]:
+    """Open an input file for reading, decompressing it if it is gzip- or BGZF-compressed.
+
+    Args:
+        file_path: Input file.
+        mode: Either 'rt' to read text, or 'rb' to read bytes.
+
+    Returns:
+        An open file object.
+
+    Raises:
+        ValueError: If the mode is not supported.
+    """
+    if mode not in ("rt", "rb"):
+        raise ValueError(f"unsupported input file mode: {mode}")
+    in_file_obj: Union[gzip.GzipFile, io.BufferedReader]
+    if is_gzip_file(file_path):
+        in_file_obj = gzip.open(file_path, "rb")
+    else:
+        in_file_obj = open(file_path, "rb")  # pylint: disable=consider-using-with
+    if mode == "rb":
+        return cast(BinaryIO, in_file_obj)
+    return io.TextIOWrapper(in_file_obj, encoding="utf-8")
+
+
+@overload
+def open_output(
+    file_path: Union[os.PathLike, str], mode: Literal["wt"] = ..., threads: int = ..., level: int = ...
+) -> TextIO: ...
+
+
+@overload
+def open_output(
+    file_path: Union[os.PathLike, str], mode: Literal["wb"], threads: int = ..., level: int = ...
+) -> BinaryIO: ...
+
+
+def open_output(
+    file_path: Union[os.PathLike, str], mode: str = "wt", threads: int = 1, level: int = 6
+) -> Union[TextIO, BinaryIO]:
+    """Open an output file for writing, in BGZF format if its name ends in '.gz' or '.bgz'.
+
+    Args:
+        file_path: Output file.
+        mode: Either 'wt' to write text, or 'wb' to write bytes.
+        threads: Number of threads compressing BGZF blocks.
+        level: Compression level of BGZF blocks, from 0 to 9.
+
+    Returns:
+        An open file object.
+
+    Raises:
+        ValueError: If the mode is not supported.
+    """
+    if mode not in ("wt", "wb"):
+        raise ValueError(f"unsupported output file mode: {mode}")
+    out_file_obj: BinaryIO
+    if is_compressed_output_path(file_path):
+        out_file_obj = cast(BinaryIO, BgzfWriter(file_path, threads=threads, level=level))
+    else:
+        out_file_obj = open(file_path, "wb")  # pylint: disable=consider-using-with
+    if mode == "wb":
+        return out_file_obj
+    return io.TextIOWrapper(out_file_obj, encoding="utf-8")
+
+
+def _compress_bgzf_block(data: bytes, level: int) -> bytes:
+    """Compress data of at most the BGZF block data size into a BGZF block."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    if len(cdata) + _BGZF_HEADER.size + _BGZF_FOOTER.size > _BGZF_MAX_BLOCK_SIZE:
+        # Incompressible data is stored, which always fits in a block.
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+    block_size = len(cdata) + _BGZF_HEADER.size + _BGZF_FOOTER.size
+    header = _BGZF_HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, block_size - 1)
+    return header + cdata + _BGZF_FOOTER.pack(zlib.crc32(data), len(data))
+
+
+def _parse_bgzf_header(header: bytes) -> Optional[int]:
+    """Get the total block size from a BGZF block header, or None if it is not a BGZF block header."""
+    if len(header) < _BGZF_HEADER.size:
+        return None
+    id1, id2, cm, flg, _mtime, _xfl, _os, xlen, si1, si2, slen, bsize = _BGZF_HEADER.unpack(header)
+    if (id1, id2, cm, flg, xlen, si1, si2, slen) != (31, 139, 8, 4, 6, 66, 67, 2):
+        return None
+    return bsize + 1
+
+
+class BgzfWriter(io.BufferedIOBase):
+    """Writer of BGZF files, which compresses blocks in a pool of threads.
+
+    Blocks are written in order, and at most two blocks per thread are held in
+    memory awaiting compression. The end-of-file block is written on close.
+
+    Args:
+        file_path: Output BGZF file.
+        threads: Number of threads compressing blocks.
+        level: Compression level, from 0 to 9.
+
+    Raises:
+        ValueError: If the number of threads is not greater than 0.
+    """
+
+    def __init__(self, file_path: Union[os.PathLike, str], threads: int = 1, level: int = 6) -> None:
+        super().__init__()
+        if threads < 1:
+            raise ValueError(f"number of threads must be greater than 0: {threads}")
+        self._file_obj = open(file_path, "wb")  # pylint: disable=consider-using-with
+        self._level = level
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self._max_pending = 2 * threads
+        self._pending: Deque[Future] = deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        if self.closed:
+            raise ValueError("write to closed BGZF file")
+        self._buffer += data
+        if len(self._buffer) >= _BGZF_BLOCK_DATA_SIZE:
+            full_size = len(self._buffer) - len(self._buffer) % _BGZF_BLOCK_DATA_SIZE
+            view = memoryview(self._buffer)
+            for offset in range(0, full_size, _BGZF_BLOCK_DATA_SIZE):
+                self._write_block(bytes(view[offset : offset + _BGZF_BLOCK_DATA_SIZE]))
+            view.release()
+            del self._buffer[:full_size]
+        return len(data)
+
+    def _write_block(self, data: bytes) -> None:
+        """Compress a block of data, and write any compressed blocks that are due."""
+        if self._executor is None:
+            self._file_obj.write(_compress_bgzf_block(data, self._level))
+            return
+        self._pending.append(self._executor.submit(_compress_bgzf_block, data, self._level))
+        while len(self._pending) > self._max_pending:
+            self._file_obj.write(self._pending.popleft().result())
+
+    def flush(self) -> None:
+        """Write any buffered data in a final partial block, and wait for all blocks to be written.
+
+        As in htslib, a flush ends the current block, so frequent flushes reduce compression.
+        """
+        if self._file_obj.closed:
+            return
+        if self._buffer:
+            self._write_block(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._file_obj.write(self._pending.popleft().result())
+        self._file_obj.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self._file_obj.write(_BGZF_EOF_BLOCK)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._file_obj.close()
+            super().close()
+
+
+def get_bgzf_block_offsets(file_path: Union[os.PathLike, str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the compressed and uncompressed start offsets of the blocks of a BGZF file.
+
+    Only block headers and footers are read.
+
+    Args:
+        file_path: Input BGZF file.
+
+    Returns:
+        A tuple of arrays of the compressed and uncompressed start offsets of each block.
+
+    Raises:
+        ValueError: If the file is not a valid BGZF file.
+    """
+    block_offsets = []
+    data_offsets = []
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as in_file_obj:
+        block_offset = 0
+        data_offset = 0
+        while block_offset < file_size:
+            in_file_obj.seek(block_offset)
+            block_size = _parse_bgzf_header(in_file_obj.read(_BGZF_HEADER.size))
+            if block_size is None or block_offset + block_size > file_size:
+                raise ValueError(f"invalid BGZF block at offset {block_offset}: {file_path}")
+            in_file_obj.seek(block_offset + block_size - 4)
+            (data_size,) = struct.unpack("<I", in_file_obj.read(4))
+            block_offsets.append(block_offset)
+            data_offsets.append(data_offset)
+            block_offset += block_size
+            data_offset += data_size
+    return np.array(block_offsets, dtype=np.int64), np.array(data_offsets, dtype=np.int64)
+
+
+class BgzfReader:
+    """Reader of BGZF files by virtual offset.
+
+    Args:
+        file_path: Input BGZF file.
+    """
+
+    def __init__(self, file_path: Union[os.PathLike, str]) -> None:
+        self._file_obj = open(file_path, "rb")  # pylint: disable=consider-using-with
+        self._block_offset = -1
+        self._block_data = b""
+        self._next_block_offset = 0
+
+    def __enter__(self) -> BgzfReader:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the BGZF file."""
+        self._file_obj.close()
+
+    def _read_block(self, block_offset: int) -> Tuple[bytes, int]:
+        """Read and decompress the block at the given offset, returning its data and the next block offset."""
+        if block_offset != self._block_offset:
+            self._file_obj.seek(block_offset)
+            header = self._file_obj.read(_BGZF_HEADER.size)
+            block_size = _parse_bgzf_header(header)
+            if block_size is None:
+                raise ValueError(f"invalid BGZF block at offset {block_offset}")
+            cdata = self._file_obj.read(block_size - _BGZF_HEADER.size - _BGZF_FOOTER.size)
+            self._block_data = zlib.decompress(cdata, -15)
+            self._block_offset = block_offset
+            self._next_block_offset = block_offset + block_size
+        return self._block_data, self._next_block_offset
+
+    def read(self, virtual_offset: int, size: int) -> bytes:
+        """Read uncompressed data starting at a virtual offset.
+
+        Args:
+            virtual_offset: Virtual offset of the start of the data.
+            size: Number of uncompressed bytes to read.
+
+        Returns:
+            The uncompressed data, which is shorter than ``size`` at the end of the file.
+        """
+        block_offset = virtual_offset >> 16
+        data_start = virtual_offset & 0xFFFF
+        chunks = []
+        while size > 0:
+            block_data, next_block_offset = self._read_block(block_offset)
+            if not block_data and data_start == 0:
+                break  # end-of-file block
+            chunk = block_data[data_start : data_start + size]
+            chunks.append(chunk)
+            size -= len(chunk)
+            block_offset = next_block_offset
+            data_start = 0
+        return b"".join(chunks)
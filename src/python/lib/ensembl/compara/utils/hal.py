@@ -19,22 +19,27 @@ from __future__ import annotations
 __all__ = [
     "extract_region_sequences_from_2bit",
     "extract_regions_from_bed",
+    "make_flanked_src_region",
     "make_src_region_file",
+    "RegionArray",
     "SimpleRegion",
 ]
 
+import csv
 from dataclasses import dataclass, InitVar
-import os
 from pathlib import Path
 import re
-import subprocess
-from tempfile import TemporaryDirectory
-from typing import Iterable, List, Mapping, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, TextIO, Union
 
-from Bio.SeqIO.FastaIO import SimpleFastaParser
+import numpy as np
 
+from .csv import UnquotedUnixTab
+from .twobit import load_two_bit_file
 
-@dataclass(frozen=True)
+_SEQ_REGION_REGEX = re.compile(r"^(?P<chrom>[^:]+):(?P<start>[0-9]+)-(?P<end>[0-9]+):(?P<strand>.+)$")
+
+
+@dataclass(frozen=True, slots=True)
 class SimpleRegion:
     """A simple DNA sequence region."""
 
@@ -71,11 +76,7 @@ class SimpleRegion:
         Raises:
             ValueError: If ``region_string`` is an invalid 1-based region string.
         """
-
-        seq_region_regex = re.compile(r"^(?P<chrom>[^:]+):(?P<start>[0-9]+)-(?P<end>[0-9]+):(?P<strand>.+)$")
-        match = seq_region_regex.match(region_string)
-
-        if match := seq_region_regex.fullmatch(region_string):
+        if match := _SEQ_REGION_REGEX.fullmatch(region_string):
             region = cls.from_1_based_region_attribs(
                 match["chrom"],
                 match["start"],
@@ -137,51 +138,376 @@ class SimpleRegion:
         return f"{self.chrom}:{self.start + 1}-{self.end}:{strand_num}"
 
 
+class RegionArray:
+    """A columnar array of simple DNA sequence regions.
+
+    Regions are stored as NumPy arrays of chromosome codes, 0-based starts,
+    ends and strands, so that large numbers of regions can be loaded and
+    validated in bulk. Indexing or iterating over a region array yields
+    :class:`SimpleRegion` objects.
+
+    Args:
+        chrom_names: Genome sequence names, indexed by chromosome code.
+        chrom_codes: Chromosome code of each region.
+        starts: 0-based start position of each region.
+        ends: End position of each region.
+        strands: Strand of each region; either 1 for plus strand or -1 for minus strand.
+        names: Name of each region, if any.
+        validate: Check that all regions are valid 0-based regions.
+
+    Raises:
+        ValueError: If the region columns differ in length, or if ``validate`` is
+            true and any region is invalid.
+    """
+
+    __slots__ = ("chrom_names", "chrom_codes", "starts", "ends", "strands", "names")
+
+    def __init__(
+        self,
+        chrom_names: Sequence[str],
+        chrom_codes: Union[np.ndarray, Sequence[int]],
+        starts: Union[np.ndarray, Sequence[int]],
+        ends: Union[np.ndarray, Sequence[int]],
+        strands: Union[np.ndarray, Sequence[int]],
+        names: Optional[Sequence[Optional[str]]] = None,
+        validate: bool = True,
+    ) -> None:
+        self.chrom_names = list(chrom_names)
+        self.chrom_codes = np.asarray(chrom_codes, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.strands = np.asarray(strands, dtype=np.int8)
+        self.names = list(names) if names is not None else None
+
+        column_lengths = {
+            len(x)
+            for x in (self.chrom_codes, self.starts, self.ends, self.strands, self.names)
+            if x is not None
+        }
+        if len(column_lengths) > 1:
+            raise ValueError("region array columns must have the same length")
+
+        if validate:
+            if len(self.chrom_codes) and not (
+                0 <= self.chrom_codes.min() and self.chrom_codes.max() < len(self.chrom_names)
+            ):
+                raise ValueError("region array has invalid chromosome codes")
+
+            if (invalid := np.flatnonzero(self.starts < 0)).size:
+                start = self.starts[invalid[0]]
+                raise ValueError(f"0-based region start must be greater than or equal to 0: {start}")
+
+            if (invalid := np.flatnonzero(self.starts >= self.ends)).size:
+                start, end = self.starts[invalid[0]], self.ends[invalid[0]]
+                raise ValueError(f"0-based region end ({end}) must be greater than region start ({start})")
+
+            if (invalid := np.flatnonzero(np.abs(self.strands) != 1)).size:
+                raise ValueError(f"0-based region has invalid strand: '{self.strands[invalid[0]]}'")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> SimpleRegion:
+        return SimpleRegion(
+            self.chrom_names[self.chrom_codes[index]],
+            int(self.starts[index]),
+            int(self.ends[index]),
+            "+" if self.strands[index] == 1 else "-",
+            name=self.names[index] if self.names is not None else None,
+            validate=False,
+        )
+
+    def __iter__(self) -> Iterator[SimpleRegion]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def take(self, indices: Union[np.ndarray, Sequence[int]]) -> RegionArray:
+        """Get a region array of the regions at the given indices.
+
+        Args:
+            indices: Indices of the regions to take, in output order.
+
+        Returns:
+            A region array sharing the chromosome names of this region array.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return RegionArray(
+            self.chrom_names,
+            self.chrom_codes[indices],
+            self.starts[indices],
+            self.ends[indices],
+            self.strands[indices],
+            names=[self.names[i] for i in indices] if self.names is not None else None,
+            validate=False,
+        )
+
+    def group_by_chrom(self) -> Dict[str, RegionArray]:
+        """Group regions by genome sequence name.
+
+        Returns:
+            Dictionary mapping each genome sequence name to a region array of the
+            regions on that sequence, in their original order.
+        """
+        order = np.argsort(self.chrom_codes, kind="stable")
+        codes, group_starts = np.unique(self.chrom_codes[order], return_index=True)
+        groups = np.split(order, group_starts[1:])
+        return {self.chrom_names[code]: self.take(group) for code, group in zip(codes, groups)}
+
+    @classmethod
+    def from_regions(cls, regions: Iterable[SimpleRegion]) -> RegionArray:
+        """Create a region array from region objects.
+
+        Args:
+            regions: Regions to include.
+
+        Returns:
+            A region array.
+        """
+        regions = list(regions)
+        names = [x.name for x in regions]
+        return cls._from_columns(
+            [x.chrom for x in regions],
+            [x.start for x in regions],
+            [x.end for x in regions],
+            [1 if x.strand == "+" else -1 for x in regions],
+            names=names if any(x is not None for x in names) else None,
+            validate=False,
+        )
+
+    @classmethod
+    def from_bed(cls, bed_file: Union[Path, str]) -> RegionArray:
+        """Create a region array from the regions of a BED file.
+
+        Args:
+            bed_file: Input BED file with at least six columns.
+
+        Returns:
+            A region array.
+
+        Raises:
+            ValueError: If any region in the BED file is invalid.
+        """
+        with open(bed_file) as in_file_obj:
+            rows = [line.rstrip("\n").split("\t", 6) for line in in_file_obj]
+
+        if not rows:
+            return cls([], [], [], [], [])
+
+        chroms, starts, ends, _names, _scores, strand_signs = list(zip(*rows))[:6]
+
+        strand_array = np.array(strand_signs)
+        strands = np.select([strand_array == "+", strand_array == "-"], [1, -1], default=0)
+        if (invalid := np.flatnonzero(strands == 0)).size:
+            raise ValueError(f"0-based region has invalid strand: '{strand_array[invalid[0]]}'")
+
+        return cls._from_columns(
+            chroms, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), strands
+        )
+
+    @classmethod
+    def from_tsv(cls, tsv_file: TextIO) -> RegionArray:
+        """Create a region array from a TSV file of 1-based regions.
+
+        Args:
+            tsv_file: Input TSV file stream with columns 'chr', 'start', 'end',
+                'strand' and optionally 'name'.
+
+        Returns:
+            A region array.
+
+        Raises:
+            ValueError: If the TSV file lacks a required column, or if any region in it is invalid.
+        """
+        reader = csv.DictReader(tsv_file, dialect=UnquotedUnixTab)
+        required_fields = ["chr", "start", "end", "strand"]
+        if reader.fieldnames is not None:
+            missing_fields = [x for x in required_fields if x not in reader.fieldnames]
+            if missing_fields:
+                raise ValueError(f"region TSV file lacks required columns: {', '.join(missing_fields)}")
+        columns: Dict[str, List[str]] = {x: [] for x in required_fields + ["name"]}
+        for row in reader:
+            for field, values in columns.items():
+                # A missing 'name' column or a short row gives empty values
+                values.append(row.get(field) or "")
+
+        names = [x if x else None for x in columns["name"]]
+        return cls._from_1_based_columns(
+            columns["chr"],
+            columns["start"],
+            columns["end"],
+            columns["strand"],
+            names=names if any(x is not None for x in names) else None,
+        )
+
+    @classmethod
+    def from_region_strings(
+        cls, region_strings: Iterable[str], names: Optional[Sequence[Optional[str]]] = None
+    ) -> RegionArray:
+        """Create a region array from 1-based region strings.
+
+        Args:
+            region_strings: 1-based region strings.
+            names: Name of each region, if any.
+
+        Returns:
+            A region array.
+
+        Raises:
+            ValueError: If any region string is an invalid 1-based region string.
+        """
+        chroms, starts, ends, strands = [], [], [], []
+        for region_string in region_strings:
+            if not (match := _SEQ_REGION_REGEX.fullmatch(region_string)):
+                raise ValueError(f"failed to tokenise 1-based region string: '{region_string}'")
+            chroms.append(match["chrom"])
+            starts.append(match["start"])
+            ends.append(match["end"])
+            strands.append(match["strand"])
+
+        return cls._from_1_based_columns(chroms, starts, ends, strands, names=names)
+
+    @classmethod
+    def _from_1_based_columns(
+        cls,
+        chroms: Sequence[str],
+        starts: Sequence[Union[int, str]],
+        ends: Sequence[Union[int, str]],
+        strands: Sequence[Union[int, str]],
+        names: Optional[Sequence[Optional[str]]] = None,
+    ) -> RegionArray:
+        """Create a region array from columns of 1-based region attributes,
+        validating them as :meth:`SimpleRegion.from_1_based_region_attribs` would."""
+        start_array = np.array(starts, dtype=np.int64)
+        end_array = np.array(ends, dtype=np.int64)
+
+        if (invalid := np.flatnonzero(start_array < 1)).size:
+            start = start_array[invalid[0]]
+            raise ValueError(f"1-based region start must be greater than or equal to 1: {start}")
+
+        if (invalid := np.flatnonzero(start_array > end_array)).size:
+            start, end = start_array[invalid[0]], end_array[invalid[0]]
+            raise ValueError(
+                f"1-based region end ({end}) must be greater than or equal to region start ({start})"
+            )
+
+        strand_values, strand_indices = np.unique(np.array(strands, dtype=str), return_inverse=True)
+        strand_nums = []
+        for strand in strand_values:
+            try:
+                strand_num = int(strand)
+            except ValueError:
+                strand_num = 0
+            if strand_num not in (1, -1):
+                raise ValueError(f"1-based region has invalid strand: '{strand}'")
+            strand_nums.append(strand_num)
+
+        return cls._from_columns(
+            chroms,
+            start_array - 1,
+            end_array,
+            np.array(strand_nums, dtype=np.int8)[strand_indices],
+            names=names,
+            validate=False,
+        )
+
+    @classmethod
+    def _from_columns(
+        cls,
+        chroms: Sequence[str],
+        starts: Union[np.ndarray, Sequence[int]],
+        ends: Union[np.ndarray, Sequence[int]],
+        strands: Union[np.ndarray, Sequence[int]],
+        names: Optional[Sequence[Optional[str]]] = None,
+        validate: bool = True,
+    ) -> RegionArray:
+        """Create a region array from columns of 0-based region attributes."""
+        chrom_names, chrom_codes = np.unique(np.array(chroms, dtype=str), return_inverse=True)
+        return cls(
+            chrom_names.tolist(),
+            chrom_codes.reshape(-1),
+            starts,
+            ends,
+            strands,
+            names=names,
+            validate=validate,
+        )
+
+
 def extract_region_sequences_from_2bit(
     regions: Iterable[SimpleRegion], two_bit_file: Union[Path, str]
 ) -> List[str]:
     """Extract region sequences from a 2bit file.
 
+    As with ``twoBitToFa``, soft-masked bases are returned in lower case,
+    and minus-strand regions are reverse complemented.
+
     Args:
         regions: Regions to extract.
         two_bit_file: 2bit sequence file.
 
     Returns:
         List of region sequences.
+
+    Raises:
+        ValueError: If any region is not within a sequence of the 2bit file.
     """
-    with TemporaryDirectory() as tmp_dir:
-        tmp_bed_file = os.path.join(tmp_dir, "regions.bed")
-        with open(tmp_bed_file, "w") as out_file_obj:
-            for idx, region in enumerate(regions):
-                fields = [region.chrom, region.start, region.end, idx, 0, region.strand]
-                print("\t".join(str(x) for x in fields), file=out_file_obj)
+    two_bit = load_two_bit_file(two_bit_file)
+    return [two_bit.fetch(region.chrom, region.start, region.end, region.strand) for region in regions]
+
 
-        tmp_fasta_file = os.path.join(tmp_dir, "regions.fa")
-        cmd_args = ["twoBitToFa", f"-bed={tmp_bed_file}", two_bit_file, tmp_fasta_file]
-        subprocess.run(cmd_args, check=True)
+def extract_regions_from_bed(bed_file: Union[Path, str]) -> RegionArray:
+    """Extract liftover destination regions from a BED file.
+
+    Args:
+        bed_file: Input BED file.
 
-        with open(tmp_fasta_file) as in_file_obj:
-            sequences = [seq for _, seq in SimpleFastaParser(in_file_obj)]
+    Returns:
+        Array of regions.
 
-    return sequences
+    Raises:
+        ValueError: If any region in the BED file is invalid.
+    """
+    return RegionArray.from_bed(bed_file)
 
 
-def extract_regions_from_bed(bed_file: Union[Path, str]) -> List[SimpleRegion]:
-    """Extract liftover destination regions from a BED file.
+def make_flanked_src_region(
+    region: SimpleRegion, chrom_sizes: Mapping[str, int], flank_length: int = 0
+) -> SimpleRegion:
+    """Make a liftover source region, extended by flanking regions within its chromosome.
 
     Args:
-        bed_file: Input BED file.
+        region: Source region.
+        chrom_sizes: Mapping of genome sequence names to their lengths.
+        flank_length: Length of upstream/downstream flanking regions to request.
 
     Returns:
-        List of regions.
+        The flanked source region.
+
+    Raises:
+        ValueError: If the region has an unknown genome sequence or invalid coordinates,
+            or if ``flank_length`` is negative.
     """
-    dst_regions = []
-    with open(bed_file) as in_file_obj:
-        for line in in_file_obj:
-            chrom, start, end, _name, _score, strand, *_unused = line.rstrip("\n").split("\t")
-            dst_regions.append(SimpleRegion(chrom, int(start), int(end), strand))
+    if flank_length < 0:
+        raise ValueError(f"'flank_length' must be greater than or equal to 0: {flank_length}")
+
+    try:
+        chrom_size = chrom_sizes[region.chrom]
+    except KeyError as exc:
+        raise ValueError(f"chromosome ID '{region.chrom}' not found in genome chrom sizes") from exc
 
-    return dst_regions
+    if region.start < 0:
+        raise ValueError(f"region start must be greater than or equal to 0: {region.start}")
+
+    if region.end > chrom_size:
+        raise ValueError(
+            f"region end ({region.end}) must not be greater than the"
+            f" corresponding chromosome length ({region.chrom}: {chrom_size})"
+        )
+
+    flanked_start = max(0, region.start - flank_length)
+    flanked_end = min(region.end + flank_length, chrom_size)
+
+    return SimpleRegion(region.chrom, flanked_start, flanked_end, region.strand, name=region.name)
 
 
 def make_src_region_file(
@@ -208,38 +534,19 @@ def make_src_region_file(
         ValueError: If any region has an unknown genome sequence or invalid coordinates,
             or if ``flank_length`` is negative.
     """
-    if flank_length < 0:
-        raise ValueError(f"'flank_length' must be greater than or equal to 0: {flank_length}")
-
     region = SimpleRegion.from_1_based_region_attribs(chrom, start, end, strand)
+    flanked_region = make_flanked_src_region(region, chrom_sizes, flank_length=flank_length)
 
     with open(bed_file, "w") as f:
         name = "."
         score = 0  # halLiftover requires an integer score in BED input
 
-        try:
-            chrom_size = chrom_sizes[region.chrom]
-        except KeyError as exc:
-            raise ValueError(f"chromosome ID '{region.chrom}' not found in genome chrom sizes") from exc
-
-        if region.start < 0:
-            raise ValueError(f"region start must be greater than or equal to 0: {region.start}")
-
-        if region.end > chrom_size:
-            raise ValueError(
-                f"region end ({region.end}) must not be greater than the"
-                f" corresponding chromosome length ({region.chrom}: {chrom_size})"
-            )
-
-        flanked_start = max(0, region.start - flank_length)
-        flanked_end = min(region.end + flank_length, chrom_size)
-
         fields = [
-            region.chrom,
-            flanked_start,
-            flanked_end,
+            flanked_region.chrom,
+            flanked_region.start,
+            flanked_region.end,
             name,
             score,
-            region.strand,
+            flanked_region.strand,
         ]
         print("\t".join(str(x) for x in fields), file=f)
@@ -0,0 +1,911 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for reading and writing MAF alignment files.
+
+MAF blocks are read into NumPy arrays: the aligned sequences of a block form a
+matrix of single bytes (dtype ``S1``) with one row per sequence, and the ``s``
+line fields of the block rows are held in parallel arrays. Input is parsed as
+by ``Bio.AlignIO.MafIO.MafIterator``, and :class:`MafWriter` produces the same
+output as ``Bio.AlignIO.MafIO.MafWriter``, so that scripts can move between
+the two without changing their output.
+
+Typical usage example::
+
+    >>> from ensembl.compara.utils.maf import iter_maf_blocks, MafWriter
+    >>> with open("in.maf") as in_file_obj, open("out.maf", "w") as out_file_obj:
+    ...     writer = MafWriter(out_file_obj)
+    ...     writer.write_header()
+    ...     for block in iter_maf_blocks(in_file_obj):
+    ...         writer.write_block(block.take_rows(block.sizes >= 5))
+
+Large MAF files can be processed in parallel with :func:`run_maf_transform`,
+which splits the input file into chunks of whole blocks, applies a block
+transform to each chunk in a process pool, and writes the output in input order.
+A transform that cuts each block into many small blocks can return them as
+:class:`MafBlockSlices`, which are written without making a block for each one.
+Its input may be gzip- or BGZF-compressed, and its output is written in BGZF
+format if the output file name ends in '.gz' or '.bgz'.
+
+A MAF file can be indexed by the reference sequence (the first sequence) of
+each block with :func:`load_maf_index`, which stores block byte offsets and
+reference regions in a sorted binary sidecar file, so that the blocks
+overlapping a region can be read without scanning the whole file. BGZF-compressed
+MAF files are indexed by the virtual offsets of their blocks::
+
+    >>> from ensembl.compara.utils.maf import load_maf_index
+    >>> maf_index = load_maf_index("aln.maf")
+    >>> [block.srcs[0] for block in maf_index.fetch("aln.maf", "Anc0.chr1", 0, 10)]
+    ['Anc0.chr1', 'Anc0.chr1']
+
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "build_maf_index",
+    "find_maf_chunk_offsets",
+    "get_maf_index_path",
+    "iter_maf_blocks",
+    "load_maf_index",
+    "MafBlock",
+    "MafBlockSlices",
+    "MafBlockTransform",
+    "MafIndex",
+    "MafRunStats",
+    "MafWriter",
+    "read_maf_block_count",
+    "run_maf_transform",
+]
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import io
+import mmap
+import os
+from pathlib import Path
+import shutil
+from tempfile import TemporaryDirectory
+import struct
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .binary_index import read_binary_index, write_binary_index
+from .compression import (
+    BgzfReader,
+    get_bgzf_block_offsets,
+    is_bgzf_file,
+    is_gzip_file,
+    open_input,
+    open_output,
+)
+
+_INDEX_MAGIC = b"ECMAFIDX"
+_INDEX_VERSION = 1
+
+_INDEX_COLUMN_DTYPES: Dict[str, np.dtype] = {
+    "ref_start": np.dtype("<i8"),
+    "ref_end": np.dtype("<i8"),
+    "ref_max_end": np.dtype("<i8"),
+    "offset": np.dtype("<i8"),
+    "length": np.dtype("<i8"),
+}
+
+
+@dataclass(slots=True)
+class MafBlock:
+    """A MAF alignment block.
+
+    Attributes:
+        seqs: Matrix of aligned sequence bytes (dtype ``S1``), with one row per sequence.
+        srcs: Source sequence name of each row.
+        starts: 0-based start of the aligned region of each row.
+        sizes: Ungapped length of the aligned region of each row.
+        strands: Strand of each row; either 1 for plus strand or -1 for minus strand.
+        src_sizes: Source sequence length of each row.
+        annotations: Annotations of the 'a' line of the block, or None for a new block.
+    """
+
+    seqs: np.ndarray
+    srcs: List[str]
+    starts: np.ndarray
+    sizes: np.ndarray
+    strands: np.ndarray
+    src_sizes: np.ndarray
+    annotations: Optional[Dict[str, str]] = None
+
+    @property
+    def num_rows(self) -> int:
+        """Number of sequences in this block."""
+        return self.seqs.shape[0]
+
+    @property
+    def num_cols(self) -> int:
+        """Number of alignment columns in this block."""
+        return self.seqs.shape[1]
+
+    @classmethod
+    def from_rows(
+        cls,
+        srcs: Sequence[str],
+        starts: Sequence[int],
+        sizes: Sequence[int],
+        strands: Sequence[int],
+        src_sizes: Sequence[int],
+        seqs: Sequence[Union[str, bytes]],
+        annotations: Optional[Dict[str, str]] = None,
+    ) -> MafBlock:
+        """Create a MAF block from row values.
+
+        Args:
+            srcs: Source sequence name of each row.
+            starts: 0-based start of the aligned region of each row.
+            sizes: Ungapped length of the aligned region of each row.
+            strands: Strand of each row; either 1 for plus strand or -1 for minus strand.
+            src_sizes: Source sequence length of each row.
+            seqs: Aligned sequence of each row.
+            annotations: Annotations of the 'a' line of the block, or None for a new block.
+
+        Returns:
+            A MAF block.
+
+        Raises:
+            ValueError: If the aligned sequences differ in length.
+        """
+        seq_bytes = [x.encode("ascii") if isinstance(x, str) else x for x in seqs]
+        num_cols = len(seq_bytes[0]) if seq_bytes else 0
+        if any(len(x) != num_cols for x in seq_bytes):
+            raise ValueError("Sequences must all be the same length")
+        seq_matrix = np.frombuffer(b"".join(seq_bytes), dtype="S1").reshape(len(seq_bytes), num_cols)
+        return cls(
+            seq_matrix.copy(),
+            list(srcs),
+            np.array(starts, dtype=np.int64),
+            np.array(sizes, dtype=np.int64),
+            np.array(strands, dtype=np.int8),
+            np.array(src_sizes, dtype=np.int64),
+            annotations=annotations,
+        )
+
+    def row_seq(self, row_idx: int) -> str:
+        """Get the aligned sequence of a row as a string."""
+        return self.seqs[row_idx].tobytes().decode("ascii")
+
+    def take_rows(self, rows: Union[np.ndarray, Sequence[int]]) -> MafBlock:
+        """Get a MAF block of the selected rows of this block.
+
+        Args:
+            rows: Boolean row mask or row indices.
+
+        Returns:
+            A MAF block with the annotations of this block.
+        """
+        row_idxs = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.intp)
+        return MafBlock(
+            self.seqs[row_idxs],
+            [self.srcs[i] for i in row_idxs],
+            self.starts[row_idxs],
+            self.sizes[row_idxs],
+            self.strands[row_idxs],
+            self.src_sizes[row_idxs],
+            annotations=self.annotations,
+        )
+
+
+@dataclass(slots=True)
+class MafBlockSlices:
+    """Column slices of a MAF block, each of which is a new MAF block.
+
+    A block transform that splits a block into many small blocks can return its
+    output as slices, without making a MAF block for each one: :class:`MafWriter`
+    formats the slices directly from the sequence rows of the sliced block, while
+    iterating over the slices yields a MAF block for each slice.
+
+    Attributes:
+        block: The sliced MAF block.
+        col_starts: Start column of each slice.
+        col_stops: Stop column of each slice.
+        starts: Matrix of the 0-based start of each row, with one row per slice.
+        sizes: Matrix of the ungapped length of each row, with one row per slice.
+    """
+
+    block: MafBlock
+    col_starts: np.ndarray
+    col_stops: np.ndarray
+    starts: np.ndarray
+    sizes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.col_starts)
+
+    def __iter__(self) -> Iterator[MafBlock]:
+        for col_start, col_stop, starts, sizes in zip(
+            self.col_starts, self.col_stops, self.starts, self.sizes
+        ):
+            yield MafBlock(
+                self.block.seqs[:, col_start:col_stop],
+                self.block.srcs,
+                starts,
+                sizes,
+                self.block.strands,
+                self.block.src_sizes,
+            )
+
+
+def iter_maf_blocks(stream: Iterable[str]) -> Iterator[MafBlock]:
+    """Iterate over the blocks of a MAF file.
+
+    As with ``Bio.AlignIO.MafIO.MafIterator``, 'i', 'e' and 'q' lines are skipped,
+    a strand other than '-' is read as the plus strand, and a dot in a sequence
+    is read as the base of the first sequence of the block in that column.
+
+    Args:
+        stream: Input MAF file stream, or any other iterable of MAF lines.
+
+    Yields:
+        MAF blocks.
+
+    Raises:
+        ValueError: If the MAF file cannot be parsed.
+    """
+    annotations: Optional[Dict[str, str]] = None
+    rows: List[List[str]] = []
+
+    for line in stream:
+        if annotations is None:
+            if line.startswith("a"):
+                annot_strings = line.strip().split()[1:]
+                if len(annot_strings) != line.count("="):
+                    raise ValueError("Error parsing alignment - invalid key in 'a' line")
+                annotations = dict(x.split("=") for x in annot_strings)
+            continue
+
+        if line.startswith("s"):
+            fields = line.split()
+            if len(fields) != 7:
+                raise ValueError("Error parsing alignment - 's' line must have 7 fields")
+            rows.append(fields)
+        elif not line.strip():
+            yield _make_block(rows, annotations)
+            annotations = None
+            rows = []
+        elif line[0] not in "ieq#":
+            raise ValueError(f"Error parsing alignment - unexpected line:\n{line}")
+
+    if annotations is not None:
+        yield _make_block(rows, annotations)
+
+
+def _make_block(rows: List[List[str]], annotations: Dict[str, str]) -> MafBlock:
+    """Make a MAF block from the fields of its 's' lines."""
+    seqs = [x[6] for x in rows]
+    if any("." in x for x in seqs):
+        if "." in seqs[0]:
+            raise ValueError("Found dot/period in first sequence of alignment")
+        ref_seq = seqs[0]
+        seqs = ["".join(r if c == "." else c for c, r in zip(x, ref_seq)) if "." in x else x for x in seqs]
+
+    return MafBlock.from_rows(
+        [x[1] for x in rows],
+        [int(x[2]) for x in rows],
+        [int(x[3]) for x in rows],
+        [-1 if x[4] == "-" else 1 for x in rows],
+        [int(x[5]) for x in rows],
+        seqs,
+        annotations=annotations,
+    )
+
+
+class MafWriter:
+    """Writer of MAF blocks, with the output format of ``Bio.AlignIO.MafIO.MafWriter``.
+
+    Args:
+        stream: Output MAF file stream.
+
+    Attributes:
+        header: MAF header text written by :meth:`write_header`.
+    """
+
+    header = "##maf version=1 scoring=none\n# generated by Biopython\n\n"
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write_header(self) -> None:
+        """Write the MAF header."""
+        self.stream.write(self.header)
+
+    def write_block(self, block: MafBlock) -> int:
+        """Write a MAF block.
+
+        Only the 'score' and 'pass' annotations of the block are written, and a new
+        block without annotations is given the annotation 'score=0.00'.
+
+        Args:
+            block: MAF block to write.
+
+        Returns:
+            Number of sequences written.
+        """
+        if block.annotations is None:
+            anno = "score=0.00"
+        else:
+            anno = " ".join(f"{k}={v}" for k, v in block.annotations.items() if k in ("score", "pass"))
+
+        lines = [f"a {anno}\n"]
+        if block.num_rows > 0:
+            if block.num_cols > 0:
+                row_seqs = np.ascontiguousarray(block.seqs).view(f"S{block.num_cols}").ravel()
+            else:
+                row_seqs = np.array([b""] * block.num_rows)
+            for src, start, size, strand, src_size, seq in zip(
+                block.srcs,
+                block.starts.tolist(),
+                block.sizes.tolist(),
+                block.strands.tolist(),
+                block.src_sizes.tolist(),
+                row_seqs,
+            ):
+                strand_sign = "-" if strand == -1 else "+"
+                src = src.replace(" ", "_")
+                lines.append(
+                    f"s {src:<40} {start:>15} {size:>5} {strand_sign} {src_size:>15} {seq.decode('ascii')}\n"
+                )
+        lines.append("\n")
+        self.stream.write("".join(lines))
+
+        return block.num_rows
+
+    def write_block_slices(self, block_slices: MafBlockSlices) -> int:
+        """Write each slice of a MAF block as a new MAF block.
+
+        The output is the same as writing each MAF block of ``block_slices`` in turn,
+        but each sequence row of the sliced block is decoded only once.
+
+        Args:
+            block_slices: MAF block slices to write.
+
+        Returns:
+            Number of sequences written.
+        """
+        block = block_slices.block
+        row_formats = [
+            (
+                f"s {src.replace(' ', '_'):<40} ",
+                f" {'-' if strand == -1 else '+'} {src_size:>15} ",
+                seq_row.tobytes().decode("ascii"),
+            )
+            for src, strand, src_size, seq_row in zip(
+                block.srcs, block.strands.tolist(), block.src_sizes.tolist(), block.seqs
+            )
+        ]
+
+        lines = []
+        for col_start, col_stop, starts, sizes in zip(
+            block_slices.col_starts.tolist(),
+            block_slices.col_stops.tolist(),
+            block_slices.starts.tolist(),
+            block_slices.sizes.tolist(),
+        ):
+            lines.append("a score=0.00\n")
+            for (row_prefix, row_infix, row_seq), start, size in zip(row_formats, starts, sizes):
+                lines.append(f"{row_prefix}{start:>15} {size:>5}{row_infix}{row_seq[col_start:col_stop]}\n")
+            lines.append("\n")
+        self.stream.write("".join(lines))
+
+        return len(block_slices) * block.num_rows
+
+
+MafBlockTransform = Callable[[MafBlock], Iterable[MafBlock]]
+
+
+@dataclass
+class MafRunStats:
+    """Block and sequence counts of a MAF block transform run.
+
+    Attributes:
+        input_block_count: Number of input MAF blocks.
+        output_block_count: Number of output MAF blocks.
+        output_seq_count: Number of sequences in output MAF blocks.
+    """
+
+    input_block_count: int = 0
+    output_block_count: int = 0
+    output_seq_count: int = 0
+
+    def __iadd__(self, other: MafRunStats) -> MafRunStats:
+        self.input_block_count += other.input_block_count
+        self.output_block_count += other.output_block_count
+        self.output_seq_count += other.output_seq_count
+        return self
+
+
+def find_maf_chunk_offsets(maf_file: Union[Path, str], chunk_size: int) -> List[int]:
+    """Find the start offsets of chunks of whole blocks in a MAF file.
+
+    Each chunk but the first starts at the first 'a' line at or after a
+    multiple of the chunk size, so that chunks can be parsed independently.
+
+    Args:
+        maf_file: Input MAF file.
+        chunk_size: Approximate size of each chunk in bytes.
+
+    Returns:
+        Sorted byte offsets of chunk starts, the first of which is 0.
+
+    Raises:
+        ValueError: If the chunk size is not greater than 0.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk size must be greater than 0: {chunk_size}")
+
+    chunk_offsets = [0]
+    file_size = os.path.getsize(maf_file)
+    if file_size == 0:
+        return chunk_offsets
+
+    with open(maf_file, "rb") as in_file_obj:
+        with mmap.mmap(in_file_obj.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for approx_offset in range(chunk_size, file_size, chunk_size):
+                if approx_offset <= chunk_offsets[-1]:
+                    continue
+                newline_offset = data.find(b"\na", approx_offset - 1)
+                if newline_offset == -1:
+                    break
+                chunk_offsets.append(newline_offset + 1)
+
+    return chunk_offsets
+
+
+def _transform_maf_blocks(in_stream: TextIO, out_stream: TextIO, transform: MafBlockTransform) -> MafRunStats:
+    """Apply a block transform to each block of a MAF stream, and write the output blocks."""
+    stats = MafRunStats()
+    writer = MafWriter(out_stream)
+    for maf_block in iter_maf_blocks(in_stream):
+        stats.input_block_count += 1
+        out_blocks = transform(maf_block)
+        if isinstance(out_blocks, MafBlockSlices):
+            stats.output_seq_count += writer.write_block_slices(out_blocks)
+            stats.output_block_count += len(out_blocks)
+            continue
+        for out_block in out_blocks:
+            stats.output_seq_count += writer.write_block(out_block)
+            stats.output_block_count += 1
+    return stats
+
+
+def _iter_maf_text_chunks(stream: TextIO, chunk_size: int) -> Iterator[str]:
+    """Read chunks of whole blocks from a MAF stream, each of at least the chunk size but the last."""
+    carry = ""
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        text = carry + data
+        newline_offset = text.rfind("\na")
+        if newline_offset == -1:
+            carry = text
+            continue
+        yield text[: newline_offset + 1]
+        carry = text[newline_offset + 1 :]
+    if carry:
+        yield carry
+
+
+def _transform_maf_text(chunk_text: str, transform: MafBlockTransform, out_file: Path) -> MafRunStats:
+    """Apply a block transform to a chunk of MAF text, writing output blocks to the given file."""
+    with open(out_file, "w", encoding="utf-8") as out_file_obj:
+        return _transform_maf_blocks(io.StringIO(chunk_text), out_file_obj, transform)
+
+
+def _transform_maf_chunk(
+    maf_file: Union[Path, str], start: int, end: int, transform: MafBlockTransform, out_file: Path
+) -> MafRunStats:
+    """Apply a block transform to one chunk of a MAF file, writing output blocks to the given file."""
+    with open(maf_file, "rb") as in_file_obj:
+        in_file_obj.seek(start)
+        chunk_text = in_file_obj.read(end - start).decode("utf-8")
+    return _transform_maf_text(chunk_text, transform, out_file)
+
+
+def _copy_chunk_output(future: Future, chunk_out_file: Path, out_stream: TextIO) -> MafRunStats:
+    """Wait for a chunk to be transformed, and append its output blocks to the output stream."""
+    stats = future.result()
+    with open(chunk_out_file, encoding="utf-8") as chunk_file_obj:
+        shutil.copyfileobj(chunk_file_obj, out_stream)
+    chunk_out_file.unlink()
+    return stats
+
+
+def run_maf_transform(
+    input_maf: Union[Path, str],
+    output_maf: Union[Path, str],
+    transform: MafBlockTransform,
+    jobs: int = 1,
+    chunk_size: int = 64 * 2**20,
+) -> MafRunStats:
+    """Apply a block transform to each block of a MAF file, in parallel chunks if required.
+
+    The transform must be picklable if more than one job is used, e.g. a module-level
+    function or a ``functools.partial`` of one. Output blocks are written in input order.
+
+    A plain-text input file is split into chunks by offset, which each job reads for
+    itself. A compressed input file is decompressed as a stream, and its chunks are
+    passed to jobs as text, with at most two chunks per job in flight.
+
+    Args:
+        input_maf: Input MAF file, which may be gzip- or BGZF-compressed.
+        output_maf: Output MAF file, written in BGZF format if its name ends in '.gz' or '.bgz'.
+        transform: Function that takes a MAF block and returns zero or more output blocks,
+            possibly as :class:`MafBlockSlices`.
+        jobs: Number of chunks processed in parallel, and of threads compressing the output.
+        chunk_size: Approximate size of each input chunk in bytes.
+
+    Returns:
+        Block and sequence counts of the run.
+
+    Raises:
+        ValueError: If the number of jobs is not greater than 0.
+    """
+    if jobs < 1:
+        raise ValueError(f"number of jobs must be greater than 0: {jobs}")
+
+    with open_output(output_maf, "wt", threads=jobs) as out_file_obj:
+        MafWriter(out_file_obj).write_header()
+        if jobs == 1:
+            with open_input(input_maf) as in_file_obj:
+                return _transform_maf_blocks(in_file_obj, out_file_obj, transform)
+
+        stats = MafRunStats()
+        with open_input(input_maf) as in_file_obj, TemporaryDirectory(dir=Path(output_maf).parent) as tmp_dir:
+            chunk_tasks: Iterator[Callable[..., MafRunStats]]
+            if is_gzip_file(input_maf):
+                chunk_tasks = (
+                    partial(_transform_maf_text, chunk_text)
+                    for chunk_text in _iter_maf_text_chunks(in_file_obj, chunk_size)
+                )
+            else:
+                chunk_offsets = find_maf_chunk_offsets(input_maf, chunk_size)
+                chunk_bounds = zip(chunk_offsets, chunk_offsets[1:] + [os.path.getsize(input_maf)])
+                chunk_tasks = (
+                    partial(_transform_maf_chunk, input_maf, start, end) for start, end in chunk_bounds
+                )
+
+            pending: Deque[Tuple[Future, Path]] = deque()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for chunk_idx, chunk_task in enumerate(chunk_tasks):
+                    chunk_out_file = Path(tmp_dir) / f"chunk_{chunk_idx}.maf"
+                    pending.append((executor.submit(chunk_task, transform, chunk_out_file), chunk_out_file))
+                    if len(pending) > 2 * jobs:
+                        stats += _copy_chunk_output(*pending.popleft(), out_file_obj)
+                while pending:
+                    stats += _copy_chunk_output(*pending.popleft(), out_file_obj)
+
+    return stats
+
+
+class MafIndex:
+    """Index of the blocks of a MAF file by their reference sequence region.
+
+    The reference sequence of a block is its first sequence, and reference
+    regions are indexed on the plus strand. Block offsets are byte offsets in a
+    plain-text MAF file, and virtual offsets in a BGZF-compressed MAF file.
+
+    Args:
+        columns: Mapping of column name to block array. Blocks are grouped by
+            reference sequence and sorted by reference start within each group.
+        src_ranges: Mapping of each reference sequence name to the (begin, end)
+            range of its blocks in the block arrays.
+        block_count: Number of blocks in the MAF file, including any blocks without sequences.
+    """
+
+    def __init__(
+        self, columns: Mapping[str, np.ndarray], src_ranges: Mapping[str, Tuple[int, int]], block_count: int
+    ) -> None:
+        self.columns = columns
+        self.src_ranges = dict(src_ranges)
+        self.block_count = block_count
+
+    def __len__(self) -> int:
+        return len(self.columns["offset"])
+
+    def overlapping(self, src: str, start: int, end: int) -> np.ndarray:
+        """Get the indices of the blocks overlapping the given 0-based half-open reference region.
+
+        Args:
+            src: Reference sequence name.
+            start: Start of query region.
+            end: End of query region.
+
+        Returns:
+            Array of block indices, in reference start order.
+        """
+        if src not in self.src_ranges:
+            return np.empty(0, dtype=np.intp)
+        begin, stop = self.src_ranges[src]
+        ref_starts = self.columns["ref_start"][begin:stop]
+        ref_ends = self.columns["ref_end"][begin:stop]
+        ref_max_ends = self.columns["ref_max_end"][begin:stop]
+
+        # As for chain blocks, the running maximum of block ends is non-decreasing,
+        # so both bounds of the candidate range can be found by binary search.
+        hi = int(np.searchsorted(ref_starts, end, side="left"))
+        lo = int(np.searchsorted(ref_max_ends[:hi], start, side="right"))
+        return begin + lo + np.flatnonzero(ref_ends[lo:hi] > start)
+
+    def read_raw_blocks(self, maf_file: Union[Path, str], src: str, start: int, end: int) -> Iterator[bytes]:
+        """Read the text of the blocks overlapping the given 0-based half-open reference region.
+
+        Args:
+            maf_file: Input MAF file of this index.
+            src: Reference sequence name.
+            start: Start of query region.
+            end: End of query region.
+
+        Yields:
+            The bytes of each overlapping block, in reference start order.
+        """
+        offsets = self.columns["offset"]
+        lengths = self.columns["length"]
+        if is_bgzf_file(maf_file):
+            with BgzfReader(maf_file) as reader:
+                for block_idx in self.overlapping(src, start, end):
+                    yield reader.read(int(offsets[block_idx]), int(lengths[block_idx]))
+            return
+        with open(maf_file, "rb") as in_file_obj:
+            for block_idx in self.overlapping(src, start, end):
+                in_file_obj.seek(offsets[block_idx])
+                yield in_file_obj.read(lengths[block_idx])
+
+    def fetch(self, maf_file: Union[Path, str], src: str, start: int, end: int) -> Iterator[MafBlock]:
+        """Read the blocks overlapping the given 0-based half-open reference region.
+
+        Args:
+            maf_file: Input MAF file of this index.
+            src: Reference sequence name.
+            start: Start of query region.
+            end: End of query region.
+
+        Yields:
+            Overlapping MAF blocks, in reference start order.
+        """
+        for block_bytes in self.read_raw_blocks(maf_file, src, start, end):
+            yield from iter_maf_blocks(io.StringIO(block_bytes.decode("utf-8")))
+
+    @classmethod
+    def from_maf_file(cls, maf_file: Union[Path, str]) -> MafIndex:
+        """Build a MAF index by scanning a MAF file.
+
+        Only the 'a' line and the first 's' line of each block are parsed. The blocks
+        of a BGZF-compressed MAF file are indexed by their virtual offsets.
+
+        Args:
+            maf_file: Input MAF file, which may be BGZF-compressed.
+
+        Returns:
+            A MAF index.
+
+        Raises:
+            ValueError: If the MAF file is gzip-compressed, but not in BGZF format.
+        """
+        bgzf = is_bgzf_file(maf_file)
+        if not bgzf and is_gzip_file(maf_file):
+            raise ValueError(f"cannot index a gzip-compressed MAF file not in BGZF format: {maf_file}")
+
+        src_codes: Dict[str, int] = {}
+        block_rows: List[Tuple[int, int, int, int, int]] = []
+        block_count = 0
+
+        with open_input(maf_file, "rb") as in_file_obj:
+            offset = 0
+            block_offset = -1  # negative outside a block
+            ref_fields: Optional[Tuple[int, int, int]] = None
+            for line in in_file_obj:
+                if block_offset < 0:
+                    if line.startswith(b"a"):
+                        block_offset = offset
+                        ref_fields = None
+                        block_count += 1
+                elif line.startswith(b"s"):
+                    if ref_fields is None:
+                        ref_fields = _parse_ref_fields(line, src_codes)
+                elif not line.strip():
+                    if ref_fields is not None:
+                        block_rows.append((*ref_fields, block_offset, offset + len(line) - block_offset))
+                    block_offset = -1
+                offset += len(line)
+
+            if block_offset >= 0 and ref_fields is not None:
+                block_rows.append((*ref_fields, block_offset, offset - block_offset))
+
+        block_arr = np.array(block_rows, dtype=np.int64).reshape(-1, 5)
+        if bgzf:
+            block_arr[:, 3] = _get_bgzf_virtual_offsets(maf_file, block_arr[:, 3])
+        block_arr = block_arr[np.lexsort((block_arr[:, 1], block_arr[:, 0]))]
+
+        src_names = sorted(src_codes, key=src_codes.__getitem__)
+        bounds = np.searchsorted(block_arr[:, 0], np.arange(len(src_names) + 1), side="left")
+        src_ranges = {name: (int(bounds[i]), int(bounds[i + 1])) for i, name in enumerate(src_names)}
+
+        ref_max_end = np.empty(len(block_arr), dtype=np.int64)
+        for begin, end in src_ranges.values():
+            ref_max_end[begin:end] = np.maximum.accumulate(block_arr[begin:end, 2])
+
+        columns = {
+            "ref_start": block_arr[:, 1],
+            "ref_end": block_arr[:, 2],
+            "ref_max_end": ref_max_end,
+            "offset": block_arr[:, 3],
+            "length": block_arr[:, 4],
+        }
+        columns = {
+            name: np.ascontiguousarray(columns[name], dtype=dtype)
+            for name, dtype in _INDEX_COLUMN_DTYPES.items()
+        }
+
+        return cls(columns, src_ranges, block_count)
+
+    @classmethod
+    def load(cls, index_file: Union[Path, str]) -> Tuple[MafIndex, Dict]:
+        """Load a MAF index file, memory-mapping its block arrays.
+
+        Args:
+            index_file: Input MAF index file.
+
+        Returns:
+            A tuple of the MAF index and the metadata stored with it.
+
+        Raises:
+            ValueError: If the file is not a MAF index file of a supported version.
+        """
+        header, columns = read_binary_index(index_file, _INDEX_MAGIC, _INDEX_COLUMN_DTYPES, "MAF index")
+        if header["version"] != _INDEX_VERSION:
+            raise ValueError(f"unsupported MAF index version: {header['version']}")
+
+        src_ranges = {name: tuple(bounds) for name, bounds in header["src_ranges"].items()}
+        return (
+            cls(columns, src_ranges, header["block_count"]),  # type: ignore[arg-type]
+            header["metadata"],
+        )
+
+    def save(self, index_file: Union[Path, str], metadata: Optional[Dict] = None) -> None:
+        """Save this MAF index to a binary index file.
+
+        Args:
+            index_file: Output MAF index file.
+            metadata: Optional JSON-serialisable metadata to store with the index.
+        """
+        header = {
+            "version": _INDEX_VERSION,
+            "block_count": self.block_count,
+            "src_ranges": self.src_ranges,
+            "metadata": metadata if metadata is not None else {},
+        }
+        write_binary_index(index_file, _INDEX_MAGIC, header, self.columns)
+
+
+def _get_bgzf_virtual_offsets(bgzf_file: Union[Path, str], data_offsets: np.ndarray) -> np.ndarray:
+    """Convert offsets in the uncompressed data of a BGZF file to virtual offsets."""
+    block_offsets, block_data_offsets = get_bgzf_block_offsets(bgzf_file)
+    block_idxs = np.searchsorted(block_data_offsets, data_offsets, side="right") - 1
+    return (block_offsets[block_idxs] << 16) | (data_offsets - block_data_offsets[block_idxs])
+
+
+def _parse_ref_fields(line: bytes, src_codes: Dict[str, int]) -> Tuple[int, int, int]:
+    """Get the src code and plus-strand start and end of a MAF 's' line."""
+    fields = line.split(maxsplit=6)
+    if len(fields) != 7:
+        raise ValueError("Error parsing alignment - 's' line must have 7 fields")
+    src_code = src_codes.setdefault(fields[1].decode("utf-8"), len(src_codes))
+    start = int(fields[2])
+    end = start + int(fields[3])
+    if fields[4] == b"-":
+        src_size = int(fields[5])
+        start, end = src_size - end, src_size - start
+    return src_code, start, end
+
+
+def get_maf_index_path(maf_file: Union[Path, str]) -> Path:
+    """Get the path of the index file of the given MAF file."""
+    maf_path = Path(maf_file)
+    return maf_path.with_name(f"{maf_path.name}.idx")
+
+
+def _get_maf_file_metadata(maf_file: Union[Path, str]) -> Dict[str, int]:
+    """Get the metadata used to check that a MAF index file is up to date."""
+    maf_stat = os.stat(maf_file)
+    return {"maf_file_size": maf_stat.st_size, "maf_file_mtime_ns": maf_stat.st_mtime_ns}
+
+
+def _load_current_maf_index(maf_file: Union[Path, str]) -> Optional[MafIndex]:
+    """Load the index file of a MAF file, if there is an up-to-date index file."""
+    try:
+        maf_index, index_metadata = MafIndex.load(get_maf_index_path(maf_file))
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if index_metadata != _get_maf_file_metadata(maf_file):
+        return None
+    return maf_index
+
+
+def build_maf_index(maf_file: Union[Path, str]) -> MafIndex:
+    """Build the index of a MAF file, and save it next to the MAF file.
+
+    Args:
+        maf_file: Input MAF file.
+
+    Returns:
+        A MAF index.
+    """
+    maf_metadata = _get_maf_file_metadata(maf_file)
+    maf_index = MafIndex.from_maf_file(maf_file)
+    maf_index.save(get_maf_index_path(maf_file), metadata=maf_metadata)
+    return maf_index
+
+
+def load_maf_index(maf_file: Union[Path, str], build: bool = True) -> MafIndex:
+    """Load the index of a MAF file, building it if necessary.
+
+    If an up-to-date index file exists next to the MAF file, its block arrays
+    are memory-mapped. Otherwise the MAF file is scanned and, if ``build`` is
+    true, the resulting index is saved next to the MAF file for later runs.
+
+    Args:
+        maf_file: Input MAF file.
+        build: Save a new index file if there is no up-to-date index file.
+
+    Returns:
+        A MAF index.
+    """
+    maf_index = _load_current_maf_index(maf_file)
+    if maf_index is not None:
+        return maf_index
+
+    maf_metadata = _get_maf_file_metadata(maf_file)
+    maf_index = MafIndex.from_maf_file(maf_file)
+    if build:
+        try:
+            maf_index.save(get_maf_index_path(maf_file), metadata=maf_metadata)
+        except OSError:
+            pass  # e.g. a read-only directory; the in-memory index is still usable
+    return maf_index
+
+
+def read_maf_block_count(maf_file: Union[Path, str]) -> Optional[int]:
+    """Get the number of blocks in a MAF file from its index file, without scanning the MAF file.
+
+    Args:
+        maf_file: Input MAF file.
+
+    Returns:
+        The number of blocks in the MAF file, or None if there is no up-to-date index file.
+    """
+    maf_index = _load_current_maf_index(maf_file)
+    return maf_index.block_count if maf_index is not None else None
@@ -0,0 +1,265 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for working with PSL alignment records.
+
+PSL records are read into a :class:`PslRecords` array, which holds each PSL column
+in a NumPy array, so that records can be transformed in bulk as by the UCSC Kent
+utilities ``pslPosTarget`` and ``pslSwap``.
+
+Typical usage example::
+
+    >>> import sys
+    >>> from ensembl.compara.utils.psl import read_psl
+    >>> with open("liftover.psl") as in_file_obj:
+    ...     psl_records = read_psl(in_file_obj)
+    >>> psl_records.pos_target().swap().write(sys.stdout)
+
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "PslRecords",
+    "PslSide",
+    "read_psl",
+]
+
+from dataclasses import dataclass, replace
+import re
+from typing import List, Sequence, TextIO, Tuple
+
+import numpy as np
+
+_PSL_COLUMN_COUNT = 21
+_PSL_STRANDS = {"+", "-", "++", "+-", "-+", "--"}
+
+_COMMA_RUN_REGEX = re.compile(r",+")
+
+
+@dataclass(slots=True)
+class PslSide:
+    """The query or target columns of an array of PSL records.
+
+    Attributes:
+        strands: Strand of each record; either '+' or '-', or '' for a target strand that is not given.
+        names: Sequence name of each record.
+        sizes: Sequence size of each record.
+        starts: Alignment start in the sequence of each record.
+        ends: Alignment end in the sequence of each record.
+        inserts: Matrix of the number of inserts and the number of inserted bases in
+            the sequence, with one row per record.
+        block_starts: Start of each block on the strand of its record.
+    """
+
+    strands: np.ndarray
+    names: np.ndarray
+    sizes: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    inserts: np.ndarray
+    block_starts: np.ndarray
+
+
+@dataclass(slots=True)
+class PslRecords:
+    """A columnar array of PSL alignment records.
+
+    The scalar columns of the records are held in parallel arrays. The block columns
+    of all records are concatenated into flat block arrays, so that the blocks of
+    record ``i`` are at ``block_offsets[i]:block_offsets[i + 1]`` in each block array.
+
+    Attributes:
+        match_counts: Matrix of the matches, misMatches, repMatches and nCount columns,
+            with one row per record.
+        query: Query columns of the records.
+        target: Target columns of the records.
+        block_offsets: Offset of the first block of each record, followed by the total block count.
+        block_sizes: Size of each block.
+    """
+
+    match_counts: np.ndarray
+    query: PslSide
+    target: PslSide
+    block_offsets: np.ndarray
+    block_sizes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.match_counts)
+
+    def _reverse_complement_blocks(
+        self, record_mask: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Reverse-complement the blocks of the masked records, as in the Kent function ``pslRc``.
+
+        Returns:
+            A tuple of the new block sizes, query block starts and target block starts.
+        """
+        block_record_idxs = np.repeat(np.arange(len(self)), np.diff(self.block_offsets))
+        block_mask = record_mask[block_record_idxs]
+        record_idxs = block_record_idxs[block_mask]
+        masked_block_sizes = self.block_sizes[block_mask]
+
+        block_starts = []
+        for side in (self.query, self.target):
+            side_block_starts = side.block_starts.copy()
+            side_block_starts[block_mask] = side.sizes[record_idxs] - (
+                side.block_starts[block_mask] + masked_block_sizes
+            )
+            block_starts.append(side_block_starts)
+
+        # Blocks of reverse-complemented records are reversed within each record.
+        order = np.arange(len(self.block_sizes))
+        order[block_mask] = (
+            self.block_offsets[record_idxs] + self.block_offsets[record_idxs + 1] - 1 - order[block_mask]
+        )
+        return self.block_sizes[order], block_starts[0][order], block_starts[1][order]
+
+    def pos_target(self) -> PslRecords:
+        """Make the target strand of each record positive, as by the Kent utility ``pslPosTarget``.
+
+        Records with an explicit negative target strand are reverse-complemented,
+        and all other records are unchanged.
+
+        Returns:
+            A new array of PSL records.
+        """
+        rc_mask = self.target.strands == "-"
+        block_sizes, q_block_starts, t_block_starts = self._reverse_complement_blocks(rc_mask)
+        q_strands = np.where(rc_mask, np.where(self.query.strands == "-", "+", "-"), self.query.strands)
+        return replace(
+            self,
+            query=replace(self.query, strands=q_strands, block_starts=q_block_starts),
+            target=replace(
+                self.target, strands=np.where(rc_mask, "+", self.target.strands), block_starts=t_block_starts
+            ),
+            block_sizes=block_sizes,
+        )
+
+    def swap(self) -> PslRecords:
+        """Swap the query and target of each record, as by the Kent utility ``pslSwap``.
+
+        The strands of a record with an explicit target strand are swapped. Otherwise,
+        a record on the negative query strand is reverse-complemented, so that the new
+        target remains implicitly on the positive strand.
+
+        Returns:
+            A new array of PSL records.
+        """
+        two_strand_mask = self.target.strands != ""
+        rc_mask = ~two_strand_mask & (self.query.strands == "-")
+        block_sizes, q_block_starts, t_block_starts = self._reverse_complement_blocks(rc_mask)
+        q_strands = np.where(two_strand_mask, self.target.strands, self.query.strands)
+        t_strands = np.where(two_strand_mask, self.query.strands, self.target.strands)
+        return replace(
+            self,
+            query=replace(self.target, strands=q_strands, block_starts=t_block_starts),
+            target=replace(self.query, strands=t_strands, block_starts=q_block_starts),
+            block_sizes=block_sizes,
+        )
+
+    def write(self, stream: TextIO) -> None:
+        """Write these records to a text stream in PSL format, as by the Kent function ``pslTabOut``.
+
+        Args:
+            stream: Output text stream.
+        """
+        scalar_columns = [
+            *self.match_counts.T,
+            *self.query.inserts.T,
+            *self.target.inserts.T,
+            np.char.add(self.query.strands.astype(str), self.target.strands.astype(str)),
+            *(getattr(self.query, x) for x in ("names", "sizes", "starts", "ends")),
+            *(getattr(self.target, x) for x in ("names", "sizes", "starts", "ends")),
+            np.diff(self.block_offsets),
+        ]
+        block_value_lists = [
+            np.char.add(x.astype(str), ",").tolist()
+            for x in (self.block_sizes, self.query.block_starts, self.target.block_starts)
+        ]
+        offsets = self.block_offsets.tolist()
+        for record_idx, scalar_values in enumerate(zip(*(x.tolist() for x in scalar_columns))):
+            begin, end = offsets[record_idx], offsets[record_idx + 1]
+            block_fields = ["".join(x[begin:end]) for x in block_value_lists]
+            stream.write("\t".join([*map(str, scalar_values), *block_fields]) + "\n")
+
+
+def _parse_block_column(values: Sequence[str]) -> np.ndarray:
+    """Parse the comma-separated values of a PSL block column into one flat array."""
+    text = ",".join(values).strip(",")
+    if not text:
+        return np.empty(0, dtype=np.int64)
+    return np.array(_COMMA_RUN_REGEX.split(text), dtype=np.int64)
+
+
+def read_psl(stream: TextIO) -> PslRecords:
+    """Read PSL records from a text stream.
+
+    Any header lines, such as those of the 'psLayout' format, are skipped.
+
+    Args:
+        stream: Input text stream of PSL records.
+
+    Returns:
+        An array of PSL records.
+
+    Raises:
+        ValueError: If a record does not have 21 columns, has an invalid strand,
+            or if the block columns of the records do not match their block counts.
+    """
+    rows: List[List[str]] = []
+    for line in stream:
+        if not line[:1].isdigit():
+            continue
+        fields = line.rstrip("\r\n").split("\t")
+        if len(fields) != _PSL_COLUMN_COUNT:
+            raise ValueError(f"PSL record must have {_PSL_COLUMN_COUNT} columns: {line.rstrip()}")
+        rows.append(fields)
+    columns = list(zip(*rows)) if rows else [()] * _PSL_COLUMN_COUNT
+
+    def int_column(col_idx: int) -> np.ndarray:
+        return np.array(columns[col_idx], dtype=np.int64)
+
+    if invalid_strands := set(columns[8]) - _PSL_STRANDS:
+        raise ValueError(f"invalid PSL strand: '{sorted(invalid_strands)[0]}'")
+
+    block_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(int_column(17), out=block_offsets[1:])
+    block_columns = [_parse_block_column(columns[col_idx]) for col_idx in (18, 19, 20)]
+    if any(len(x) != block_offsets[-1] for x in block_columns):
+        raise ValueError("PSL block columns do not match block counts")
+
+    return PslRecords(
+        match_counts=np.stack([int_column(i) for i in range(4)], axis=1),
+        query=PslSide(
+            strands=np.array([x[:1] for x in columns[8]], dtype="U1"),
+            names=np.array(columns[9], dtype=str),
+            sizes=int_column(10),
+            starts=int_column(11),
+            ends=int_column(12),
+            inserts=np.stack([int_column(4), int_column(5)], axis=1),
+            block_starts=block_columns[1],
+        ),
+        target=PslSide(
+            strands=np.array([x[1:] for x in columns[8]], dtype="U1"),
+            names=np.array(columns[13], dtype=str),
+            sizes=int_column(14),
+            starts=int_column(15),
+            ends=int_column(16),
+            inserts=np.stack([int_column(6), int_column(7)], axis=1),
+            block_starts=block_columns[2],
+        ),
+        block_offsets=block_offsets,
+        block_sizes=block_columns[0],
+    )
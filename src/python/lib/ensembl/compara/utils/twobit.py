@@ -0,0 +1,240 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for reading UCSC 2bit sequence files.
+
+Sequences are decoded in-process from a memory-mapped 2bit file, following the
+output conventions of ``twoBitToFa``: bases are upper case, soft-masked bases
+are lower case and bases in N blocks are output as ``N`` (or ``n`` if masked).
+
+Typical usage example::
+
+    >>> from ensembl.compara.utils.twobit import TwoBitFile
+    >>> with TwoBitFile("genomeA.2bit") as two_bit:
+    ...     two_bit.fetch("chr1", 15, 18)
+    'TAA'
+
+"""
+
+from __future__ import annotations
+
+__all__ = ["TwoBitFile", "load_two_bit_file"]
+
+from dataclasses import dataclass
+from functools import lru_cache
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+_TWO_BIT_SIGNATURE = 0x1A412743
+
+# Each byte packs four bases, most significant bits first: T=0, C=1, A=2, G=3.
+_BYTE_TO_BASES = np.array(
+    [[ord("TCAG"[(byte >> shift) & 3]) for shift in (6, 4, 2, 0)] for byte in range(256)],
+    dtype=np.uint8,
+)
+
+_REVERSE_COMPLEMENT_TABLE = bytes.maketrans(b"ACGTNacgtn", b"TGCANtgcan")
+
+
+@dataclass(frozen=True)
+class _SequenceRecord:
+    """Header of one sequence in a 2bit file."""
+
+    size: int
+    n_starts: np.ndarray
+    n_ends: np.ndarray
+    mask_starts: np.ndarray
+    mask_ends: np.ndarray
+    packed_offset: int
+
+
+class TwoBitFile:
+    """A memory-mapped UCSC 2bit file.
+
+    The sequence index is read when the file is opened; the N-block and mask-block
+    tables of each sequence are read on first access and cached.
+
+    Args:
+        two_bit_file: Input 2bit file.
+
+    Raises:
+        ValueError: If the input file is not a valid 2bit file.
+    """
+
+    def __init__(self, two_bit_file: Union[Path, str]) -> None:
+        self.path = Path(two_bit_file)
+        with open(self.path, "rb") as in_file_obj:
+            try:
+                self._data = mmap.mmap(in_file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise ValueError(f"empty 2bit file: {self.path}") from exc
+
+        signature = struct.unpack_from("<I", self._data, 0)[0]
+        if signature == _TWO_BIT_SIGNATURE:
+            self._byte_order = "<"
+        elif signature == struct.unpack("<I", struct.pack(">I", _TWO_BIT_SIGNATURE))[0]:
+            self._byte_order = ">"
+        else:
+            raise ValueError(f"invalid 2bit file signature: {self.path}")
+
+        version, seq_count, _reserved = self._unpack("III", 4)
+        if version not in (0, 1):
+            raise ValueError(f"unsupported 2bit file version ({version}): {self.path}")
+        offset_format = "Q" if version == 1 else "I"
+        offset_size = struct.calcsize(offset_format)
+
+        self._offsets: Dict[str, int] = {}
+        pos = 16
+        for _ in range(seq_count):
+            name_size = self._data[pos]
+            name = self._data[pos + 1 : pos + 1 + name_size].decode("ascii")
+            pos += 1 + name_size
+            (self._offsets[name],) = self._unpack(offset_format, pos)
+            pos += offset_size
+
+        self._records: Dict[str, _SequenceRecord] = {}
+
+    def __enter__(self) -> TwoBitFile:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def close(self) -> None:
+        """Close the memory map of this 2bit file."""
+        self._data.close()
+
+    def sequence_size(self, name: str) -> int:
+        """Get the length of the named sequence."""
+        return self._get_record(name).size
+
+    def fetch(self, name: str, start: int = 0, end: Optional[int] = None, strand: str = "+") -> str:
+        """Get a subsequence of the named sequence.
+
+        Args:
+            name: Sequence name.
+            start: 0-based start of subsequence.
+            end: End of subsequence. By default, the end of the sequence.
+            strand: Strand of subsequence; the reverse complement is returned if this is '-'.
+
+        Returns:
+            The subsequence, with soft-masked bases in lower case.
+
+        Raises:
+            ValueError: If the sequence is not in the 2bit file, or if the
+                subsequence coordinates are out of range.
+        """
+        record = self._get_record(name)
+        if end is None:
+            end = record.size
+        if not 0 <= start <= end <= record.size:
+            raise ValueError(
+                f"region {name}:{start}-{end} is out of range of sequence '{name}' (length {record.size})"
+            )
+        if strand not in ("+", "-"):
+            raise ValueError(f"invalid strand: '{strand}'")
+
+        first_byte = record.packed_offset + start // 4
+        last_byte = record.packed_offset + (end + 3) // 4
+        packed = np.frombuffer(self._data, dtype=np.uint8, count=last_byte - first_byte, offset=first_byte)
+        offset = start % 4
+        bases = _BYTE_TO_BASES[packed].ravel()[offset : offset + end - start]
+
+        n_blocks = self._overlapping_blocks(record.n_starts, record.n_ends, start, end)
+        for block_start, block_end in n_blocks:
+            bases[block_start:block_end] = ord("N")
+        mask_blocks = self._overlapping_blocks(record.mask_starts, record.mask_ends, start, end)
+        for block_start, block_end in mask_blocks:
+            bases[block_start:block_end] |= 0x20  # ASCII lower case
+
+        seq = bases.tobytes()
+        if strand == "-":
+            seq = seq[::-1].translate(_REVERSE_COMPLEMENT_TABLE)
+        return seq.decode("ascii")
+
+    def _get_record(self, name: str) -> _SequenceRecord:
+        """Get the header of the named sequence, reading it on first access."""
+        if name not in self._records:
+            try:
+                pos = self._offsets[name]
+            except KeyError as exc:
+                raise ValueError(f"sequence '{name}' not found in 2bit file: {self.path}") from exc
+
+            size, n_block_count = self._unpack("II", pos)
+            n_starts, n_sizes = self._unpack_blocks(pos + 8, n_block_count)
+            pos += 8 + 8 * n_block_count
+            (mask_block_count,) = self._unpack("I", pos)
+            mask_starts, mask_sizes = self._unpack_blocks(pos + 4, mask_block_count)
+            pos += 4 + 8 * mask_block_count + 4  # skip reserved field
+
+            self._records[name] = _SequenceRecord(
+                size, n_starts, n_starts + n_sizes, mask_starts, mask_starts + mask_sizes, pos
+            )
+        return self._records[name]
+
+    def _unpack(self, fmt: str, offset: int) -> Tuple:
+        """Unpack values from the 2bit file in its byte order."""
+        return struct.unpack_from(self._byte_order + fmt, self._data, offset)
+
+    def _unpack_blocks(self, offset: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Unpack the start and size arrays of a block table."""
+        dtype = np.dtype(f"{self._byte_order}u4")
+        blocks = np.frombuffer(self._data, dtype=dtype, count=2 * count, offset=offset).astype(np.int64)
+        return blocks[:count], blocks[count:]
+
+    @staticmethod
+    def _overlapping_blocks(
+        starts: np.ndarray, ends: np.ndarray, start: int, end: int
+    ) -> Iterator[Tuple[int, int]]:
+        """Yield sorted blocks overlapping a region, clipped and relative to the region start."""
+        lo = int(np.searchsorted(ends, start, side="right"))
+        hi = int(np.searchsorted(starts, end, side="left"))
+        for block_start, block_end in zip(starts[lo:hi], ends[lo:hi]):
+            yield max(int(block_start), start) - start, min(int(block_end), end) - start
+
+
+def load_two_bit_file(two_bit_file: Union[Path, str]) -> TwoBitFile:
+    """Open a 2bit file, reusing a previously opened instance if the file is unchanged.
+
+    Args:
+        two_bit_file: Input 2bit file.
+
+    Returns:
+        A 2bit file object, which should not be closed by the caller.
+    """
+    file_path = Path(two_bit_file).resolve()
+    file_stat = os.stat(file_path)
+    return _load_cached_two_bit_file(file_path, file_stat.st_size, file_stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_cached_two_bit_file(
+    file_path: Path, file_size: int, file_mtime_ns: int  # pylint: disable=unused-argument
+) -> TwoBitFile:
+    """Open a 2bit file; file size and mtime are part of the cache key."""
+    return TwoBitFile(file_path)
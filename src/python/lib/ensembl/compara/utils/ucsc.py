@@ -12,27 +12,196 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Utilities for working with UCSC data."""
+"""Utilities for working with UCSC data.
 
-__all__ = ["load_chrom_sizes_file"]
+Chrom sizes are loaded into a :class:`ChromSizes` mapping, which holds sequence
+names and lengths in NumPy arrays. The arrays are saved to a binary index file
+next to the chrom sizes file, so that later loads can memory-map them instead of
+parsing the text file again.
 
+Typical usage example::
+
+    >>> from ensembl.compara.utils.ucsc import load_chrom_sizes_file
+    >>> chrom_sizes = load_chrom_sizes_file("genomeA.chrom.sizes")
+    >>> chrom_sizes["chr1"]
+    33
+
+"""
+
+from __future__ import annotations
+
+__all__ = ["ChromSizes", "get_chrom_sizes_index_path", "load_chrom_sizes_file"]
+
+from collections.abc import Mapping
+import os
 from pathlib import Path
-from typing import Dict, Union
+import struct
+from typing import Dict, Iterator, Tuple, Union
+
+import numpy as np
+
+from .binary_index import read_binary_index, write_binary_index
+
+_INDEX_MAGIC = b"CHRSZIX1"
+_INDEX_VERSION = 1
+_COLUMN_DTYPES: Dict[str, np.dtype] = {
+    "names": np.dtype("u1"),
+    "lengths": np.dtype("<i8"),
+    "file_order": np.dtype("<i8"),
+}
+
+
+class ChromSizes(Mapping[str, int]):
+    """Read-only mapping of genome sequence names to their lengths.
+
+    Sequence names are held in a sorted array of fixed-width UTF-8 byte strings,
+    alongside an array of sequence lengths, so that names are looked up by binary
+    search. Iteration follows the order of sequences in their chrom sizes file.
+
+    Attributes:
+        names: Sorted array of UTF-8 encoded sequence names.
+        lengths: Length of each sequence in ``names``.
+        file_order: Index in ``names`` of each sequence, in chrom sizes file order.
+    """
+
+    def __init__(self, names: np.ndarray, lengths: np.ndarray, file_order: np.ndarray) -> None:
+        self.names = names
+        self.lengths = lengths
+        self.file_order = file_order
+
+    def __getitem__(self, name: str) -> int:
+        if not isinstance(name, str):
+            raise KeyError(name)
+        name_bytes = name.encode("utf-8")
+        idx = int(np.searchsorted(self.names, name_bytes))
+        if idx == len(self.names) or self.names[idx] != name_bytes:
+            raise KeyError(name)
+        return int(self.lengths[idx])
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.names[self.file_order].tolist():
+            yield name.decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} sequences)"
 
+    @classmethod
+    def from_dict(cls, chrom_sizes: Dict[str, int]) -> ChromSizes:
+        """Create a chrom sizes mapping from a dictionary.
 
-def load_chrom_sizes_file(chrom_sizes_file: Union[Path, str]) -> Dict[str, int]:
+        Args:
+            chrom_sizes: Dictionary mapping genome sequence names to their lengths.
+
+        Returns:
+            A chrom sizes mapping, which iterates in the order of the dictionary.
+        """
+        name_bytes = [x.encode("utf-8") for x in chrom_sizes]
+        width = max((len(x) for x in name_bytes), default=1)
+        file_order_names = np.array(name_bytes, dtype=f"S{width}")
+        order = np.argsort(file_order_names, kind="stable")
+        file_order = np.empty_like(order)
+        file_order[order] = np.arange(len(order))
+        lengths = np.fromiter(chrom_sizes.values(), dtype=np.int64, count=len(chrom_sizes))
+        return cls(file_order_names[order], lengths[order], file_order.astype(np.int64))
+
+    @classmethod
+    def from_chrom_sizes_file(cls, chrom_sizes_file: Union[Path, str]) -> ChromSizes:
+        """Parse a UCSC chrom sizes file.
+
+        Args:
+            chrom_sizes_file: Input chrom sizes file.
+
+        Returns:
+            A chrom sizes mapping.
+
+        Raises:
+            ValueError: If a line of the chrom sizes file does not have exactly two columns.
+        """
+        chrom_sizes = {}
+        with open(chrom_sizes_file) as in_file_obj:
+            for line in in_file_obj:
+                chrom_name, chrom_size = line.rstrip("\n").split("\t")
+                chrom_sizes[chrom_name] = int(chrom_size)
+        return cls.from_dict(chrom_sizes)
+
+    @classmethod
+    def load(cls, index_file: Union[Path, str]) -> Tuple[ChromSizes, Dict]:
+        """Load a chrom sizes index file, memory-mapping its arrays.
+
+        Args:
+            index_file: Input chrom sizes index file.
+
+        Returns:
+            A tuple of the chrom sizes mapping and the metadata stored with it.
+
+        Raises:
+            ValueError: If the file is not a chrom sizes index file of a supported version.
+        """
+        header, columns = read_binary_index(index_file, _INDEX_MAGIC, _COLUMN_DTYPES, "chrom sizes index")
+        if header["version"] != _INDEX_VERSION:
+            raise ValueError(f"unsupported chrom sizes index version: {header['version']}")
+        names = columns["names"].view(f"S{header['name_width']}")
+        return cls(names, columns["lengths"], columns["file_order"]), header["metadata"]
+
+    def save(self, index_file: Union[Path, str], metadata: Dict) -> None:
+        """Save this chrom sizes mapping to a binary index file.
+
+        Args:
+            index_file: Output chrom sizes index file.
+            metadata: JSON-serialisable metadata to store with the index.
+        """
+        header = {"version": _INDEX_VERSION, "name_width": self.names.dtype.itemsize, "metadata": metadata}
+        columns = {"names": self.names.view(np.uint8), "lengths": self.lengths, "file_order": self.file_order}
+        write_binary_index(index_file, _INDEX_MAGIC, header, columns)
+
+
+def get_chrom_sizes_index_path(chrom_sizes_file: Union[Path, str]) -> Path:
+    """Get the path of the index file of the given chrom sizes file."""
+    chrom_sizes_path = Path(chrom_sizes_file)
+    return chrom_sizes_path.with_name(f"{chrom_sizes_path.name}.idx")
+
+
+def load_chrom_sizes_file(chrom_sizes_file: Union[Path, str], build: bool = True) -> ChromSizes:
     """Load genome sequence sizes from a UCSC chrom sizes file.
 
+    If an up-to-date index file exists next to the chrom sizes file, its arrays are
+    memory-mapped. Otherwise the chrom sizes file is parsed and, if ``build`` is true,
+    the resulting arrays are saved next to the chrom sizes file for later runs. An
+    index file is up to date if the size and modification time of the chrom sizes
+    file are those recorded in the index file.
+
     Args:
         chrom_sizes_file: Input chrom sizes file.
+        build: Save a new index file if there is no up-to-date index file.
 
     Returns:
-        Dictionary mapping genome sequence names to their lengths.
+        Read-only mapping of genome sequence names to their lengths.
+
+    Raises:
+        ValueError: If a line of the chrom sizes file does not have exactly two columns.
     """
-    chrom_sizes = {}
-    with open(chrom_sizes_file) as in_file_obj:
-        for line in in_file_obj:
-            chrom_name, chrom_size = line.rstrip("\n").split("\t")
-            chrom_sizes[chrom_name] = int(chrom_size)
+    file_stat = os.stat(chrom_sizes_file)
+    file_metadata = {
+        "chrom_sizes_file_size": file_stat.st_size,
+        "chrom_sizes_file_mtime_ns": file_stat.st_mtime_ns,
+    }
+
+    index_path = get_chrom_sizes_index_path(chrom_sizes_file)
+    try:
+        chrom_sizes, index_metadata = ChromSizes.load(index_path)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        pass
+    else:
+        if index_metadata == file_metadata:
+            return chrom_sizes
 
+    chrom_sizes = ChromSizes.from_chrom_sizes_file(chrom_sizes_file)
+    if build:
+        try:
+            chrom_sizes.save(index_path, file_metadata)
+        except OSError:
+            pass  # e.g. a read-only HAL cache; the in-memory mapping is still usable
     return chrom_sizes
@@ -0,0 +1,81 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of :mod:`cmd.chunk_task_sheet` module."""
+
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from ensembl.compara.cmd.chunk_task_sheet import main
+
+
+class TestChunkTaskSheet:
+    """Tests ``chunk-task-sheet`` console script."""
+
+    def test_coverage(self, tmp_path: Path) -> None:
+        """Tests ``chunk-task-sheet coverage`` command."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        chrom_sizes_file.write_text("chr1\t33\nscaf1\t4\n")
+        result = CliRunner().invoke(main, ["coverage", str(chrom_sizes_file), "--num-bins", "2"])
+        assert result.exit_code == 0
+        assert result.output == (
+            "task_bin\tref_sequence\tstart\tlength\n"
+            "bin1\tchr1\t0\t16\n"
+            "bin1\tscaf1\t0\t4\n"
+            "bin2\tchr1\t16\t17\n"
+        )
+
+    def test_liftover(self, tmp_path: Path) -> None:
+        """Tests ``chunk-task-sheet liftover`` command."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        chrom_sizes_file.write_text("chr1\t33\nscaf1\t4\n")
+        output_file = tmp_path / "locations.tsv"
+        cmd_args = [
+            "liftover",
+            str(chrom_sizes_file),
+            "--source-genome",
+            "genomeA",
+            "--dest-genome",
+            "genomeB",
+            "--dest-genome",
+            "genomeC",
+            "--num-bins",
+            "3",
+            "--max-chunk-length",
+            "20",
+            "--output-file",
+            str(output_file),
+        ]
+        result = CliRunner().invoke(main, cmd_args)
+        assert result.exit_code == 0
+        exp_rows = [
+            "genomeA\tchr1\t1\t16\t1\t{}\tbin1",
+            "genomeA\tchr1\t17\t33\t1\t{}\tbin2",
+            "genomeA\tscaf1\t1\t4\t1\t{}\tbin3",
+        ]
+        assert output_file.read_text() == (
+            "source_genome\tsource_sequence\tsource_start\tsource_end\tsource_strand\tdest_genome\ttask_bin\n"
+            + "".join(
+                f"{row.format(dest_genome)}\n" for dest_genome in ["genomeB", "genomeC"] for row in exp_rows
+            )
+        )
+
+    def test_bad_num_bins(self, tmp_path: Path) -> None:
+        """Tests that ``chunk-task-sheet`` rejects a non-positive number of bins."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        chrom_sizes_file.write_text("chr1\t33\n")
+        result = CliRunner().invoke(main, ["coverage", str(chrom_sizes_file), "--num-bins", "0"])
+        assert result.exit_code != 0
+        assert "--num-bins" in result.output
@@ -23,8 +23,13 @@ Typical usage example::
 
 """
 
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import ExitStack as does_not_raise
-from typing import ContextManager, Dict
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, ContextManager, Dict, List
 
 import pytest
 from pytest import raises
@@ -32,6 +37,7 @@ from _pytest.fixtures import FixtureRequest
 
 from ensembl.compara.citest import CITestDBItem, CITestDBContentError, CITestDBGroupingError, \
     CITestDBNumRowsError, CITestFilesItem, CITestFilesContentError, CITestFilesSizeError, CITestFilesTreeError
+from ensembl.compara.citest.pytest_citest import DBPrefetcher, pytest_sessionfinish
 from ensembl.compara.filesys import DirCmp
 
 
@@ -121,6 +127,159 @@ class TestCITestDBItem:
         with expectation:
             self.db_item.test_content(**kwargs)
 
+    @pytest.mark.parametrize(
+        "name, args, expectation",
+        [
+            ('num_rows', {'group_by': 'grp'}, raises(CITestDBNumRowsError)),
+            ('num_rows', {'variation': 0.5, 'group_by': 'grp'}, does_not_raise()),
+            ('content', {'columns': 'value'}, does_not_raise()),
+            ('content', {'filter_by': 'grp = "grp2"'}, raises(CITestDBNumRowsError)),
+            ('content', {'columns': 'value', 'ignore_columns': 'grp'}, raises(TypeError)),
+        ],
+    )
+    def test_prefetch(self, request: FixtureRequest, multi_dbs: Dict, name: str, args: Dict,
+                      expectation: ContextManager) -> None:
+        """Tests :meth:`CITestDBItem.prefetch()` method.
+
+        Args:
+            request: Access to the requesting test context.
+            multi_dbs: Dictionary of unit test databases (fixture).
+            name: Name of the test to run.
+            args: Arguments to pass to the test call.
+            expectation: Context manager for the expected exception, i.e. the test will only pass if that
+                exception is raised. Use :class:`~contextlib.ExitStack` if no exception is expected.
+
+        """
+        with CountingExecutor(max_workers=2) as executor:
+            db_item = CITestDBItem(name, request.session, multi_dbs['reference'].dbc, multi_dbs['target'].dbc,
+                                   'main_table', args, executor)
+            db_item.prefetch()
+            # Both databases are queried once, either while prefetching or, if the query could not be
+            # composed, when the test is run
+            with expectation:
+                db_item.runtest()
+            assert executor.num_submitted == (0 if name == 'content' and 'ignore_columns' in args else 2)
+
+    def test_prefetch_mismatch(self, request: FixtureRequest, multi_dbs: Dict) -> None:
+        """Tests that prefetched data is discarded if the query of the test has changed."""
+        with CountingExecutor(max_workers=2) as executor:
+            db_item = CITestDBItem('num_rows', request.session, multi_dbs['reference'].dbc,
+                                   multi_dbs['target'].dbc, 'main_table', {'group_by': 'grp'}, executor)
+            db_item.prefetch()
+            db_item.args = {'variation': 0.5, 'group_by': 'grp', 'filter_by': 'value < 24'}
+            db_item.runtest()
+            assert executor.num_submitted == 4
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Thread pool executor counting the calls submitted to it.
+
+    Attributes:
+        num_submitted (int): Number of calls submitted.
+
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.num_submitted = 0
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        self.num_submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+class MockDBItem:
+    """Database test recording the order in which its data is prefetched.
+
+    Args:
+        index: Index of the test.
+        prefetched: List to which the index of the test is appended when prefetching its data.
+
+    """
+    def __init__(self, index: int, prefetched: List[int]) -> None:
+        self.index = index
+        self._prefetched = prefetched
+
+    def prefetch(self) -> None:
+        """Records the prefetch of this test."""
+        self._prefetched.append(self.index)
+
+
+class TestDBPrefetcher:
+    """Tests CITest's :class:`DBPrefetcher` class."""
+
+    def test_advance(self) -> None:
+        """Tests :meth:`DBPrefetcher.advance()` method."""
+        prefetched = []  # type: List[int]
+        items = [MockDBItem(i, prefetched) for i in range(6)]
+        prefetcher = DBPrefetcher(items, 2)  # type: ignore[arg-type]
+        prefetcher.advance(items[0])
+        assert prefetched == [0, 1, 2]
+        prefetcher.advance(items[1])
+        assert prefetched == [0, 1, 2, 3]
+        # Items skipped by the test loop do not prefetch any earlier item again
+        prefetcher.advance(items[4])
+        assert prefetched == [0, 1, 2, 3, 4, 5]
+        prefetcher.advance(items[5])
+        assert prefetched == [0, 1, 2, 3, 4, 5]
+
+
+class MockReportItem:
+    """Test item holding the additional information of its failure.
+
+    Attributes:
+        error_info (OrderedDict): Additional information provided when a test fails.
+
+    """
+    def __init__(self) -> None:
+        self.error_info = OrderedDict()  # type: OrderedDict
+
+
+class TestSessionFinish:
+    """Tests CITest's :func:`pytest_sessionfinish` report."""
+
+    def test_duplicate_entries(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Tests that the reports of duplicated tests are attributed to their own entry."""
+        monkeypatch.chdir(tmp_path)
+        test = {'test': 'num_rows', 'args': {'group_by': 'grp'}}
+        config = {
+            'reference_db': 'mysql://server/ref', 'target_db': 'mysql://server/target',
+            'database_tests': {'main_table': [dict(test), dict(test)]},
+            'files_tests': [{'test': 'size', 'args': {}}],
+        }
+        config_path = tmp_path / 'pipeline.json'
+        config_path.write_text(json.dumps(config))
+
+        items = [MockReportItem() for _ in range(3)]
+        items[0].error_info['expected'] = 1
+        reports = [
+            SimpleNamespace(outcome='failed', failed=True, longreprtext='Different number of rows'),
+            SimpleNamespace(outcome='passed', failed=False, longreprtext=''),
+            SimpleNamespace(outcome='passed', failed=False, longreprtext=''),
+        ]
+        options = {'file_or_dir': [str(config_path)]}
+
+        def getoption(name: str, default: Any = None, _skip: bool = False) -> Any:
+            return options.get(name, default)
+
+        session = SimpleNamespace(
+            config=SimpleNamespace(getoption=getoption),
+            db_executor=ThreadPoolExecutor(max_workers=1),
+            report=dict(zip(items, reports)),
+            # Both database tests have the same test name and arguments
+            test_entries={items[0]: ('database_tests', 'main_table', 1),
+                          items[1]: ('database_tests', 'main_table', 0),
+                          items[2]: ('files_tests', 0)},
+        )
+        pytest_sessionfinish(session)  # type: ignore[arg-type]
+
+        with open(tmp_path / 'pipeline.report.json') as f:
+            report = json.load(f)
+        first, second = report['database_tests']['main_table']
+        assert first['status'] == 'Passed' and 'error' not in first
+        assert second['status'] == 'Failed'
+        assert second['error'] == {'message': 'Different number of rows', 'details': {'expected': 1}}
+        assert report['files_tests'][0]['status'] == 'Passed'
+
 
 @pytest.mark.parametrize("dir_cmp", [{'ref': 'citest/reference', 'target': 'citest/target'}], indirect=True)
 class TestCITestFilesItem:
@@ -0,0 +1,238 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``hal_cov_one_seq_chunk.py``.
+
+The ``halAlignmentDepth`` executable is replaced by a fake that outputs
+chunks of a precomputed wiggle file.
+"""
+
+import importlib.util
+import json
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+
+class TestHalCovOneSeqChunk:
+    """Tests ``hal_cov_one_seq_chunk.py`` script."""
+
+    ref_file_dir: Path
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+        type(self).script_path = (
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "hal_cov_one_seq_chunk.py"
+        )
+
+    @pytest.mark.parametrize(
+        "ref_sequence, start, length, exp_output, exp_stderr",
+        [
+            ("chr1", 0, 33, {"num_positions": 33, "num_aligned_positions": 22}, None),
+            ("chr1", 20, 10, {"num_positions": 10, "num_aligned_positions": 5}, None),
+            ("chr1", 30, 10, None, "sequence-length mismatch: 3 vs 10"),
+            ("chrX", 0, 10, None, "halAlignmentDepth terminated with exit code 1 for sequence 'chrX'"),
+        ],
+    )
+    def test_hal_cov_one_seq_chunk(
+        self,
+        ref_sequence: str,
+        start: int,
+        length: int,
+        exp_output: Optional[Dict[str, int]],
+        exp_stderr: Optional[str],
+        script_runner: ScriptRunner,
+    ) -> None:
+        """Tests ``hal_cov_one_seq_chunk.py`` script."""
+        cmd_args = [
+            str(self.script_path),
+            str(self.ref_file_dir / "aln.hal"),
+            "genomeA",
+            "--ref-sequence",
+            ref_sequence,
+            "--start",
+            str(start),
+            "--length",
+            str(length),
+            "--target-genomes",
+            "genomeB",
+            "--hal_alignment_depth_exe",
+            str(self.ref_file_dir / "halAlignmentDepth"),
+        ]
+
+        result = script_runner.run(cmd_args)
+        if exp_stderr is not None:
+            assert not result.success
+            assert exp_stderr in result.stderr
+        else:
+            assert result.success
+            assert json.loads(result.stdout) == exp_output
+
+    @pytest.mark.parametrize(
+        "task_bin, exp_output, exp_stderr",
+        [
+            ("bin1", {"num_positions": 33, "num_aligned_positions": 22}, None),
+            ("bin2", {"num_positions": 10, "num_aligned_positions": 5}, None),
+            ("bin3", None, "task bin 'bin3' not found in task sheet"),
+        ],
+    )
+    def test_hal_cov_task_bin(
+        self,
+        task_bin: str,
+        exp_output: Optional[Dict[str, int]],
+        exp_stderr: Optional[str],
+        script_runner: ScriptRunner,
+        tmp_path: Path,
+    ) -> None:
+        """Tests ``hal_cov_one_seq_chunk.py`` script summing the coverage of a task bin of chunks."""
+        task_sheet_file = tmp_path / "task_sheet.tsv"
+        task_sheet_file.write_text(
+            "task_bin\tref_sequence\tstart\tlength\n"
+            "bin1\tchr1\t0\t20\n"
+            "bin2\tchr1\t20\t10\n"
+            "bin1\tchr1\t20\t13\n"
+        )
+        cmd_args = [
+            str(self.script_path),
+            str(self.ref_file_dir / "aln.hal"),
+            "genomeA",
+            "--task-sheet",
+            str(task_sheet_file),
+            "--task-bin",
+            task_bin,
+            "--target-genomes",
+            "genomeB",
+            "--hal_alignment_depth_exe",
+            str(self.ref_file_dir / "halAlignmentDepth"),
+        ]
+
+        result = script_runner.run(cmd_args)
+        if exp_stderr is not None:
+            assert not result.success
+            assert exp_stderr in result.stderr
+        else:
+            assert result.success
+            assert json.loads(result.stdout) == exp_output
+
+
+def _load_script_module(script_path: Path) -> ModuleType:
+    """Loads a script as a module, without running its main function."""
+    spec = importlib.util.spec_from_file_location(script_path.stem, script_path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _parse_wiggle(module: ModuleType, text: str, chunk_size: Optional[int]) -> Dict[str, Dict[str, Any]]:
+    """Parses wiggle text fed in chunks of the given size (or all at once), with depths and histograms."""
+    parser = module.WiggleCoverageParser(return_depths=True, return_histogram=True)
+    if chunk_size is None:
+        parser.feed(text)
+    else:
+        for i in range(0, len(text), chunk_size):
+            parser.feed(text[i : i + chunk_size])
+    cov_stats = parser.close()
+    # Arrays are converted to lists so that results can be compared for equality
+    return {
+        seq_name: {
+            key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in x.items()
+        }
+        for seq_name, x in cov_stats.items()
+    }
+
+
+class TestWiggleCoverageParser:
+    """Tests :class:`WiggleCoverageParser` class of ``hal_cov_one_seq_chunk.py`` script."""
+
+    module: ModuleType
+    ref_file_dir: Path
+    # The depth '1_0' is valid for int() but not for NumPy, and so is parsed by the slow fallback
+    wiggle_text = (
+        "fixedStep chrom=chr1 start=1 step=1\n0\n2\n1_0\n"
+        "fixedStep chrom=chr2 start=5 step=1\n1\n0"  # no final newline
+    )
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+        type(self).module = _load_script_module(
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "hal_cov_one_seq_chunk.py"
+        )
+
+    def test_parse_whole(self) -> None:
+        """Tests the coverage stats, depths and histograms of wiggle text parsed at once."""
+        assert _parse_wiggle(self.module, self.wiggle_text, None) == {
+            "chr1": {
+                "num_aligned_positions": 2,
+                "num_positions": 3,
+                "start": 1,
+                "step": 1,
+                "depths": [0, 2, 10],
+                "depth_histogram": [1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 1],
+            },
+            "chr2": {
+                "num_aligned_positions": 1,
+                "num_positions": 2,
+                "start": 5,
+                "step": 1,
+                "depths": [1, 0],
+                "depth_histogram": [1, 1],
+            },
+        }
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1_048_576])
+    def test_parse_chunks(self, chunk_size: int) -> None:
+        """Tests that wiggle text fed in chunks, splitting lines across chunks, is parsed as a whole."""
+        assert _parse_wiggle(self.module, self.wiggle_text, chunk_size) == _parse_wiggle(
+            self.module, self.wiggle_text, None
+        )
+        wiggle_text = (self.ref_file_dir / "aln.genomeA.depth.wig").read_text()
+        assert _parse_wiggle(self.module, wiggle_text, chunk_size) == _parse_wiggle(
+            self.module, wiggle_text, None
+        )
+
+    @pytest.mark.parametrize("chunk_size", [None, 1, 7, 64])
+    @pytest.mark.parametrize(
+        "wiggle_text, exp_error",
+        [
+            ("0\nfixedStep chrom=chr1 start=1 step=1\n0\n", "failed to parse wiggle line: 0\n"),
+            ("variableStep chrom=chr1\n1 0\n", "variableStep blocks not supported"),
+            (
+                "fixedStep chrom=chr1 start=1\n0\n",
+                "failed to parse wiggle line: fixedStep chrom=chr1 start=1",
+            ),
+            (
+                "fixedStep chrom=chr1 start=1 step=1\n0\nfixedStep chrom=chr1 start=3 step=1\n0\n",
+                "multiple occurrences of sequence 'chr1' found",
+            ),
+            ("fixedStep chrom=chr1 start=1 step=1\n0\n12a\n", "failed to parse wiggle line: 12a"),
+            ("fixedStep chrom=chr1 start=1 step=1\n0\n\n1\n", "failed to parse wiggle line: \n"),
+        ],
+    )
+    def test_parse_errors(self, wiggle_text: str, exp_error: str, chunk_size: Optional[int]) -> None:
+        """Tests the errors raised on invalid wiggle text, however it is fed to the parser."""
+        with pytest.raises(ValueError) as exc_info:
+            _parse_wiggle(self.module, wiggle_text, chunk_size)
+        assert str(exc_info.value).startswith(exp_error)
@@ -0,0 +1,153 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``hal_genome_coverage.py``.
+
+The ``halAlignmentDepth`` executable is replaced by a fake that outputs
+chunks of a precomputed wiggle file.
+"""
+
+import json
+from pathlib import Path
+import shutil
+from typing import List, Optional
+
+import pytest
+from pytest_console_scripts import RunResult, ScriptRunner
+
+
+# The script imports a sibling script module, so it is not run in-process.
+@pytest.mark.script_launch_mode("subprocess")
+class TestHalGenomeCoverage:
+    """Tests ``hal_genome_coverage.py`` script."""
+
+    ref_file_dir: Path
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+        type(self).script_path = (
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "hal_genome_coverage.py"
+        )
+
+    def run_script(
+        self,
+        chrom_sizes_file: Path,
+        checkpoint_file: Path,
+        script_runner: ScriptRunner,
+        hal_alignment_depth_exe: Optional[Path] = None,
+    ) -> RunResult:
+        """Runs ``hal_genome_coverage.py`` on genome 'genomeA' with a chunk size of 10."""
+        if hal_alignment_depth_exe is None:
+            hal_alignment_depth_exe = self.ref_file_dir / "halAlignmentDepth"
+        cmd_args = [
+            str(self.script_path),
+            str(self.ref_file_dir / "aln.hal"),
+            "genomeA",
+            str(chrom_sizes_file),
+            "--target-genomes",
+            "genomeB",
+            "--chunk-size",
+            "10",
+            "--jobs",
+            "2",
+            "--checkpoint-file",
+            str(checkpoint_file),
+            "--hal_alignment_depth_exe",
+            str(hal_alignment_depth_exe),
+        ]
+        return script_runner.run(cmd_args)
+
+    @pytest.mark.parametrize(
+        "checkpoint_lines, exp_num_aligned_positions",
+        [
+            ([], [22]),
+            (
+                [
+                    '{"ref_sequence": "chr1", "start": 10, "length": 10, "num_positions": 10,'
+                    ' "num_aligned_positions": 9}\n',
+                    '{"ref_sequence": "chr1", "start": 20, "len',
+                ],
+                [21],
+            ),
+        ],
+    )
+    def test_hal_genome_coverage(
+        self,
+        checkpoint_lines: List[str],
+        exp_num_aligned_positions: List[int],
+        script_runner: ScriptRunner,
+        tmp_path: Path,
+    ) -> None:
+        """Tests ``hal_genome_coverage.py`` script, resuming from any checkpointed chunks."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        shutil.copyfile(
+            self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes" / "genomeA.chrom.sizes",
+            chrom_sizes_file,
+        )
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        checkpoint_file.write_text("".join(checkpoint_lines))
+
+        result = self.run_script(chrom_sizes_file, checkpoint_file, script_runner)
+
+        assert result.success
+        exp_output = {
+            "genome": "genomeA",
+            "num_positions": 33,
+            "num_aligned_positions": exp_num_aligned_positions[0],
+            "sequences": {
+                "chr1": {"num_positions": 33, "num_aligned_positions": exp_num_aligned_positions[0]}
+            },
+        }
+        assert json.loads(result.stdout) == exp_output
+
+        with open(checkpoint_file) as in_file_obj:
+            checkpoint = [json.loads(line) for line in in_file_obj]
+        assert sorted(x["start"] for x in checkpoint) == [0, 10, 20, 30]
+
+    def test_hal_genome_coverage_failure(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests that ``hal_genome_coverage.py`` checkpoints completed chunks if another chunk fails."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        chrom_sizes_file.write_text("chr1\t33\nchrX\t5\n")
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+
+        result = self.run_script(chrom_sizes_file, checkpoint_file, script_runner)
+
+        assert not result.success
+        assert "failed to calculate coverage of 1 sequence chunks" in result.stderr
+        with open(checkpoint_file) as in_file_obj:
+            checkpoint = [json.loads(line) for line in in_file_obj]
+        assert sorted((x["ref_sequence"], x["start"]) for x in checkpoint) == [
+            ("chr1", 0),
+            ("chr1", 10),
+            ("chr1", 20),
+            ("chr1", 30),
+        ]
+
+    def test_hal_genome_coverage_missing_exe(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests that ``hal_genome_coverage.py`` reports chunks failing with an unexpected error."""
+        chrom_sizes_file = tmp_path / "genomeA.chrom.sizes"
+        chrom_sizes_file.write_text("chr1\t33\n")
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+
+        result = self.run_script(
+            chrom_sizes_file, checkpoint_file, script_runner, tmp_path / "missing" / "halAlignmentDepth"
+        )
+
+        assert not result.success
+        assert "failed to calculate coverage of 4 sequence chunks" in result.stderr
+        assert checkpoint_file.read_text() == ""
@@ -15,24 +15,22 @@
 """Unit testing of :mod:`cmd.hal_liftover` module."""
 
 import filecmp
+import io
+import json
 from pathlib import Path
-from typing import Optional
+import shutil
+from typing import Any, Dict, List, Optional
 
 import pytest
 from pytest_console_scripts import ScriptRunner
-from pytest_mock import MockerFixture
 
-from ensembl.compara.utils.tools import import_module_from_file
-
-
-helpers_module_path = Path(__file__).parents[0] / "helpers.py"
-helpers = import_module_from_file(helpers_module_path)
-
-# pylint: disable=import-error,wrong-import-order,wrong-import-position
-
-from helpers import mock_two_bit_to_fa
-
-# pylint: enable=import-error,wrong-import-order,wrong-import-position
+from ensembl.compara.cmd.hal_liftover import (
+    liftover_regions_via_chain,
+    LiftoverOutputWriter,
+    LiftoverSession,
+)
+from ensembl.compara.utils.chain import ChainIndex
+from ensembl.compara.utils.hal import SimpleRegion
 
 
 class TestHalLiftover:
@@ -51,8 +49,18 @@ class TestHalLiftover:
         [
             ("aln.hal", "genomeA", "genomeB", "genomeA_to_genomeB.json", "chr1:16-18:1", "aln_cache", "JSON"),
             ("aln.hal", "genomeA", "genomeB", "genomeA_to_genomeB.tsv", "chr1:16-18:1", "aln_cache", "TSV"),
+            (
+                "aln.hal",
+                "genomeA",
+                "genomeB",
+                "genomeA_to_genomeB.jsonl",
+                "chr1:16-18:1",
+                "aln_cache",
+                "JSONL",
+            ),
         ],
     )
+    @pytest.mark.parametrize("jobs", [1, 2])
     @pytest.mark.script_launch_mode("inprocess")
     def test_hal_liftover(
         self,
@@ -63,16 +71,17 @@ class TestHalLiftover:
         src_region: str,
         hal_cache: str,
         output_format: str,
+        jobs: int,
         script_runner: ScriptRunner,
-        mocker: MockerFixture,
         tmp_path: Path,
     ) -> None:
         """Tests ``hal-liftover`` console script."""
         assert self.ref_file_dir is not None
-        mocker.patch("subprocess.run", side_effect=mock_two_bit_to_fa)
 
         hal_file_path = self.ref_file_dir / hal_file
-        hal_cache_path = self.ref_file_dir / hal_cache
+        # The HAL cache is copied so that chain index files are not written to the test data
+        hal_cache_path = tmp_path / hal_cache
+        shutil.copytree(self.ref_file_dir / hal_cache, hal_cache_path)
         out_file_path = tmp_path / output_file
 
         cmd_args = [
@@ -87,9 +96,151 @@ class TestHalLiftover:
             hal_cache_path,
             "--output-format",
             output_format,
+            "--jobs",
+            str(jobs),
         ]
 
         script_runner.run(cmd_args, check=True)  # type: ignore
 
         ref_file_path = self.ref_file_dir / output_file
         assert filecmp.cmp(out_file_path, ref_file_path)
+
+    @pytest.mark.parametrize(
+        "src_regions, flank_length, exp_results",
+        [
+            (
+                [SimpleRegion("chr1", 15, 18, "+"), SimpleRegion("chr1", 0, 2, "+", name="unmapped")],
+                0,
+                [
+                    [
+                        {
+                            "dest_chr": "chr1",
+                            "dest_start": 23,
+                            "dest_end": 25,
+                            "dest_strand": 1,
+                            "dest_sequence": "TAA",
+                        }
+                    ],
+                    [],
+                ],
+            ),
+            (
+                [SimpleRegion("chr1", 15, 18, "-")],
+                1,
+                [
+                    [
+                        {
+                            "dest_chr": "chr1",
+                            "dest_start": 22,
+                            "dest_end": 26,
+                            "dest_strand": -1,
+                            "dest_sequence": "CTTAA",
+                        }
+                    ]
+                ],
+            ),
+        ],
+    )
+    def test_liftover_regions_via_chain(
+        self, src_regions: List[SimpleRegion], flank_length: int, exp_results: List[List[Dict[str, Any]]]
+    ) -> None:
+        """Tests :func:`cmd.hal_liftover.liftover_regions_via_chain()` function."""
+        assert self.ref_file_dir is not None
+        hal_cache_path = self.ref_file_dir / "aln_cache"
+        chain_dir_path = hal_cache_path / "sequence" / "chain"
+        chain_file_path = chain_dir_path / "genomeA_chr1_to_genomeB.linearGap_medium.chain.gz"
+
+        records = liftover_regions_via_chain(
+            src_regions,
+            "genomeA",
+            {"chr1": 33},
+            "genomeB",
+            hal_cache_path / "genome" / "2bit" / "genomeB.2bit",
+            ChainIndex.from_chain_file(chain_file_path),
+            flank_length=flank_length,
+        )
+
+        assert [record["params"]["src_start"] for record in records] == [x.start + 1 for x in src_regions]
+        assert [record["results"] for record in records] == exp_results
+
+    @pytest.mark.parametrize("num_records", [0, 1, 3])
+    @pytest.mark.parametrize("output_format", ["JSON", "JSONL"])
+    def test_liftover_output_writer(self, num_records: int, output_format: str) -> None:
+        """Tests :class:`cmd.hal_liftover.LiftoverOutputWriter` streaming JSON output."""
+        records = [
+            {
+                "params": {"src_genome": "genomeA", "src_chr": "chr1", "src_start": i + 1, "src_end": i + 2},
+                "results": [{"dest_chr": "chr1", "dest_start": i + 3, "dest_sequence": "AC"}],
+            }
+            for i in range(num_records)
+        ]
+        output_file = io.StringIO()
+        with LiftoverOutputWriter(output_file, output_format) as writer:
+            for record in records:
+                writer.write(record)
+
+        if output_format == "JSON":
+            assert output_file.getvalue() == json.dumps(records)
+        else:
+            assert output_file.getvalue() == "".join(json.dumps(record) + "\n" for record in records)
+
+    def test_liftover_output_writer_error(self) -> None:
+        """Tests that :class:`cmd.hal_liftover.LiftoverOutputWriter` leaves JSON unfinished on error."""
+        output_file = io.StringIO()
+        with pytest.raises(RuntimeError, match="worker failed"):
+            with LiftoverOutputWriter(output_file, "JSON") as writer:
+                writer.write({"params": {"src_genome": "genomeA"}, "results": []})
+                raise RuntimeError("worker failed")
+
+        assert output_file.getvalue() == '[{"params": {"src_genome": "genomeA"}, "results": []}'
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(output_file.getvalue())
+        with pytest.raises(RuntimeError, match="closed liftover output writer"):
+            writer.write({})
+
+    def test_liftover_output_writer_unsupported_format(self) -> None:
+        """Tests :class:`cmd.hal_liftover.LiftoverOutputWriter` with an unsupported output format."""
+        with pytest.raises(ValueError, match="unsupported output format: XML"):
+            LiftoverOutputWriter(io.StringIO(), "XML")
+
+    def test_liftover_session(self, tmp_path: Path) -> None:
+        """Tests :class:`cmd.hal_liftover.LiftoverSession` chain index caching."""
+        assert self.ref_file_dir is not None
+        hal_cache_path = tmp_path / "aln_cache"
+        shutil.copytree(self.ref_file_dir / "aln_cache", hal_cache_path)
+
+        session = LiftoverSession(hal_cache_path, max_cache_bytes=0)
+        for _ in range(3):
+            record = session.liftover("chr1:16-18:1", "genomeA", "genomeB")
+            assert record["results"][0]["dest_sequence"] == "TAA"
+        assert (session.cache_misses, session.cache_hits, session.cache_evictions) == (1, 2, 0)
+        assert session.cache_bytes > 0
+
+        regions = [SimpleRegion("chr1", 15, 18, "+"), SimpleRegion("chr1", 15, 18, "-")]
+        records = session.liftover_regions(regions, "genomeA", "genomeB", flank_length=1)
+        assert [x["results"][0]["dest_sequence"] for x in records] == ["TTAAG", "CTTAA"]
+
+        with pytest.raises(ValueError, match="chromosome ID 'chr2' not found"):
+            session.liftover("chr2:16-18:1", "genomeA", "genomeB")
+
+    def test_liftover_session_serve_lines(self, tmp_path: Path) -> None:
+        """Tests :meth:`cmd.hal_liftover.LiftoverSession.serve_lines()` method."""
+        assert self.ref_file_dir is not None
+        hal_cache_path = tmp_path / "aln_cache"
+        shutil.copytree(self.ref_file_dir / "aln_cache", hal_cache_path)
+
+        requests = [
+            {"id": 1, "src_genome": "genomeA", "dest_genome": "genomeB", "src_region": "chr1:16-18:1"},
+            {"id": 2, "src_genome": "genomeA", "src_region": "chr1:16-18:1"},
+            {"id": 3, "src_genome": "genomeA", "dest_genome": "genomeB", "src_region": "chr1:0-18:1"},
+        ]
+        input_file = io.StringIO("".join(json.dumps(x) + "\n" for x in requests) + "\nnot JSON\n")
+        output_file = io.StringIO()
+        LiftoverSession(hal_cache_path).serve_lines(input_file, output_file)
+
+        responses = [json.loads(line) for line in output_file.getvalue().splitlines()]
+        assert [x.get("id") for x in responses] == [1, 2, 3, None]
+        assert responses[0]["results"][0]["dest_sequence"] == "TAA"
+        assert responses[1]["error"] == "missing liftover request parameter: 'dest_genome'"
+        assert responses[2]["error"] == "1-based region start must be greater than or equal to 1: 0"
+        assert responses[3]["error"].startswith("invalid liftover request")
@@ -0,0 +1,165 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of :mod:`cmd.hal_liftover_server` module."""
+
+import asyncio
+import io
+import json
+from pathlib import Path
+import shutil
+from typing import Any, Dict, List, Mapping
+
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+from ensembl.compara.cmd.hal_liftover import LiftoverSession
+from ensembl.compara.cmd.hal_liftover_server import LatencyMetrics, LiftoverServer
+
+
+class TestHalLiftoverServer:
+    """Tests ``hal-liftover serve`` console script."""
+
+    ref_file_dir: Path
+    requests: List[Dict[str, Any]] = [
+        {"id": 1, "src_genome": "genomeA", "dest_genome": "genomeB", "src_region": "chr1:16-18:1"},
+        {
+            "id": 2,
+            "src_genome": "genomeA",
+            "dest_genome": "genomeB",
+            "src_region": "chr1:16-18:-1",
+            "flank": 1,
+        },
+        {"id": 3, "src_genome": "genomeA", "dest_genome": "genomeB", "src_region": "chr9:16-18:1"},
+    ]
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+
+    def check_responses(self, responses: List[Dict[str, Any]]) -> None:
+        """Checks the responses to the liftover requests of this test class."""
+        responses_by_id = {x["id"]: x for x in responses}
+        assert sorted(responses_by_id) == [1, 2, 3]
+        assert responses_by_id[1]["results"][0]["dest_sequence"] == "TAA"
+        assert responses_by_id[2]["results"][0]["dest_sequence"] == "CTTAA"
+        assert responses_by_id[3]["error"] == "chromosome ID 'chr9' not found in genome chrom sizes"
+
+    @pytest.mark.script_launch_mode("inprocess")
+    def test_serve_stdio(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests ``hal-liftover serve`` reading requests from standard input."""
+        hal_cache_path = tmp_path / "aln_cache"
+        shutil.copytree(self.ref_file_dir / "aln_cache", hal_cache_path)
+        metrics_file_path = tmp_path / "metrics.json"
+
+        bad_requests = [
+            {"id": 4, "src_genome": "genomeA", "dest_genome": "genomeB", "src_region": 123},
+            {
+                "id": 5,
+                "src_genome": "genomeA",
+                "dest_genome": "genomeB",
+                "src_region": "chr1:16-18:1",
+                "min_map_ratio": "x",
+            },
+        ]
+        request_lines = [json.dumps(x) for x in self.requests + bad_requests] + ["", "not JSON"]
+        result = script_runner.run(
+            [
+                "hal-liftover",
+                "serve",
+                self.ref_file_dir / "aln.hal",
+                "--hal-cache",
+                hal_cache_path,
+                "--metrics-file",
+                metrics_file_path,
+            ],
+            stdin=io.StringIO("\n".join(request_lines) + "\n"),
+            check=True,
+        )
+
+        responses = [json.loads(line) for line in result.stdout.splitlines()]
+        assert len(responses) == 6
+        self.check_responses([x for x in responses if x.get("id") in (1, 2, 3)])
+        bad_responses = {x["id"]: x for x in responses if x.get("id") in (4, 5)}
+        assert "'src_region' must be a string" in bad_responses[4]["error"]
+        assert "could not convert string to float" in bad_responses[5]["error"]
+
+        with open(metrics_file_path) as in_file_obj:
+            metrics = json.load(in_file_obj)
+        assert metrics["requests"] == 6
+        assert metrics["errors"] == 4
+        assert set(metrics["latency_ms"]) == {"mean", "p50", "p95", "p99", "max"}
+
+    def test_serve_unix(self, tmp_path: Path) -> None:
+        """Tests :meth:`cmd.hal_liftover_server.LiftoverServer.serve_unix()` method."""
+        hal_cache_path = tmp_path / "aln_cache"
+        shutil.copytree(self.ref_file_dir / "aln_cache", hal_cache_path)
+        socket_path = tmp_path / "liftover.sock"
+
+        async def run_client(server: LiftoverServer) -> List[Dict[str, Any]]:
+            ready = asyncio.Event()
+            server_task = asyncio.create_task(server.serve_unix(socket_path, ready=ready))
+            await ready.wait()
+
+            reader, writer = await asyncio.open_unix_connection(str(socket_path))
+            for request in self.requests:
+                writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in self.requests]
+
+            writer.write(b'{"command": "metrics"}\n')
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+            writer.close()
+
+            server_task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await server_task
+            return responses
+
+        with LiftoverServer(LiftoverSession(hal_cache_path), max_workers=2) as server:
+            *responses, metrics = asyncio.run(run_client(server))
+
+        self.check_responses(responses)
+        assert (metrics["requests"], metrics["errors"]) == (3, 1)
+        assert server.session.cache_misses == 1
+        assert not socket_path.exists()
+
+    def test_handle_line_unexpected_error(self, tmp_path: Path) -> None:
+        """Tests that an unexpected error in a request is answered rather than raised."""
+
+        class BrokenSession(LiftoverSession):
+            """Liftover session failing every request with an unexpected error."""
+
+            def handle_request(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+                raise AttributeError("broken session")
+
+        with LiftoverServer(BrokenSession(tmp_path), max_workers=1) as server:
+            response = asyncio.run(server.handle_line('{"id": 7, "src_region": "chr1:1-2:1"}'))
+        assert response == {"id": 7, "error": "broken session"}
+        assert (server.metrics.request_count, server.metrics.error_count) == (1, 1)
+
+    def test_latency_metrics(self) -> None:
+        """Tests :class:`cmd.hal_liftover_server.LatencyMetrics` class."""
+        metrics = LatencyMetrics(window=2)
+        assert metrics.summary() == {"requests": 0, "errors": 0, "latency_ms": {}}
+        for latency in (0.004, 0.001, 0.002):
+            metrics.record(latency, error=latency > 0.003)
+        summary = metrics.summary()
+        assert (summary["requests"], summary["errors"]) == (3, 1)
+        assert summary["latency_ms"]["mean"] == pytest.approx(7 / 3)
+        assert summary["latency_ms"]["p50"] == pytest.approx(1.5)
+        assert summary["latency_ms"]["max"] == pytest.approx(4)
@@ -0,0 +1,101 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``left_align_maf.py``."""
+
+from pathlib import Path
+import re
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+from ensembl.compara.utils.maf import iter_maf_blocks
+
+
+def left_align_alt_seq(ref_seq: str, alt_seq: str) -> str:
+    """Returns the non-reference sequence with its gaps left-aligned one base at a time.
+
+    This is the reference implementation that the script is checked against.
+    """
+    ref_seq_bytes = bytearray(ref_seq.encode("ascii"))
+    alt_seq_bytes = bytearray(alt_seq.encode("ascii"))
+    for match in re.finditer(b"-+", bytes(alt_seq_bytes)):
+        gap_start, gap_stop = match.span()
+        while (
+            ref_seq_bytes[gap_stop - 1 : gap_stop].upper() == alt_seq_bytes[gap_start - 1 : gap_start].upper()
+        ):
+            alt_seq_bytes[gap_stop - 1] = alt_seq_bytes[gap_start - 1]
+            alt_seq_bytes[gap_start - 1] = ord("-")
+            gap_start -= 1
+            gap_stop -= 1
+    return alt_seq_bytes.decode("ascii")
+
+
+def make_random_seq_pairs(seed: int, num_pairs: int) -> List[Tuple[str, str]]:
+    """Returns random pairs of ungapped reference and gapped non-reference sequences.
+
+    Sequences are drawn from small alphabets, including mixed-case homopolymers, so that
+    gaps are often shifted through long runs of bases and up to the previous gap.
+    """
+    rng = np.random.default_rng(seed)
+    seq_pairs = []
+    for _ in range(num_pairs):
+        alphabet = np.array(list(rng.choice(["A", "Aa", "AC", "ACGT", "acgtN"])))
+        num_cols = int(rng.integers(1, 60))
+        ref_seq = rng.choice(alphabet, num_cols)
+        alt_seq = ref_seq.copy() if rng.random() < 0.5 else rng.choice(alphabet, num_cols)
+        alt_seq[rng.random(num_cols) < rng.random() * 0.6] = "-"
+        seq_pairs.append(("".join(ref_seq), "".join(alt_seq)))
+    return seq_pairs
+
+
+class TestLeftAlignMaf:
+    """Tests ``left_align_maf.py`` script."""
+
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        type(self).script_path = Path(__file__).parents[3] / "scripts" / "hal_alignment" / "left_align_maf.py"
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_left_align_maf(self, seed: int, tmp_path: Path, script_runner: ScriptRunner) -> None:
+        """Tests that ``left_align_maf.py`` matches left-alignment one base at a time."""
+        seq_pairs = make_random_seq_pairs(seed, 500)
+        input_maf = tmp_path / "input.maf"
+        with open(input_maf, "w", encoding="utf-8") as out_file_obj:
+            out_file_obj.write("##maf version=1\n\n")
+            for ref_seq, alt_seq in seq_pairs:
+                alt_seq_length = len(alt_seq) - alt_seq.count("-")
+                out_file_obj.write(
+                    f"a score=1\ns ref.chr1 0 {len(ref_seq)} + 100 {ref_seq}\n"
+                    f"s alt.chr1 0 {alt_seq_length} + 100 {alt_seq}\n\n"
+                )
+        output_maf = tmp_path / "output.maf"
+
+        result = script_runner.run([str(self.script_path), str(input_maf), str(output_maf)])
+        assert result.success
+
+        with open(output_maf, encoding="utf-8") as in_file_obj:
+            out_blocks = list(iter_maf_blocks(in_file_obj))
+        assert len(out_blocks) == len(seq_pairs)
+        for (ref_seq, alt_seq), out_block in zip(seq_pairs, out_blocks):
+            exp_alt_seq = left_align_alt_seq(ref_seq, alt_seq)
+            assert out_block.row_seq(0) == ref_seq
+            assert out_block.row_seq(1) == exp_alt_seq
+            # Only blocks with shifted gaps are output as new alignment blocks.
+            assert out_block.annotations == {"score": "0.00" if exp_alt_seq != alt_seq else "1"}
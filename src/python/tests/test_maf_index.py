@@ -0,0 +1,104 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of :mod:`cmd.maf_index` module."""
+
+from contextlib import nullcontext as does_not_raise
+from pathlib import Path
+import shutil
+from typing import ContextManager, List, Tuple
+
+from click.testing import CliRunner
+import pytest
+from pytest import raises
+
+from ensembl.compara.cmd.maf_index import main, parse_maf_region
+from ensembl.compara.utils.maf import get_maf_index_path
+
+
+class TestMafIndex:
+    """Tests ``maf-index`` console script."""
+
+    ref_file_dir: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+
+    @pytest.mark.parametrize(
+        "region_string, exp_output, expectation",
+        [
+            ("chr1:1-10", ("chr1", 0, 10), does_not_raise()),
+            ("genomeA.chr1:5-5", ("genomeA.chr1", 4, 5), does_not_raise()),
+            ("chr1:0-10", None, raises(ValueError, match=r"invalid 1-based region")),
+            ("chr1:10-9", None, raises(ValueError, match=r"invalid 1-based region")),
+            ("chr1:10", None, raises(ValueError, match=r"failed to tokenise")),
+        ],
+    )
+    def test_parse_maf_region(
+        self, region_string: str, exp_output: Tuple[str, int, int], expectation: ContextManager
+    ) -> None:
+        """Tests :func:`cmd.maf_index.parse_maf_region()` function."""
+        with expectation:
+            assert parse_maf_region(region_string) == exp_output
+
+    def test_build_and_count(self, tmp_path: Path) -> None:
+        """Tests ``maf-index build`` and ``maf-index count`` commands."""
+        maf_file_path = tmp_path / "aln.maf"
+        shutil.copyfile(self.ref_file_dir / "aln.maf", maf_file_path)
+        runner = CliRunner()
+
+        result = runner.invoke(main, ["build", str(maf_file_path)])
+        assert result.exit_code == 0
+        assert get_maf_index_path(maf_file_path).is_file()
+
+        result = runner.invoke(main, ["count", str(maf_file_path)])
+        assert result.exit_code == 0
+        assert result.output == "5\n"
+
+    @pytest.mark.parametrize(
+        "regions, exp_a_line_count, exp_ref_starts",
+        [
+            (["Anc0.chr1:11-17"], 3, ["8", "12", "16"]),
+            (["Anc0.chr1:1-1", "Anc0.chr1:36-36"], 2, ["0", "28"]),
+            (["genomeA.chr1:1-33"], 0, []),
+        ],
+    )
+    def test_query(
+        self, regions: List[str], exp_a_line_count: int, exp_ref_starts: List[str], tmp_path: Path
+    ) -> None:
+        """Tests ``maf-index query`` command."""
+        maf_file_path = tmp_path / "aln.maf"
+        shutil.copyfile(self.ref_file_dir / "aln.maf", maf_file_path)
+        out_file_path = tmp_path / "out.maf"
+
+        result = CliRunner().invoke(main, ["query", str(maf_file_path), *regions, "-o", str(out_file_path)])
+        assert result.exit_code == 0
+
+        out_lines = out_file_path.read_text().splitlines()
+        assert out_lines[0] == "##maf version=1 scoring=none"
+        assert sum(x.startswith("a") for x in out_lines) == exp_a_line_count
+        ref_lines = [x.split() for x in out_lines if x.startswith("s\tAnc0.chr1")]
+        assert [x[2] for x in ref_lines] == exp_ref_starts
+
+    def test_query_bad_region(self, tmp_path: Path) -> None:
+        """Tests ``maf-index query`` command with an invalid region."""
+        maf_file_path = tmp_path / "aln.maf"
+        shutil.copyfile(self.ref_file_dir / "aln.maf", maf_file_path)
+
+        result = CliRunner().invoke(main, ["query", str(maf_file_path), "Anc0.chr1:0-5"])
+        assert result.exit_code != 0
+        assert "invalid 1-based region" in result.output
@@ -0,0 +1,105 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``map_maf_src_field.py``."""
+
+import gzip
+from pathlib import Path
+
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+INPUT_MAF = """##maf version=1 scoring=N/A
+# hal test
+
+a\tscore=1\tmode=x
+s\tgenomeA.chr1\t0\t5\t+\t33\tATT---GT
+i genomeA.chr1 N 0 C 0
+s\tgenomeB.chr2\t007\t8\t-\t40\tA..CCCGT
+
+a score=2
+s genomeA.chr1 5 4 + 33 AATC
+s genomeC.chr3 8 4 + 40 AATC
+
+a
+s genomeB.chr2 16 4 + 40 AATC
+"""
+
+EXP_OUTPUT_MAF = (
+    "##maf version=1 scoring=none\n"
+    "# generated by Biopython\n"
+    "\n"
+    "a score=1\n"
+    "s A_1" + " " * 37 + " " * 15 + "0     5 + " + " " * 13 + "33 ATT---GT\n"
+    "s B_2" + " " * 37 + " " * 15 + "7     8 - " + " " * 13 + "40 ATTCCCGT\n"
+    "\n"
+    "a \n"
+    "s B_2" + " " * 37 + " " * 14 + "16     4 + " + " " * 13 + "40 AATC\n"
+    "\n"
+)
+
+
+class TestMapMafSrcField:
+    """Tests ``map_maf_src_field.py`` script."""
+
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        type(self).script_path = (
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "map_maf_src_field.py"
+        )
+
+    @pytest.mark.parametrize("input_maf_name", ["input.maf", "input.maf.gz"])
+    @pytest.mark.parametrize("output_maf_name", ["output.maf", "output.maf.gz"])
+    def test_map_maf_src_field(
+        self, input_maf_name: str, output_maf_name: str, tmp_path: Path, script_runner: ScriptRunner
+    ) -> None:
+        """Tests ``map_maf_src_field.py`` script with multiple src map files."""
+        input_maf = tmp_path / input_maf_name
+        open_func = gzip.open if input_maf_name.endswith(".gz") else open
+        with open_func(input_maf, "wt") as out_file_obj:
+            out_file_obj.write(INPUT_MAF)
+
+        src_map_files = []
+        for genome_name, seq_name, assembly_seq in [("genomeA", "chr1", "A_1"), ("genomeB", "chr2", "B 2")]:
+            src_map_file = tmp_path / f"{genome_name}.hal_mapping.tsv"
+            src_map_file.write_text(
+                "hal_genome_name\thal_sequence_name\tassembly_sequence\n"
+                f"{genome_name}\t{seq_name}\t{assembly_seq}\n"
+            )
+            src_map_files.extend(["--src-map-file", str(src_map_file)])
+
+        output_maf = tmp_path / output_maf_name
+        result = script_runner.run([str(self.script_path), str(input_maf), str(output_maf), *src_map_files])
+        assert result.success
+
+        if output_maf_name.endswith(".gz"):
+            with gzip.open(output_maf, "rt") as in_file_obj:
+                assert in_file_obj.read() == EXP_OUTPUT_MAF
+        else:
+            assert output_maf.read_text() == EXP_OUTPUT_MAF
+
+    def test_duplicate_src(self, tmp_path: Path, script_runner: ScriptRunner) -> None:
+        """Tests that ``map_maf_src_field.py`` fails if an old src field value is mapped twice."""
+        input_maf = tmp_path / "input.maf"
+        input_maf.write_text(INPUT_MAF)
+        src_map_file = tmp_path / "genomeA.hal_mapping.tsv"
+        src_map_file.write_text("hal_genome_name\thal_sequence_name\tassembly_sequence\ngenomeA\tchr1\tA_1\n")
+
+        cmd_args = [str(self.script_path), str(input_maf), str(tmp_path / "output.maf")]
+        result = script_runner.run(cmd_args + ["--src-map-file", str(src_map_file)] * 2)
+        assert not result.success
+        assert "duplicate old src field: genomeA.chr1" in result.stderr
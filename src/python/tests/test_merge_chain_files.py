@@ -0,0 +1,140 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``merge_chain_files.py``."""
+
+import gzip
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+from ensembl.compara.utils.compression import is_bgzf_file, open_input
+
+
+class TestMergeChainFiles:
+    """Tests ``merge_chain_files.py`` script."""
+
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        type(self).script_path = (
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "merge_chain_files.py"
+        )
+
+    @pytest.mark.parametrize("merged_chain_name", ["merged.chain", "merged.chain.gz"])
+    def test_merge_chain_files(
+        self, merged_chain_name: str, tmp_path: Path, script_runner: ScriptRunner
+    ) -> None:
+        """Tests ``merge_chain_files.py`` script with plain and compressed chain files."""
+        chain_file_paths = [tmp_path / "10.chain.gz", tmp_path / "2.chain"]
+        chain_file_paths[0].write_bytes(gzip.compress(b"chain 30 chr1 50 + 20 30 chr3 70 + 5 15 1\n10\n\n"))
+        chain_file_paths[1].write_text("chain 20 chr1 50 + 0 10 chr2 60 - 0 10 1\n10\n\n")
+        chain_list_file = tmp_path / "chain_files.txt"
+        chain_list_file.write_text("".join(f"{x}\n" for x in chain_file_paths))
+        merged_chain_file = tmp_path / merged_chain_name
+
+        result = script_runner.run([str(self.script_path), str(chain_list_file), str(merged_chain_file)])
+        assert result.success
+
+        assert is_bgzf_file(merged_chain_file) == merged_chain_name.endswith(".gz")
+        with open_input(merged_chain_file) as in_file_obj:
+            assert in_file_obj.read() == (
+                "chain 20 chr1 50 + 0 10 chr2 60 - 0 10 1\n10\n\n"
+                "chain 30 chr1 50 + 20 30 chr3 70 + 5 15 2\n10\n\n"
+            )
+
+    @pytest.mark.parametrize(
+        "chain_header",
+        [
+            "chain 20 chr1 50 + 0 10 chr2 60 - 0  10\t1",
+            "chain\t20\tchr1\t50\t+\t0\t10\tchr2\t60\t-\t0\t10\t1",
+            "chain 20 chr1 50 + 0 10 chr2 60 - 0 10 1 ",
+        ],
+    )
+    def test_normalised_chain_header(
+        self, chain_header: str, tmp_path: Path, script_runner: ScriptRunner
+    ) -> None:
+        """Tests that ``merge_chain_files.py`` normalises headers not separated by single spaces."""
+        chain_file_paths = [tmp_path / "1.chain", tmp_path / "2.chain"]
+        chain_file_paths[0].write_text("chain 30 chr1 50 + 20 30 chr3 70 + 5 15 1\n10\n\n")
+        chain_file_paths[1].write_text(f"{chain_header}\n10\n\n")
+        chain_list_file = tmp_path / "chain_files.txt"
+        chain_list_file.write_text("".join(f"{x}\n" for x in chain_file_paths))
+        merged_chain_file = tmp_path / "merged.chain"
+
+        result = script_runner.run([str(self.script_path), str(chain_list_file), str(merged_chain_file)])
+        assert result.success
+
+        assert merged_chain_file.read_text() == (
+            "chain 30 chr1 50 + 20 30 chr3 70 + 5 15 1\n10\n\n"
+            "chain 20 chr1 50 + 0 10 chr2 60 - 0 10 2\n10\n\n"
+        )
+
+    @pytest.mark.parametrize("buffer_size", [200, 2**30])
+    @pytest.mark.parametrize("sort_by", ["score", "position"])
+    def test_sorted_merge(
+        self, sort_by: str, buffer_size: int, tmp_path: Path, script_runner: ScriptRunner
+    ) -> None:
+        """Tests ``merge_chain_files.py`` script sorting chains in memory and in merged runs."""
+        rng = np.random.default_rng(1)
+        chain_headers: List[List[str]] = []
+        chain_file_paths = []
+        for file_idx in range(3):
+            chain_file_path = tmp_path / f"chains_{file_idx}.chain.gz"
+            file_text = "#comment\n"
+            for chain_id in range(1, 21):
+                score = int(rng.integers(1, 10)) * 100
+                src_name = f"chr{rng.integers(1, 3)}"
+                src_start = int(rng.integers(0, 50))
+                header = ["chain", str(score), src_name, "100", "+", str(src_start), str(src_start + 10)]
+                header += ["chrX", "200", "-", "0", "10", str(chain_id)]
+                chain_headers.append(header)
+                file_text += " ".join(header) + "\n10\n\n"
+            chain_file_path.write_bytes(gzip.compress(file_text.encode("utf-8")))
+            chain_file_paths.append(chain_file_path)
+        chain_list_file = tmp_path / "chain_files.txt"
+        chain_list_file.write_text("".join(f"{x}\n" for x in chain_file_paths))
+        merged_chain_file = tmp_path / "merged.chain"
+
+        cmd_args = [str(self.script_path), str(chain_list_file), str(merged_chain_file), "--sort-by", sort_by]
+        result = script_runner.run(cmd_args + ["--buffer-size", str(buffer_size), "--threads", "2"])
+        assert result.success
+
+        if sort_by == "score":
+            exp_headers = sorted(chain_headers, key=lambda x: -int(x[1]))
+        else:
+            exp_headers = sorted(chain_headers, key=lambda x: (x[2], int(x[5]), int(x[6])))
+        exp_output = "".join(
+            " ".join(header[:-1]) + f" {chain_id}\n10\n\n"
+            for chain_id, header in enumerate(exp_headers, start=1)
+        )
+        assert merged_chain_file.read_text() == exp_output
+
+    def test_bad_chain_header(self, tmp_path: Path, script_runner: ScriptRunner) -> None:
+        """Tests that ``merge_chain_files.py`` fails on a chain header with missing columns."""
+        chain_file_path = tmp_path / "1.chain"
+        chain_file_path.write_text("chain 20 chr1 50 + 0 10 chr2 60 - 0 10\n10\n\n")
+        chain_list_file = tmp_path / "chain_files.txt"
+        chain_list_file.write_text(f"{chain_file_path}\n")
+
+        result = script_runner.run(
+            [str(self.script_path), str(chain_list_file), str(tmp_path / "merged.chain")]
+        )
+        assert not result.success
+        assert "found 12 columns in chain header, but expected 13" in result.stderr
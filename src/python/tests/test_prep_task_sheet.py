@@ -16,8 +16,10 @@
 
 import filecmp
 from pathlib import Path
+import shutil
 from typing import Optional
 
+import pandas as pd
 import pytest
 from pytest_console_scripts import ScriptRunner
 
@@ -56,7 +58,8 @@ class TestPrepTaskSheet:
         assert self.ref_file_dir is not None
 
         in_file_path = self.ref_file_dir / "task_sheets" / in_file_name
-        chrom_sizes_dir = self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes"
+        chrom_sizes_dir = tmp_path / "chrom_sizes"
+        shutil.copytree(self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes", chrom_sizes_dir)
         out_file_path = tmp_path / out_file_name
 
         cmd_args = [
@@ -71,3 +74,70 @@ class TestPrepTaskSheet:
 
         ref_file_path = self.ref_file_dir / "task_sheets" / out_file_name
         assert filecmp.cmp(out_file_path, ref_file_path)
+
+    def test_prep_task_sheet_bins(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests ``prep_task_sheet.py`` script binning short genome sequences into tasks."""
+        seq_lengths = [500, 600, 5000, 50, 50, 400, 300]
+        (tmp_path / "genomeA.chrom.sizes").write_text(
+            "".join(f"seq{i}\t{length}\n" for i, length in enumerate(seq_lengths))
+        )
+        (tmp_path / "genomeB.chrom.sizes").write_text("chr1\t40\n")
+        in_file_path = tmp_path / "genomes.tsv"
+        in_file_path.write_text("source_genome\tdest_genome\ngenomeA\tgenomeB\n")
+        out_file_path = tmp_path / "prepped_genomes.tsv"
+
+        cmd_args = [
+            # pylint: disable-next=no-member
+            self.script_path,  # type: ignore
+            in_file_path,
+            tmp_path,
+            out_file_path,
+            "--bin-length",
+            "1000",
+        ]
+        script_runner.run(cmd_args, check=True)  # type: ignore
+
+        out_df = pd.read_csv(out_file_path, sep="\t")
+        assert out_df["source_sequence"].tolist() == [f"seq{i}" for i in range(len(seq_lengths))]
+        assert out_df["source_end"].tolist() == seq_lengths
+        assert out_df["task_bin"].tolist() == ["bin1", "bin2", "bin3", "bin2", "bin1", "bin1", "bin2"]
+        assert set(out_df["group_size"]) == {3}
+        assert set(out_df["group_key"]) == {"genomeA|genomeB"}
+        assert set(out_df["liftover_level"]) == {"sequence"}
+
+    def test_prep_task_sheet_bins_non_genome(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests that ``prep_task_sheet.py`` fails to bin sequences of a sequence-level task sheet."""
+        assert self.ref_file_dir is not None
+        cmd_args = [
+            # pylint: disable-next=no-member
+            self.script_path,  # type: ignore
+            self.ref_file_dir / "task_sheets" / "regions.tsv",
+            self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes",
+            tmp_path / "prepped_regions.tsv",
+            "--bin-length",
+            "1000",
+        ]
+        result = script_runner.run(cmd_args)  # type: ignore
+        assert not result.success
+        assert "cannot bin sequences" in result.stderr
+
+    def test_prep_task_sheet_task_bins(self, script_runner: ScriptRunner, tmp_path: Path) -> None:
+        """Tests that ``prep_task_sheet.py`` keeps the task bins of a location-level task sheet."""
+        assert self.ref_file_dir is not None
+        chrom_sizes_dir = tmp_path / "chrom_sizes"
+        shutil.copytree(self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes", chrom_sizes_dir)
+        in_file_path = tmp_path / "locations.tsv"
+        in_file_path.write_text(
+            "source_genome\tsource_sequence\tsource_start\tsource_end\tsource_strand\tdest_genome\ttask_bin\n"
+            "genomeA\tchr1\t1\t16\t1\tgenomeB\tbin1\n"
+            "genomeA\tchr1\t17\t33\t1\tgenomeB\tbin2\n"
+        )
+        out_file_path = tmp_path / "prepped_locations.tsv"
+
+        # pylint: disable-next=no-member
+        cmd_args = [self.script_path, in_file_path, chrom_sizes_dir, out_file_path]  # type: ignore
+        script_runner.run(cmd_args, check=True)  # type: ignore
+
+        out_df = pd.read_csv(out_file_path, sep="\t")
+        assert out_df["task_bin"].tolist() == ["bin1", "bin2"]
+        assert set(out_df["liftover_level"]) == {"location"}
@@ -0,0 +1,116 @@
+# See the NOTICE file distributed with this work for additional information
+# regarding copyright ownership.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit testing of HAL alignment script ``process_cactus_maf.py``."""
+
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+from pytest_console_scripts import ScriptRunner
+
+INPUT_MAF = """##maf version=1 scoring=N/A
+
+a score=1
+s genomeA.chr1 10 5 + 100 AA-CGT--
+s genomeB.chr1 20 5 + 100 ---CGTTT
+s genomeC.chr1 30 3 - 100 ---CGT--
+
+a score=2
+s genomeA.chr1 40 2 + 100 AC
+s genomeB.chr1 50 2 + 100 AC
+
+"""
+
+
+# Block transforms are pickled for worker processes, so the script is not run in-process.
+@pytest.mark.script_launch_mode("subprocess")
+class TestProcessCactusMaf:
+    """Tests ``process_cactus_maf.py`` script."""
+
+    script_path: Path
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        type(self).script_path = (
+            Path(__file__).parents[3] / "scripts" / "hal_alignment" / "process_cactus_maf.py"
+        )
+
+    @pytest.mark.parametrize(
+        "expected_block_count, exp_s_lines, exp_stderr",
+        [
+            (
+                None,
+                [
+                    ["s", "genomeA.chr1", "12", "3", "+", "100", "CGT"],
+                    ["s", "genomeB.chr1", "20", "3", "+", "100", "CGT"],
+                    ["s", "genomeC.chr1", "30", "3", "-", "100", "CGT"],
+                ],
+                None,
+            ),
+            (3, None, "Number of input blocks (2) does not match expected block count (3)"),
+        ],
+    )
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_process_cactus_maf(
+        self,
+        jobs: int,
+        expected_block_count: Optional[int],
+        exp_s_lines: Optional[List[List[str]]],
+        exp_stderr: Optional[str],
+        tmp_path: Path,
+        script_runner: ScriptRunner,
+    ) -> None:
+        """Tests ``process_cactus_maf.py`` script."""
+        input_maf = tmp_path / "input.maf"
+        input_maf.write_text(INPUT_MAF)
+        processed_maf = tmp_path / "processed.maf"
+        dataflow_file = tmp_path / "dataflow.txt"
+
+        cmd_args = [
+            str(self.script_path),
+            str(input_maf),
+            str(processed_maf),
+            "--min-block-cols",
+            "3",
+            "--min-seq-length",
+            "3",
+            "--dataflow-file",
+            str(dataflow_file),
+            "--jobs",
+            str(jobs),
+        ]
+        if expected_block_count is not None:
+            cmd_args.extend(["--expected-block-count", str(expected_block_count)])
+
+        result = script_runner.run(cmd_args)
+        if exp_stderr is not None:
+            assert not result.success
+            assert exp_stderr in result.stderr
+            return
+
+        assert result.success
+        obs_lines = processed_maf.read_text().splitlines()
+        assert obs_lines[3] == "a score=0.00"
+        assert [x.split() for x in obs_lines if x.startswith("s")] == exp_s_lines
+
+        dataflow_branch, dataflow_json = dataflow_file.read_text().split(" ", 1)
+        assert dataflow_branch == "2"
+        assert json.loads(dataflow_json) == {
+            "maf_file": str(processed_maf),
+            "maf_block_count": 1,
+            "maf_seq_count": 3,
+        }
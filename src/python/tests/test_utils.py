@@ -25,41 +25,64 @@ Typical usage example::
 
 from contextlib import nullcontext as does_not_raise
 import filecmp
+import gzip
+import io
+import itertools
 from pathlib import Path
-import subprocess
+import shutil
 from typing import Any, ContextManager, Dict, Iterable, List, Mapping, Optional, Tuple
 
+import numpy as np
 import pytest
 from pytest import raises
-from pytest_mock import MockerFixture
 
 from ensembl.compara.utils import to_list
 
+from ensembl.compara.utils.chain import ChainIndex, get_chain_index_path, load_chain_index
+from ensembl.compara.utils.chunking import (
+    lpt_bin_packing,
+    make_seq_chunks,
+    pack_seqs_into_bins,
+    write_coverage_task_sheet,
+)
+from ensembl.compara.utils.compression import (
+    BgzfReader,
+    BgzfWriter,
+    get_bgzf_block_offsets,
+    is_bgzf_file,
+    open_input,
+    open_output,
+)
 from ensembl.compara.utils.hal import (
     extract_region_sequences_from_2bit,
     extract_regions_from_bed,
     make_src_region_file,
+    RegionArray,
     SimpleRegion,
 )
-from ensembl.compara.utils.tools import import_module_from_file
-from ensembl.compara.utils.ucsc import load_chrom_sizes_file
-
-
-helpers_module_path = Path(__file__).parents[0] / "helpers.py"
-helpers = import_module_from_file(helpers_module_path)
-
-# pylint: disable=import-error,wrong-import-order,wrong-import-position
-
-from helpers import mock_two_bit_to_fa
-
-# pylint: enable=import-error,wrong-import-order,wrong-import-position
+from ensembl.compara.utils.maf import (
+    find_maf_chunk_offsets,
+    get_maf_index_path,
+    iter_maf_blocks,
+    load_maf_index,
+    MafBlock,
+    MafBlockSlices,
+    MafRunStats,
+    MafWriter,
+    read_maf_block_count,
+    run_maf_transform,
+)
+from ensembl.compara.utils.psl import read_psl
+from ensembl.compara.utils.twobit import TwoBitFile
+from ensembl.compara.utils.ucsc import get_chrom_sizes_index_path, load_chrom_sizes_file
 
 
 class TestTools:
     """Tests :mod:`tools` submodule."""
 
     @pytest.mark.parametrize(
-        "arg, output", [(None, []), ("", []), (0, []), ("a", ["a"]), (["a", "b"], ["a", "b"])],
+        "arg, output",
+        [(None, []), ("", []), (0, []), ("a", ["a"]), (["a", "b"], ["a", "b"])],
     )
     def test_file_cmp(self, arg: Any, output: List[Any]) -> None:
         """Tests :meth:`tools.to_list()` method.
@@ -72,6 +95,590 @@ class TestTools:
         assert to_list(arg) == output, "List returned differs from the one expected"
 
 
+class TestChainUtils:
+    """Tests :mod:`chain` utils submodule."""
+
+    ref_file_dir: Optional[Path] = None
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+
+    @pytest.mark.parametrize(
+        "chrom, start, end, exp_output",
+        [
+            ("chr1", 15, 18, [(13, 25, ("chr1", 20, 32, "+"))]),
+            ("chr1", 12, 18, [(3, 13, ("chr1", 6, 16, "+")), (13, 25, ("chr1", 20, 32, "+"))]),
+            ("chr1", 0, 3, []),
+            ("chr1", 25, 33, []),
+        ],
+    )
+    def test_load_chain_index(
+        self, chrom: str, start: int, end: int, exp_output: List[Tuple], tmp_path: Path
+    ) -> None:
+        """Tests :func:`utils.chain.load_chain_index()` function."""
+        assert self.ref_file_dir is not None
+        chain_dir_path = self.ref_file_dir / "aln_cache" / "sequence" / "chain"
+        chain_file_path = tmp_path / "genomeA_chr1_to_genomeB.linearGap_medium.chain.gz"
+        shutil.copyfile(chain_dir_path / chain_file_path.name, chain_file_path)
+
+        built_index = load_chain_index(chain_file_path)
+        assert get_chain_index_path(chain_file_path).is_file()
+        loaded_index = load_chain_index(chain_file_path)
+
+        for chain_index in (built_index, loaded_index):
+            assert list(chain_index) == ["chr1"]
+            obs_output = [tuple(x) for x in chain_index[chrom].find(start, end)]
+            assert obs_output == exp_output
+
+    def test_load_stale_chain_index(self, tmp_path: Path) -> None:
+        """Tests that :func:`utils.chain.load_chain_index()` rebuilds a stale chain index."""
+        chain_file_path = tmp_path / "a_to_b.chain"
+        chain_file_path.write_text("chain 100 chr1 50 + 0 10 chr2 60 - 0 10 1\n10\n\n")
+        load_chain_index(chain_file_path)
+
+        chain_file_path.write_text("chain 100 chr1 50 + 20 30 chr3 70 + 5 15 1\n10\n\n")
+        chain_index = load_chain_index(chain_file_path)
+        index_from_file, _metadata = ChainIndex.load(get_chain_index_path(chain_file_path))
+
+        assert [tuple(x) for x in chain_index["chr1"].find(0, 50)] == [(20, 30, ("chr3", 5, 15, "+"))]
+        assert [tuple(x) for x in index_from_file["chr1"].find(0, 50)] == [(20, 30, ("chr3", 5, 15, "+"))]
+
+
+class TestChunkingUtils:
+    """Tests :mod:`chunking` utils submodule."""
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_lpt_bin_packing(self, seed: int) -> None:
+        """Tests that :func:`utils.chunking.lpt_bin_packing()` is within 4/3 of the optimal makespan."""
+        rng = np.random.default_rng(seed)
+        for _ in range(50):
+            num_bins = int(rng.integers(1, 4))
+            weights = rng.integers(0, 100, int(rng.integers(0, 8)))
+            bin_idxs = lpt_bin_packing(weights, num_bins)
+            assert set(bin_idxs.tolist()) <= set(range(num_bins))
+            makespan = np.bincount(bin_idxs, weights=weights, minlength=num_bins).max()
+            opt_makespan = min(
+                (
+                    np.bincount(x, weights=weights, minlength=num_bins).max()
+                    for x in itertools.product(range(num_bins), repeat=len(weights))
+                ),
+                default=0,
+            )
+            assert makespan * 3 <= opt_makespan * 4
+
+    def test_lpt_bin_packing_bad_num_bins(self) -> None:
+        """Tests that :func:`utils.chunking.lpt_bin_packing()` rejects a non-positive number of bins."""
+        with raises(ValueError, match=r"number of bins must be greater than 0"):
+            lpt_bin_packing(np.array([1, 2]), 0)
+
+    @pytest.mark.parametrize(
+        "seq_lengths, bin_length, exp_bin_idxs",
+        [
+            ([500, 600, 5000, 50, 50, 400, 300], 1000, [0, 1, 2, 1, 0, 0, 1]),
+            ([3, 3, 3], 10, [0, 0, 0]),
+            ([10, 20], 10, [0, 1]),
+            ([], 10, []),
+        ],
+    )
+    def test_pack_seqs_into_bins(
+        self, seq_lengths: List[int], bin_length: int, exp_bin_idxs: List[int]
+    ) -> None:
+        """Tests :func:`utils.chunking.pack_seqs_into_bins()` function."""
+        assert pack_seqs_into_bins(np.array(seq_lengths), bin_length).tolist() == exp_bin_idxs
+
+    def test_pack_seqs_into_bins_bad_bin_length(self) -> None:
+        """Tests that :func:`utils.chunking.pack_seqs_into_bins()` rejects a non-positive bin length."""
+        with raises(ValueError, match=r"bin length must be greater than 0"):
+            pack_seqs_into_bins(np.array([1, 2]), 0)
+
+    @pytest.mark.parametrize(
+        "chrom_sizes, num_bins, max_chunk_length, exp_chunks, exp_bin_lengths",
+        [
+            (
+                {"chr1": 250, "scaf1": 10, "scaf2": 10},
+                2,
+                None,
+                [("chr1", 0, 125, 0), ("scaf1", 0, 10, 0), ("chr1", 125, 125, 1), ("scaf2", 0, 10, 1)],
+                [135, 135],
+            ),
+            (
+                {"chr1": 10, "chr2": 0, "chr3": 7},
+                4,
+                4,
+                [
+                    ("chr1", 0, 3, 0),
+                    ("chr3", 0, 3, 0),
+                    ("chr1", 3, 3, 1),
+                    ("chr1", 6, 4, 2),
+                    ("chr3", 3, 4, 3),
+                ],
+                [6, 3, 4, 4],
+            ),
+            ({"chr1": 5}, 3, None, [("chr1", 0, 1, 0), ("chr1", 1, 2, 1), ("chr1", 3, 2, 2)], [1, 2, 2]),
+            ({"chr1": 5}, 3, 10, [("chr1", 0, 5, 0)], [5]),
+        ],
+    )
+    def test_make_seq_chunks(
+        self,
+        chrom_sizes: Dict[str, int],
+        num_bins: int,
+        max_chunk_length: Optional[int],
+        exp_chunks: List[Tuple[str, int, int, int]],
+        exp_bin_lengths: List[int],
+    ) -> None:
+        """Tests :func:`utils.chunking.make_seq_chunks()` function."""
+        seq_chunks = make_seq_chunks(chrom_sizes, num_bins, max_chunk_length=max_chunk_length)
+        obs_chunks = list(
+            zip(
+                seq_chunks.seq_names.tolist(),
+                seq_chunks.starts.tolist(),
+                seq_chunks.lengths.tolist(),
+                seq_chunks.bins.tolist(),
+            )
+        )
+        assert obs_chunks == exp_chunks
+        assert seq_chunks.bin_lengths.tolist() == exp_bin_lengths
+
+    def test_make_seq_chunks_covers_sequences(self) -> None:
+        """Tests that :func:`utils.chunking.make_seq_chunks()` chunks cover each sequence exactly."""
+        rng = np.random.default_rng(1)
+        chrom_sizes = {f"seq{i}": int(x) for i, x in enumerate(rng.integers(1, 1000, 300))}
+        chrom_sizes["chr1"] = 50_000
+        seq_chunks = make_seq_chunks(chrom_sizes, 16)
+
+        assert seq_chunks.lengths.max() <= -(-sum(chrom_sizes.values()) // 16)
+        assert np.all(np.diff(seq_chunks.bins) >= 0)
+        assert len(seq_chunks.bin_lengths) == 16
+        for seq_name, seq_length in chrom_sizes.items():
+            seq_mask = seq_chunks.seq_names == seq_name
+            starts = np.sort(seq_chunks.starts[seq_mask])
+            ends = np.sort(seq_chunks.starts[seq_mask] + seq_chunks.lengths[seq_mask])
+            assert starts[0] == 0 and ends[-1] == seq_length
+            assert np.array_equal(starts[1:], ends[:-1])
+
+    def test_write_coverage_task_sheet(self) -> None:
+        """Tests :func:`utils.chunking.write_coverage_task_sheet()` function."""
+        out_stream = io.StringIO()
+        write_coverage_task_sheet(make_seq_chunks({"chr1": 250, "scaf1": 10, "scaf2": 10}, 2), out_stream)
+        assert out_stream.getvalue() == (
+            "task_bin\tref_sequence\tstart\tlength\n"
+            "bin1\tchr1\t0\t125\n"
+            "bin1\tscaf1\t0\t10\n"
+            "bin2\tchr1\t125\t125\n"
+            "bin2\tscaf2\t0\t10\n"
+        )
+
+
+class TestCompressionUtils:
+    """Tests :mod:`compression` utils submodule."""
+
+    @pytest.mark.parametrize("threads", [1, 3])
+    def test_bgzf_writer(self, threads: int, tmp_path: Path) -> None:
+        """Tests :class:`utils.compression.BgzfWriter` and :class:`utils.compression.BgzfReader` classes."""
+        rng = np.random.default_rng(1)
+        # Random bytes are incompressible, so their blocks must be stored uncompressed.
+        data = rng.choice(list(b"ACGT"), 300_000).astype(np.uint8).tobytes() + rng.bytes(100_000)
+        bgzf_file_path = tmp_path / "data.bgz"
+        with BgzfWriter(bgzf_file_path, threads=threads) as writer:
+            for offset in range(0, len(data), 30_000):
+                writer.write(data[offset : offset + 30_000])
+
+        assert is_bgzf_file(bgzf_file_path)
+        assert gzip.decompress(bgzf_file_path.read_bytes()) == data
+        block_offsets, data_offsets = get_bgzf_block_offsets(bgzf_file_path)
+        assert data_offsets.tolist() == [0, 65280, 130560, 195840, 261120, 326400, 391680, 400000]
+
+        with BgzfReader(bgzf_file_path) as reader:
+            for block_idx, start, size in [(0, 0, 10), (1, 5, 65280), (6, 8000, 1000), (2, 0, 0)]:
+                virtual_offset = int(block_offsets[block_idx]) << 16 | start
+                data_start = int(data_offsets[block_idx]) + start
+                assert reader.read(virtual_offset, size) == data[data_start : data_start + size]
+
+    @pytest.mark.parametrize("file_name", ["a.txt", "a.txt.gz"])
+    def test_open_output(self, file_name: str, tmp_path: Path) -> None:
+        """Tests :func:`utils.compression.open_output()` and :func:`utils.compression.open_input()`."""
+        file_path = tmp_path / file_name
+        with open_output(file_path, threads=2) as out_file_obj:
+            out_file_obj.write("line 1\nline 2\n")
+        assert is_bgzf_file(file_path) == file_name.endswith(".gz")
+        with open_input(file_path) as in_file_obj:
+            assert in_file_obj.readlines() == ["line 1\n", "line 2\n"]
+
+        gzip_file_path = tmp_path / "b.txt.gz"
+        with gzip.open(gzip_file_path, "wt") as out_file_obj:
+            out_file_obj.write("line 3\n")
+        assert not is_bgzf_file(gzip_file_path)
+        with open_input(gzip_file_path, "rb") as in_file_obj:
+            assert in_file_obj.read() == b"line 3\n"
+
+        with raises(ValueError, match=r"unsupported output file mode"):
+            open_output(file_path, "a")  # type: ignore[call-overload]
+
+
+class TestMafUtils:
+    """Tests :mod:`maf` utils submodule."""
+
+    ref_file_dir: Optional[Path] = None
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+
+    def test_iter_maf_blocks(self) -> None:
+        """Tests :func:`utils.maf.iter_maf_blocks()` function."""
+        assert self.ref_file_dir is not None
+        with open(self.ref_file_dir / "aln.maf", encoding="utf-8") as in_file_obj:
+            maf_blocks = list(iter_maf_blocks(in_file_obj))
+
+        assert len(maf_blocks) == 5
+        first_block = maf_blocks[0]
+        assert first_block.srcs == ["Anc0.chr1", "genomeA.chr1", "genomeB.chr1"]
+        assert first_block.starts.tolist() == [0, 0, 0]
+        assert first_block.sizes.tolist() == [8, 5, 8]
+        assert first_block.strands.tolist() == [1, 1, 1]
+        assert first_block.src_sizes.tolist() == [36, 33, 40]
+        assert first_block.row_seq(1) == "ATT---GT"
+        assert first_block.annotations == {}
+
+    @pytest.mark.parametrize(
+        "maf_text, exp_seqs, expectation",
+        [
+            ("a\ns x.1 0 3 + 9 A-CG\ns y.1 5 3 - 9 AT.-\n", ["A-CG", "ATC-"], does_not_raise()),
+            ("# comment\na score=2\ns x.1 0 2 + 9 AC\ni x.1 N 0 C 0\n\n", ["AC"], does_not_raise()),
+            ("a\ns x.1 0 3 + 9\n", None, raises(ValueError, match=r"'s' line must have 7 fields")),
+            ("a\ns x.1 0 1 + 9 .\n", None, raises(ValueError, match=r"dot/period in first sequence")),
+            ("a\nx unexpected\n", None, raises(ValueError, match=r"unexpected line")),
+            ("a score\n", None, raises(ValueError, match=r"invalid key in 'a' line")),
+            ("a\ns x.1 0 1 + 9 A\ns y.1 0 1 + 9 AC\n", None, raises(ValueError, match=r"same length")),
+        ],
+    )
+    def test_iter_maf_blocks_parsing(
+        self, maf_text: str, exp_seqs: List[str], expectation: ContextManager
+    ) -> None:
+        """Tests parsing of MAF lines by :func:`utils.maf.iter_maf_blocks()` function."""
+        with expectation:
+            (maf_block,) = iter_maf_blocks(io.StringIO(maf_text))
+            assert [maf_block.row_seq(i) for i in range(maf_block.num_rows)] == exp_seqs
+
+    def test_maf_writer(self, tmp_path: Path) -> None:
+        """Tests :class:`utils.maf.MafWriter` class."""
+        assert self.ref_file_dir is not None
+        with open(self.ref_file_dir / "aln.maf", encoding="utf-8") as in_file_obj:
+            maf_block = next(iter_maf_blocks(in_file_obj))
+
+        out_file_path = tmp_path / "out.maf"
+        with open(out_file_path, "w", encoding="utf-8") as out_file_obj:
+            writer = MafWriter(out_file_obj)
+            writer.write_header()
+            assert writer.write_block(maf_block.take_rows(maf_block.sizes > 5)) == 2
+            new_block = MafBlock.from_rows(["genome A.chr1"], [3], [2], [-1], [33], ["A-T"])
+            assert writer.write_block(new_block) == 1
+
+        assert out_file_path.read_text().splitlines() == [
+            "##maf version=1 scoring=none",
+            "# generated by Biopython",
+            "",
+            "a ",
+            "s Anc0.chr1" + " " * 31 + " " * 15 + "0     8 + " + " " * 13 + "36 ATTCCCGT",
+            "s genomeB.chr1" + " " * 28 + " " * 15 + "0     8 + " + " " * 13 + "40 ATTCCCGT",
+            "",
+            "a score=0.00",
+            "s genome_A.chr1" + " " * 27 + " " * 15 + "3     2 - " + " " * 13 + "33 A-T",
+            "",
+        ]
+
+    def test_maf_writer_block_slices(self, tmp_path: Path) -> None:
+        """Tests :meth:`utils.maf.MafWriter.write_block_slices()` method."""
+        maf_block = MafBlock.from_rows(
+            ["genome A.chr1", "genomeB.chr1"], [3, 10], [6, 4], [1, -1], [33, 40], ["ACGTAC", "A-GT-C"]
+        )
+        block_slices = MafBlockSlices(
+            maf_block,
+            np.array([0, 2, 5]),
+            np.array([1, 4, 6]),
+            np.array([[3, 10], [5, 11], [8, 13]]),
+            np.array([[1, 1], [2, 2], [1, 1]]),
+        )
+
+        slices_file_path = tmp_path / "slices.maf"
+        with open(slices_file_path, "w", encoding="utf-8") as out_file_obj:
+            assert MafWriter(out_file_obj).write_block_slices(block_slices) == 6
+        blocks_file_path = tmp_path / "blocks.maf"
+        with open(blocks_file_path, "w", encoding="utf-8") as out_file_obj:
+            writer = MafWriter(out_file_obj)
+            assert [writer.write_block(x) for x in block_slices] == [2, 2, 2]
+
+        assert slices_file_path.read_text() == blocks_file_path.read_text()
+        with open(slices_file_path, encoding="utf-8") as in_file_obj:
+            obs_blocks = list(iter_maf_blocks(in_file_obj))
+        assert [[x.row_seq(0), x.row_seq(1)] for x in obs_blocks] == [["A", "A"], ["GT", "GT"], ["C", "C"]]
+        assert [x.starts.tolist() for x in obs_blocks] == [[3, 10], [5, 11], [8, 13]]
+
+    @pytest.mark.parametrize(
+        "chunk_size, exp_output",
+        [(1, [0, 62, 161, 278, 367, 484]), (200, [0, 278, 484]), (1000, [0])],
+    )
+    def test_find_maf_chunk_offsets(self, chunk_size: int, exp_output: List[int]) -> None:
+        """Tests :func:`utils.maf.find_maf_chunk_offsets()` function."""
+        assert self.ref_file_dir is not None
+        assert find_maf_chunk_offsets(self.ref_file_dir / "aln.maf", chunk_size) == exp_output
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_run_maf_transform(self, jobs: int, tmp_path: Path) -> None:
+        """Tests :func:`utils.maf.run_maf_transform()` function."""
+        assert self.ref_file_dir is not None
+        out_file_path = tmp_path / "out.maf"
+        stats = run_maf_transform(
+            self.ref_file_dir / "aln.maf", out_file_path, _drop_first_row, jobs=jobs, chunk_size=200
+        )
+        assert stats == MafRunStats(input_block_count=5, output_block_count=5, output_seq_count=11)
+
+        with open(out_file_path, encoding="utf-8") as in_file_obj:
+            out_blocks = list(iter_maf_blocks(in_file_obj))
+        assert [x.starts.tolist() for x in out_blocks] == [[0, 0], [5, 16, 8], [9, 12], [13, 20], [0, 32]]
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    @pytest.mark.parametrize("in_file_name", ["aln.maf.gz", "aln.maf.bgz"])
+    def test_run_maf_transform_compressed(self, in_file_name: str, jobs: int, tmp_path: Path) -> None:
+        """Tests :func:`utils.maf.run_maf_transform()` function with compressed input and output."""
+        assert self.ref_file_dir is not None
+        in_file_path = tmp_path / in_file_name
+        maf_text = (self.ref_file_dir / "aln.maf").read_text()
+        if in_file_name.endswith(".bgz"):
+            with open_output(in_file_path) as out_file_obj:
+                out_file_obj.write(maf_text)
+        else:
+            in_file_path.write_bytes(gzip.compress(maf_text.encode("utf-8")))
+        out_file_path = tmp_path / "out.maf.gz"
+        stats = run_maf_transform(in_file_path, out_file_path, _drop_first_row, jobs=jobs, chunk_size=200)
+        assert stats == MafRunStats(input_block_count=5, output_block_count=5, output_seq_count=11)
+
+        assert is_bgzf_file(out_file_path)
+        with open_input(out_file_path) as in_file_obj:
+            out_blocks = list(iter_maf_blocks(in_file_obj))
+        assert [x.starts.tolist() for x in out_blocks] == [[0, 0], [5, 16, 8], [9, 12], [13, 20], [0, 32]]
+
+    @pytest.mark.parametrize(
+        "src, start, end, exp_starts",
+        [
+            ("Anc0.chr1", 10, 17, [8, 12, 16]),
+            ("Anc0.chr1", 0, 1, [0]),
+            ("Anc0.chr1", 36, 40, []),
+            ("genomeA.chr1", 0, 33, []),
+        ],
+    )
+    def test_load_maf_index(
+        self, src: str, start: int, end: int, exp_starts: List[int], tmp_path: Path
+    ) -> None:
+        """Tests :func:`utils.maf.load_maf_index()` function."""
+        assert self.ref_file_dir is not None
+        maf_file_path = tmp_path / "aln.maf"
+        shutil.copyfile(self.ref_file_dir / "aln.maf", maf_file_path)
+        assert read_maf_block_count(maf_file_path) is None
+
+        built_index = load_maf_index(maf_file_path)
+        assert get_maf_index_path(maf_file_path).is_file()
+        loaded_index = load_maf_index(maf_file_path)
+
+        for maf_index in (built_index, loaded_index):
+            assert maf_index.block_count == 5
+            obs_blocks = list(maf_index.fetch(maf_file_path, src, start, end))
+            assert [x.starts[0] for x in obs_blocks] == exp_starts
+            assert all(x.srcs[0] == src for x in obs_blocks)
+        assert read_maf_block_count(maf_file_path) == 5
+
+    def test_load_bgzf_maf_index(self, tmp_path: Path) -> None:
+        """Tests :func:`utils.maf.load_maf_index()` function with a BGZF-compressed MAF file."""
+        assert self.ref_file_dir is not None
+        maf_file_path = tmp_path / "aln.maf.gz"
+        with BgzfWriter(maf_file_path) as writer:
+            # Each flush ends a BGZF block, so that MAF blocks span several BGZF blocks.
+            for line in (self.ref_file_dir / "aln.maf").read_bytes().splitlines(keepends=True):
+                writer.write(line[:10])
+                writer.flush()
+                writer.write(line[10:])
+        maf_index = load_maf_index(maf_file_path)
+
+        with open(self.ref_file_dir / "aln.maf", encoding="utf-8") as in_file_obj:
+            exp_blocks = [x for x in iter_maf_blocks(in_file_obj) if x.srcs[0] == "Anc0.chr1"]
+        obs_blocks = list(maf_index.fetch(maf_file_path, "Anc0.chr1", 0, 100))
+        assert [x.seqs.tobytes() for x in obs_blocks] == [x.seqs.tobytes() for x in exp_blocks]
+
+        gzip_file_path = tmp_path / "aln2.maf.gz"
+        gzip_file_path.write_bytes(gzip.compress((self.ref_file_dir / "aln.maf").read_bytes()))
+        with raises(ValueError, match=r"not in BGZF format"):
+            load_maf_index(gzip_file_path)
+
+    def test_load_stale_maf_index(self, tmp_path: Path) -> None:
+        """Tests that :func:`utils.maf.load_maf_index()` rebuilds a stale MAF index."""
+        maf_file_path = tmp_path / "a.maf"
+        maf_file_path.write_text("a\ns x.1 0 2 + 9 AC\ns y.1 3 2 - 9 AC\n\n")
+        load_maf_index(maf_file_path)
+
+        maf_file_path.write_text("a\ns x.1 4 2 - 9 AC\n\na\ns y.1 0 1 + 9 A\n\na\n\n")
+        assert read_maf_block_count(maf_file_path) is None
+        maf_index = load_maf_index(maf_file_path)
+
+        assert maf_index.block_count == 3
+        assert len(maf_index) == 2
+        assert maf_index.overlapping("x.1", 0, 4).tolist() == [0]
+        assert maf_index.overlapping("x.1", 0, 3).tolist() == []
+        assert read_maf_block_count(maf_file_path) == 3
+
+
+def _make_random_psl_lines(seed: int, num_records: int) -> List[str]:
+    """Returns random PSL lines with one- and two-character strands."""
+    rng = np.random.default_rng(seed)
+    psl_lines = []
+    for _ in range(num_records):
+        block_count = int(rng.integers(1, 5))
+        block_sizes = rng.integers(1, 20, block_count)
+        q_starts = np.cumsum(rng.integers(0, 10, block_count) + np.r_[0, block_sizes[:-1]])
+        t_starts = np.cumsum(rng.integers(0, 10, block_count) + np.r_[0, block_sizes[:-1]])
+        q_size = int(q_starts[-1] + block_sizes[-1] + rng.integers(0, 50))
+        t_size = int(t_starts[-1] + block_sizes[-1] + rng.integers(0, 50))
+        strand = str(rng.choice(["+", "-", "++", "+-", "-+", "--"]))
+        counts = rng.integers(0, 100, 8).tolist()
+        fields = [*counts, strand, f"q{rng.integers(3)}", q_size, 0, 1, f"t{rng.integers(3)}", t_size, 0, 1]
+        fields.append(block_count)
+        fields.extend("".join(f"{x}," for x in arr) for arr in (block_sizes, q_starts, t_starts))
+        psl_lines.append("\t".join(str(x) for x in fields) + "\n")
+    return psl_lines
+
+
+def _rc_psl_blocks(fields: List[str]) -> None:
+    """Reverse-complements the blocks of split PSL line fields in place, as in the Kent function ``pslRc``."""
+    q_size, t_size = int(fields[10]), int(fields[14])
+    block_sizes, q_starts, t_starts = (
+        [int(x) for x in fields[i].rstrip(",").split(",")] for i in (18, 19, 20)
+    )
+    q_starts = [q_size - (x + y) for x, y in zip(q_starts, block_sizes)]
+    t_starts = [t_size - (x + y) for x, y in zip(t_starts, block_sizes)]
+    for i, values in zip((18, 19, 20), (block_sizes, q_starts, t_starts)):
+        fields[i] = "".join(f"{x}," for x in reversed(values))
+
+
+def _pos_target_psl_line(psl_line: str) -> str:
+    """Returns a PSL line made target-positive one record at a time, as by ``pslPosTarget``."""
+    fields = psl_line.rstrip("\n").split("\t")
+    if fields[8][1:] == "-":
+        fields[8] = ("-" if fields[8][0] != "-" else "+") + "+"
+        _rc_psl_blocks(fields)
+    return "\t".join(fields) + "\n"
+
+
+def _swap_psl_line(psl_line: str) -> str:
+    """Returns a PSL line with query and target swapped one record at a time, as by ``pslSwap``."""
+    fields = psl_line.rstrip("\n").split("\t")
+    strand = fields[8]
+    if strand[0] == "-" and len(strand) == 1:
+        _rc_psl_blocks(fields)
+    elif len(strand) == 2:
+        fields[8] = strand[::-1]
+    for q_idx, t_idx in [(4, 6), (5, 7), (9, 13), (10, 14), (11, 15), (12, 16), (19, 20)]:
+        fields[q_idx], fields[t_idx] = fields[t_idx], fields[q_idx]
+    return "\t".join(fields) + "\n"
+
+
+def _drop_first_row(maf_block: MafBlock) -> List[MafBlock]:
+    """Returns a list containing the input MAF block without its first row."""
+    return [maf_block.take_rows(np.arange(1, maf_block.num_rows))]
+
+
+class TestPslUtils:
+    """Tests :mod:`psl` utils submodule."""
+
+    def test_read_and_write_psl(self) -> None:
+        """Tests :func:`utils.psl.read_psl()` function and :meth:`utils.psl.PslRecords.write()` method."""
+        psl_text = "".join(_make_random_psl_lines(seed=1, num_records=50))
+        psl_records = read_psl(io.StringIO("psLayout version 3\n\nmatch\tmis-\n-------\n" + psl_text))
+        assert len(psl_records) == 50
+        out_stream = io.StringIO()
+        psl_records.write(out_stream)
+        assert out_stream.getvalue() == psl_text
+
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_pos_target_and_swap(self, seed: int) -> None:
+        """Tests :meth:`utils.psl.PslRecords.pos_target()` and :meth:`utils.psl.PslRecords.swap()` methods."""
+        psl_lines = _make_random_psl_lines(seed=seed, num_records=200)
+        psl_records = read_psl(io.StringIO("".join(psl_lines)))
+
+        out_stream = io.StringIO()
+        psl_records.pos_target().write(out_stream)
+        exp_pos_target_lines = [_pos_target_psl_line(x) for x in psl_lines]
+        assert out_stream.getvalue() == "".join(exp_pos_target_lines)
+
+        out_stream = io.StringIO()
+        psl_records.pos_target().swap().write(out_stream)
+        assert out_stream.getvalue() == "".join(_swap_psl_line(x) for x in exp_pos_target_lines)
+
+    @pytest.mark.parametrize(
+        "psl_line, exp_message",
+        [
+            ("1\t0\t0\t0\t0\t0\t0\t0\t+\tq\t5\t0\t1\tt\t5\t0\t1\t1\t1,\t0,\n", r"must have 21 columns"),
+            ("1\t0\t0\t0\t0\t0\t0\t0\t*\tq\t5\t0\t1\tt\t5\t0\t1\t1\t1,\t0,\t0,\n", r"invalid PSL strand"),
+            ("1\t0\t0\t0\t0\t0\t0\t0\t+\tq\t5\t0\t1\tt\t5\t0\t1\t2\t1,\t0,\t0,\n", r"block counts"),
+        ],
+    )
+    def test_read_bad_psl(self, psl_line: str, exp_message: str) -> None:
+        """Tests :func:`utils.psl.read_psl()` function with invalid PSL records."""
+        with raises(ValueError, match=exp_message):
+            read_psl(io.StringIO(psl_line))
+
+
+class TestTwoBitUtils:
+    """Tests :mod:`twobit` utils submodule."""
+
+    ref_file_dir: Optional[Path] = None
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup(self) -> None:
+        """Loads necessary fixtures and values as class attributes."""
+        # pylint: disable-next=no-member
+        type(self).ref_file_dir = pytest.files_dir / "hal_alignment"  # type: ignore
+
+    @pytest.mark.parametrize(
+        "name, start, end, strand, exp_output, expectation",
+        [
+            (
+                "chrA",
+                0,
+                None,
+                "+",
+                "CcgtanNNNNNTTCCCTAACAGAGTTNnncgaacTCGTGTTGTCGAGCGACNNAAtt",
+                does_not_raise(),
+            ),
+            ("chrA", 3, 9, "+", "tanNNN", does_not_raise()),
+            ("chrA", 3, 9, "-", "NNNnta", does_not_raise()),
+            ("chrA", 20, 20, "+", "", does_not_raise()),
+            ("chrB", 0, 3, "-", "ntt", does_not_raise()),
+            ("scaf_3", 96, 101, "+", "tccat", does_not_raise()),
+            ("chrA", 50, 58, "+", None, raises(ValueError, match=r"out of range of sequence 'chrA'")),
+            ("chrN", 0, 1, "+", None, raises(ValueError, match=r"sequence 'chrN' not found in 2bit file")),
+        ],
+    )
+    def test_fetch(
+        self,
+        name: str,
+        start: int,
+        end: Optional[int],
+        strand: str,
+        exp_output: str,
+        expectation: ContextManager,
+    ) -> None:
+        """Tests :meth:`utils.twobit.TwoBitFile.fetch()` method."""
+        assert self.ref_file_dir is not None
+        with TwoBitFile(self.ref_file_dir / "masked.2bit") as two_bit:
+            assert list(two_bit) == ["chrA", "chrB", "scaf_3"]
+            with expectation:
+                assert two_bit.fetch(name, start, end, strand) == exp_output
+
+
 class TestUcscUtils:
     """Tests :mod:`ucsc` utils submodule."""
 
@@ -92,15 +699,39 @@ class TestUcscUtils:
         ],
     )
     def test_load_chrom_sizes_file(
-        self, chrom_sizes_file_name: str, exp_output: Dict[str, int], expectation: ContextManager
+        self,
+        chrom_sizes_file_name: str,
+        exp_output: Dict[str, int],
+        expectation: ContextManager,
+        tmp_path: Path,
     ) -> None:
         """Tests :func:`utils.ucsc.load_chrom_sizes_file()` function."""
         assert self.ref_file_dir is not None
+        chrom_sizes_dir_path = self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes"
+        chrom_sizes_file_path = tmp_path / chrom_sizes_file_name
+        shutil.copyfile(chrom_sizes_dir_path / chrom_sizes_file_name, chrom_sizes_file_path)
         with expectation:
-            chrom_sizes_dir_path = self.ref_file_dir / "aln_cache" / "genome" / "chrom_sizes"
-            chrom_sizes_file_path = chrom_sizes_dir_path / chrom_sizes_file_name
             obs_output = load_chrom_sizes_file(chrom_sizes_file_path)
             assert obs_output == exp_output
+            # The second load is of the chrom sizes index file.
+            assert get_chrom_sizes_index_path(chrom_sizes_file_path).is_file()
+            assert load_chrom_sizes_file(chrom_sizes_file_path) == exp_output
+
+    def test_load_chrom_sizes_index(self, tmp_path: Path) -> None:
+        """Tests that :func:`utils.ucsc.load_chrom_sizes_file()` rebuilds a stale chrom sizes index."""
+        chrom_sizes_file_path = tmp_path / "genomeC.chrom.sizes"
+        chrom_sizes_file_path.write_text("scaf_10\t7\nchrX\t150\nchr1\t200\n")
+        built_chrom_sizes = load_chrom_sizes_file(chrom_sizes_file_path)
+        loaded_chrom_sizes = load_chrom_sizes_file(chrom_sizes_file_path)
+        for chrom_sizes in (built_chrom_sizes, loaded_chrom_sizes):
+            assert list(chrom_sizes.items()) == [("scaf_10", 7), ("chrX", 150), ("chr1", 200)]
+            assert "chr2" not in chrom_sizes
+            with raises(KeyError):
+                chrom_sizes["chr"]  # pylint: disable=pointless-statement
+
+        chrom_sizes_file_path.write_text("chr1\t200\nchr2\t100\n")
+        assert dict(load_chrom_sizes_file(chrom_sizes_file_path)) == {"chr1": 200, "chr2": 100}
+        assert dict(load_chrom_sizes_file(chrom_sizes_file_path, build=False)) == {"chr1": 200, "chr2": 100}
 
 
 class TestHalUtils:
@@ -118,11 +749,17 @@ class TestHalUtils:
         "regions, two_bit_file_name, exp_output, expectation",
         [
             ([SimpleRegion("chr1", 15, 18, "+")], "genomeA.2bit", ["TAA"], does_not_raise()),
+            (
+                [SimpleRegion("chr1", 15, 18, "+"), SimpleRegion("chr1", 0, 5, "-")],
+                "genomeA.2bit",
+                ["TAA", "ACAAT"],
+                does_not_raise(),
+            ),
             (
                 [SimpleRegion("chr1", 31, 34, "+")],
                 "genomeA.2bit",
                 None,
-                raises(subprocess.CalledProcessError),
+                raises(ValueError, match=r"region chr1:31-34 is out of range of sequence 'chr1'"),
             ),
         ],
     )
@@ -132,11 +769,9 @@ class TestHalUtils:
         two_bit_file_name: str,
         exp_output: List[str],
         expectation: ContextManager,
-        mocker: MockerFixture,
     ) -> None:
         """Tests :func:`utils.hal.extract_region_sequences_from_2bit()` function."""
         assert self.ref_file_dir is not None
-        mocker.patch("subprocess.run", side_effect=mock_two_bit_to_fa)
         with expectation:
             two_bit_dir_path = self.ref_file_dir / "aln_cache" / "genome" / "2bit"
             two_bit_file_path = two_bit_dir_path / two_bit_file_name
@@ -157,7 +792,51 @@ class TestHalUtils:
         assert self.ref_file_dir is not None
         bed_file_path = self.ref_file_dir / bed_file_name
         obs_output = extract_regions_from_bed(bed_file_path)
-        assert obs_output == exp_output
+        assert list(obs_output) == exp_output
+
+    @pytest.mark.parametrize(
+        "region_strings, exp_output, expectation",
+        [
+            (
+                ["chr2:16-18:1", "chr1:1-5:-1", "chr2:1-1:1"],
+                {
+                    "chr1": [SimpleRegion("chr1", 0, 5, "-")],
+                    "chr2": [SimpleRegion("chr2", 15, 18, "+"), SimpleRegion("chr2", 0, 1, "+")],
+                },
+                does_not_raise(),
+            ),
+            ([], {}, does_not_raise()),
+            (["chr1:0-5:1"], None, raises(ValueError, match="start must be greater than or equal to 1: 0")),
+            (["chr1:6-5:1"], None, raises(ValueError, match=r"end \(5\) must be greater than or equal to")),
+            (["chr1:1-5:1", "chr1:1-5:0"], None, raises(ValueError, match="invalid strand: '0'")),
+            (["chr1:1-5"], None, raises(ValueError, match="failed to tokenise")),
+        ],
+    )
+    def test_region_array_from_region_strings(
+        self,
+        region_strings: List[str],
+        exp_output: Optional[Dict[str, List[SimpleRegion]]],
+        expectation: ContextManager,
+    ) -> None:
+        """Tests :meth:`utils.hal.RegionArray.from_region_strings()` method."""
+        with expectation:
+            regions = RegionArray.from_region_strings(region_strings)
+            assert [x.to_1_based_region_string() for x in regions] == region_strings
+            assert {k: list(v) for k, v in regions.group_by_chrom().items()} == exp_output
+
+    def test_region_array_from_tsv(self, tmp_path: Path) -> None:
+        """Tests :meth:`utils.hal.RegionArray.from_tsv()` method."""
+        tsv_file_path = tmp_path / "regions.tsv"
+        tsv_file_path.write_text("chr\tstart\tend\tstrand\tname\nchr1\t16\t18\t1\t\nchr1\t1\t3\t-1\tq\n")
+        with open(tsv_file_path) as tsv_file:
+            regions = RegionArray.from_tsv(tsv_file)
+        assert list(regions) == [SimpleRegion("chr1", 15, 18, "+"), SimpleRegion("chr1", 0, 3, "-", name="q")]
+        assert list(RegionArray.from_regions(regions)) == list(regions)
+
+        tsv_file_path.write_text("chr\tstart\tstrand\nchr1\t16\t1\n")
+        with open(tsv_file_path) as tsv_file:
+            with raises(ValueError, match=r"region TSV file lacks required columns: end$"):
+                RegionArray.from_tsv(tsv_file)
 
     @pytest.mark.parametrize(
         "region_tuple, chrom_sizes, bed_file_name, flank_length, expectation",